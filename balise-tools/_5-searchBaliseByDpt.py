@@ -1,21 +1,135 @@
+import argparse
+import os
+import re
+import sys
 import requests
 from bs4 import BeautifulSoup
-import json
-import time
-
-def fetch_balise_data(department):
-    """Fetch balise data from balisemeteo.com for a specific department."""
-    url = f"https://www.balisemeteo.com/depart.php?dept={department}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.text
-    except requests.RequestException as e:
-        print(f"❌ Erreur lors de la récupération des données pour le département {department}: {e}")
-        return None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+from checkpoint import write_json_atomic
+from crawler import HostRateLimiter, RateLimitedSession, CrawlStats
+from departments import DEFAULT_DEPARTMENTS, add_department_arguments, selected_departments
+from http_cache import HttpCache
+from metrics import METRICS, add_metrics_arguments, export, get_logger, setup
+from work_queue import DEFAULT_MAX_ATTEMPTS, DONE, FAILED, PENDING, RetryableError, WorkQueue, check_response, run_queue
+
+# Serveur interrogé et débit autorisé par défaut (requêtes/s), tous départements confondus
+BALISEMETEO_BASE_URL = "https://www.balisemeteo.com"
+DEFAULT_RATE = 2.0
+DEFAULT_CONCURRENCY = 4
+
+# L'état des balises change souvent : revalidation après une heure
+BALISE_CACHE_TTL = 3600
+
+# File de travail d'une collecte en cours, supprimée une fois tous les départements traités
+QUEUE_FILE = "balises.queue.jsonl"
+
+# Coordonnées dans un lien de carte (q=lat,lon, ll=..., @lat,lon ou lat=...&lon=...)
+LINK_COORDINATES = re.compile(r"(?:[?&](?:q|ll|query|center)=|@)(-?\d+\.\d+),\s*(-?\d+\.\d+)")
+LINK_LAT_LON = re.compile(r"[?&]lat=(-?\d+\.\d+).*?[?&](?:lon|lng)=(-?\d+\.\d+)")
+# Coordonnées écrites dans une cellule : "45.1234, 5.6789" ou "45.1234 / 5.6789"
+TEXT_COORDINATES = re.compile(r"(-?\d{1,2}\.\d{3,})\s*[,;/]?\s*(-?\d{1,3}\.\d{3,})")
+TEXT_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+# Altitude seule dans une cellule : "1450 m"
+TEXT_ALTITUDE = re.compile(r"^\s*(\d{1,4}|\d\s\d{3})\s*m\.?\s*$", re.IGNORECASE)
+
+logger = get_logger("searchBaliseByDpt")
+
+def department_url(department):
+    return f"{BALISEMETEO_BASE_URL}/depart.php?dept={department}"
+
+def fetch_balise_data(department, cache=None, session=None):
+    """
+    Fetch balise data from balisemeteo.com for a specific department.
+    Lève RetryableError / PermanentError (voir work_queue.check_response)
+    ou requests.RequestException en cas d'échec.
+    """
+    url = department_url(department)
+    http = session or requests
+    if cache:
+        response = cache.get(http, url, timeout=30)
+    else:
+        response = http.get(url, timeout=30)
+    return check_response(response, url).text
+
+def balise_columns(header_cells):
+    """
+    Colonnes de position du tableau d'après ses en-têtes :
+    {"latitude": i, "longitude": j, "altitude": k, "coordonnees": l}.
+    """
+    columns = {}
+    for i, cell in enumerate(header_cells):
+        label = cell.get_text(" ", strip=True).lower()
+        if label.startswith("lat"):
+            columns.setdefault("latitude", i)
+        elif label.startswith(("lon", "lng")):
+            columns.setdefault("longitude", i)
+        elif label.startswith("alt"):
+            columns.setdefault("altitude", i)
+        elif any(word in label for word in ("coord", "gps", "position")):
+            columns.setdefault("coordonnees", i)
+    return columns
+
+
+def valid_coordinates(latitude, longitude):
+    return -90 <= latitude <= 90 and -180 <= longitude <= 180
+
+
+def balise_location(cells, columns):
+    """
+    Latitude, longitude et altitude d'une ligne du tableau : d'abord dans les
+    colonnes nommées par les en-têtes, sinon dans un lien de carte ou un
+    texte « lat, lon » de la ligne, et une cellule « 1450 m » pour l'altitude.
+    """
+    location = {}
+
+    def number(name):
+        index = columns.get(name)
+        if index is None or index >= len(cells):
+            return None
+        # Sans espaces : "1 450 m" -> 1450
+        match = TEXT_NUMBER.search("".join(cells[index].get_text().split()))
+        return float(match.group(0).replace(",", ".")) if match else None
+
+    latitude, longitude = number("latitude"), number("longitude")
+    if latitude is None or longitude is None:
+        latitude = longitude = None
+        candidates = [cells[columns["coordonnees"]]] if columns.get("coordonnees", len(cells)) < len(cells) else cells
+        for cell in candidates:
+            for link in cell.find_all("a", href=True):
+                match = LINK_COORDINATES.search(link["href"]) or LINK_LAT_LON.search(link["href"])
+                if match:
+                    latitude, longitude = float(match.group(1)), float(match.group(2))
+                    break
+            else:
+                match = TEXT_COORDINATES.search(cell.get_text(" ", strip=True))
+                if match:
+                    latitude, longitude = float(match.group(1)), float(match.group(2))
+            if latitude is not None:
+                break
+    if latitude is not None and longitude is not None and valid_coordinates(latitude, longitude):
+        # Arrondir à 4 décimales, comme les sites
+        location["latitude"] = round(latitude, 4)
+        location["longitude"] = round(longitude, 4)
+
+    altitude = number("altitude")
+    if altitude is None and "altitude" not in columns:
+        for cell in cells:
+            match = TEXT_ALTITUDE.match(cell.get_text(" ", strip=True))
+            if match:
+                altitude = float(match.group(1).replace(" ", ""))
+                break
+    if altitude is not None:
+        location["altitude"] = int(round(altitude))
+    return location
+
 
 def extract_active_balises(html_content):
-    """Extract active balises from HTML content."""
+    """
+    Extract active balises from HTML content, or None if the balise table is missing.
+    Chaque balise garde sa position quand la page la donne (latitude,
+    longitude, altitude) pour l'association par proximité de _7-addBalises.py.
+    """
     # Si html_content est une chaîne de caractères, pas besoin d'ouvrir un fichier
     if isinstance(html_content, str):
         soup = BeautifulSoup(html_content, "html.parser")
@@ -28,15 +142,16 @@ def extract_active_balises(html_content):
     # Find the table containing the balise data
     table = soup.find('table', {'border': '1', 'cellspacing': '0', 'cellpadding': '1'})
     if not table:
-        print("❌ Table not found in the HTML content.")
-        time.sleep(10)
-        return []
+        logger.warning("❌ Table not found in the HTML content.")
+        return None
     
     # Initialize the result list
     result = []
+    rows = table.find_all('tr')
+    columns = balise_columns(rows[0].find_all(['th', 'td'])) if rows else {}
     
     # Iterate through each row in the table (skip the header row)
-    for row in table.find_all('tr')[1:]:
+    for row in rows[1:]:
         cells = row.find_all('td')
         if len(cells) < 9:
             continue
@@ -52,46 +167,103 @@ def extract_active_balises(html_content):
                 name = name_cell.text.strip()
                 result.append({
                     'url': url,
-                    'nom': name
+                    'nom': name,
+                    **balise_location(cells, columns)
                 })
     
     return result
 
-def process_department(department):
-    """Process a single department and save its data"""
-    print(f"📍 Traitement du département {department}")
-    output_json_file = f"./balises_{department}.json"
+def process_department(department, cache=None, session=None, output_dir="."):
+    """
+    Process a single department and save its data.
+    Une page sans tableau des balises (serveur en maintenance, page
+    tronquée) est retirée du cache et signalée par RetryableError : la
+    file de travail la redemandera plus tard au lieu de bloquer un thread.
+    """
+    logger.debug(f"📍 Traitement du département {department}")
+    output_json_file = os.path.join(output_dir, f"balises_{department}.json")
     
     # Récupérer les données depuis le site web
-    html_content = fetch_balise_data(department)
+    html_content = fetch_balise_data(department, cache, session)
     
-    if html_content:
-        # Extraire les balises et les sites
+    # Extraire les balises et les sites
+    with METRICS.timer("page_parse_seconds", parser="extract_active_balises"):
         balises_and_sites = extract_active_balises(html_content)
-        
-        # Enregistrer les résultats dans un fichier JSON
-        with open(output_json_file, "w", encoding="utf-8") as f:
-            json.dump(balises_and_sites, f, ensure_ascii=False, indent=4)
-        
-        print(f"✅ Résultats enregistrés dans : {output_json_file}")
-        return True
-    return False
-
-# Programme principal
-departments = ["07", "43", "42", "48", "15", "63", "69", "26", "38"]  # Liste des départements à traiter
-successful_depts = []
-failed_depts = []
-
-for dept in departments:
-    if process_department(dept):
-        successful_depts.append(dept)
+    if balises_and_sites is None:
+        if cache:
+            cache.invalidate(department_url(department))
+        raise RetryableError(f"tableau des balises absent de la page du département {department}")
+    
+    # Enregistrer les résultats dans un fichier JSON, remplacé d'un bloc
+    write_json_atomic(balises_and_sites, output_json_file)
+    
+    logger.info(f"✅ Résultats enregistrés dans : {output_json_file}")
+    return True
+
+
+def main():
+    """Programme principal : départements traités en parallèle, débit limité par hôte"""
+    parser = argparse.ArgumentParser(description="Recherche les balises actives de balisemeteo.com par département")
+    add_department_arguments(parser)
+    parser.add_argument("--concurrence", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"nombre de départements traités simultanément (défaut : {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--essais", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"essais par département avant abandon (défaut : {DEFAULT_MAX_ATTEMPTS})")
+    parser.add_argument("--debit", type=float, default=DEFAULT_RATE,
+                        help=f"requêtes par seconde maximum vers {BALISEMETEO_BASE_URL} (défaut : {DEFAULT_RATE})")
+    parser.add_argument("--sortie", default=".", help="dossier des fichiers balises_XX.json (défaut : .)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup(args)
+
+    departments = selected_departments(args, DEFAULT_DEPARTMENTS)
+    cache = HttpCache(ttl=BALISE_CACHE_TTL)
+    stats = CrawlStats()
+
+    # Reprise d'une collecte interrompue : les départements demandés déjà
+    # traités ne sont pas redemandés ; sinon nouvelle collecte de tous les départements
+    queue_file = os.path.join(args.sortie, QUEUE_FILE)
+    queue = WorkQueue(queue_file, args.essais)
+    if any(item["etat"] == PENDING for item in queue.items.values()):
+        pending = [dept for dept in departments if queue.items.get(dept, {}).get("etat") != DONE]
+        print(f"Reprise : {len(departments) - len(pending)} départements demandés déjà traités d'après "
+              f"'{queue_file}', {len(pending)} restants (en attente, en échec ou nouveaux).")
     else:
-        failed_depts.append(dept)
-    time.sleep(1)  # Pause d'une seconde entre chaque requête pour éviter la surcharge du serveur
+        queue.reset()
+        pending = departments
+
+    # Le seau à jetons de l'hôte remplace la pause d'une seconde entre deux départements
+    with RateLimitedSession(HostRateLimiter(args.debit), pool_size=args.concurrence) as session, queue, \
+            METRICS.stage("balises") as stage:
+        # La file ne garde que les départements demandés cette fois, ceux en
+        # échec étant remis en attente avec de nouveaux essais
+        requested = set(departments)
+        queue.discard([dept for dept, item in queue.items.items()
+                       if dept not in requested or item["etat"] == FAILED])
+        queue.add(pending)
+
+        def worker(dept):
+            return process_department(dept, cache, session, args.sortie)
+
+        stage.records_in = len(pending)
+        for _ in run_queue(queue, worker, args.concurrence, stats, session=session, label="Département"):
+            pass
+        stage.records_out = stats.ok
+    states = {dept: queue.items.get(dept, {}).get("etat") for dept in departments}
+    successful_depts = [dept for dept in departments if states[dept] == DONE]
+    failed_depts = [dept for dept in departments if states[dept] == FAILED]
+    if not any(state == PENDING for state in states.values()):
+        queue.reset()
+
+    # Afficher le résumé
+    print("\n📊 Résumé du traitement :")
+    print(f"✅ Départements traités avec succès ({len(successful_depts)}): {', '.join(successful_depts)}")
+    if failed_depts:
+        print(f"❌ Départements en échec ({len(failed_depts)}): {', '.join(failed_depts)}")
+    print(f"⏱️ Durée : {stats.elapsed:.1f} s")
+    cache.print_stats()
+    export(args, "searchBaliseByDpt")
 
-# Afficher le résumé
-print("\n📊 Résumé du traitement :")
-print(f"✅ Départements traités avec succès ({len(successful_depts)}): {', '.join(successful_depts)}")
-if failed_depts:
-    print(f"❌ Départements en échec ({len(failed_depts)}): {', '.join(failed_depts)}")
 
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,26 @@
+import argparse
 import json
+import os
 import re
+import sys
 import time
-def add_balises_to_sites(sites_file, balises_file, output_file):
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+from site_store import add_store_argument, open_store
+from balise_locator import DEFAULT_ALTITUDE_BAND, DEFAULT_NEAREST, DEFAULT_RADIUS_KM, BaliseLocator
+from balise_matcher import BaliseMatcher, normalize_balise_name, normalize_site_name
+
+def add_balises_to_sites(sites_file, balises_file, output_file, verbose=True, radius_km=DEFAULT_RADIUS_KM,
+                         k=DEFAULT_NEAREST, altitude_band=DEFAULT_ALTITUDE_BAND):
     """
     Ajoute les balises disponibles aux sites dans le fichier merged_sites.json.
     
     :param sites_file: Chemin du fichier JSON contenant les sites (merged_sites.json).
     :param balises_file: Chemin du fichier JSON contenant les balises (balises_example.json).
     :param output_file: Chemin du fichier JSON de sortie avec les balises ajoutées.
+    :param verbose: Affiche une ligne par site, sinon uniquement les statistiques.
+    :param radius_km, k, altitude_band: Association par proximité (voir associate_balises).
+    :return: Liste des sites avec leurs balises.
     """
     # Charger les fichiers JSON
     with open(sites_file, "r", encoding="utf-8") as f:
@@ -15,11 +28,46 @@ def add_balises_to_sites(sites_file, balises_file, output_file):
     
     with open(balises_file, "r", encoding="utf-8") as f:
         balises = json.load(f)
+
+    associate_balises(sites, balises, verbose, radius_km, k, altitude_band)
+    
+    # Sauvegarder les sites mis à jour dans le fichier de sortie
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(sites, f, ensure_ascii=False, indent=4)
     
+    print(f"✅ Les balises ont été ajoutées et enregistrées dans : {output_file}")
+    return sites
+
+
+def associate_balises(sites, balises, verbose=True, radius_km=DEFAULT_RADIUS_KM, k=DEFAULT_NEAREST,
+                      altitude_band=DEFAULT_ALTITUDE_BAND):
+    """
+    Ajoute aux sites (modifiés en place) les balises dont le nom apparaît
+    dans leur nom, puis les `k` balises les plus proches du décollage (à
+    moins de `radius_km` km et `altitude_band` m de dénivelé, pour les
+    balises dont les coordonnées sont connues), et remplace les URLs
+    intranet par celles de balisemeteo. Les balises proches sont aussi
+    listées avec leur distance dans le champ "balises_proches".
+
+    :param sites: Liste des sites.
+    :param balises: Liste des balises ({"url": ..., "nom": ..., "latitude", "longitude", "altitude"}).
+    :param verbose: Affiche une ligne par site, sinon uniquement les statistiques.
+    :return: La liste des sites.
+    """
+    start = time.perf_counter()
+    # Noms de balises normalisés une seule fois et indexés dans un automate
+    matcher = BaliseMatcher(balises)
+    # Balises géolocalisées rangées une seule fois dans une grille
+    locator = BaliseLocator(balises, radius_km, k, altitude_band)
+    matched_sites = 0
+    located_sites = 0
+    used_balises = set()
+
     # Parcourir chaque site et vérifier si une balise correspond
     for site in sites:
-        site_name = site.get("nom", "").lower().replace("-", " ").replace("saint", "st").replace("é", "e").replace("ff", "f")
-        print(f"Traitement du site : {site_name}")
+        matches = matcher.match(site.get("nom", ""))
+        if verbose:
+            print(f"Traitement du site : {normalize_site_name(site.get('nom', ''))}")
 
         # Conserver les balises existantes si présentes
         existing_balises = site.get("balise", [])
@@ -27,12 +75,27 @@ def add_balises_to_sites(sites_file, balises_file, output_file):
             existing_balises = [existing_balises]
         site["balise"] = existing_balises.copy()  # Initialiser avec les balises existantes
         
-        for balise in balises:
-            balise_name = balise.get("nom", "").lower().replace("-", " ").replace("saint", "st").replace("ff", "f")
-            if balise_name in site_name:
-                print(f"✅balise trouvée: {balise_name}")
-                if balise["url"] not in site["balise"]:  # Éviter les doublons
-                    site["balise"].append(balise["url"])
+        for balise in matches:
+            if verbose:
+                print(f"✅balise trouvée: {normalize_balise_name(balise.get('nom', ''))}")
+            used_balises.add(balise["url"])
+            if balise["url"] not in site["balise"]:  # Éviter les doublons
+                site["balise"].append(balise["url"])
+        nearby = locator.nearest(site)
+        for distance, balise in nearby:
+            if verbose:
+                print(f"📍balise à {distance:.1f} km: {balise.get('nom', '')}")
+            used_balises.add(balise["url"])
+            if balise["url"] not in site["balise"]:
+                site["balise"].append(balise["url"])
+        if nearby:
+            site["balises_proches"] = [{"url": balise["url"], "nom": balise.get("nom"), "distance_km": round(distance, 2)}
+                                       for distance, balise in nearby]
+            located_sites += 1
+        else:
+            site.pop("balises_proches", None)
+        if matches or nearby:
+            matched_sites += 1
         
         # Supprimer le champ "balise" uniquement si aucune balise n'est présente
         if not site["balise"]:
@@ -44,12 +107,15 @@ def add_balises_to_sites(sites_file, balises_file, output_file):
 
     # Vérifier et remplacer les URLs spécifiques
     replace_specific_url(sites)
-    
-    # Sauvegarder les sites mis à jour dans le fichier de sortie
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(sites, f, ensure_ascii=False, indent=4)
-    
-    print(f"✅ Les balises ont été ajoutées et enregistrées dans : {output_file}")
+
+    if not verbose:
+        unused = [balise.get("nom", "") for balise in balises if balise["url"] not in used_balises]
+        print(f"📊 {len(sites)} sites, {len(balises)} balises ({len(locator)} géolocalisées) : "
+              f"{matched_sites} sites associés à une balise (dont {located_sites} par proximité), "
+              f"{len(balises) - len(unused)} balises utilisées en {time.perf_counter() - start:.3f} s")
+        if unused:
+            print(f"ℹ️ Balises sans site ({len(unused)}) : {', '.join(unused)}")
+    return sites
 
 
 def replace_specific_url(sites):
@@ -63,27 +129,46 @@ def replace_specific_url(sites):
     for site in sites:
         if "balise" in site:
             # Remplacer les URLs qui correspondent au modèle
-            updated_balises = []
-            for url in site["balise"]:
-                if url.startswith("https://intranet.ffvl.fr/structure/"):
-                    # Extraire le dernier chiffre de l'URL
-                    match = re.search(r"/(\d+)$", url)
-                    if match:
-                        balise_id = match.group(1)
-                        # Construire la nouvelle URL
-                        new_url = f"https://www.balisemeteo.com/balise.php?idBalise={balise_id}"
-                        updated_balises.append(new_url)
-                    else:
-                        updated_balises.append(url)  # Conserver l'URL d'origine si aucun ID trouvé
-                else:
-                    updated_balises.append(url)  # Conserver l'URL d'origine si elle ne correspond pas
-            site["balise"] = updated_balises
-
-
-# Chemins des fichiers
-sites_file = "./merged_sites.json"
-balises_file = "./balises_all.json"
-output_file = "./merged_sites_with_balises.json"
-
-# Ajouter les balises aux sites
-add_balises_to_sites(sites_file, balises_file, output_file)
\ No newline at end of file
+            site["balise"] = [balisemeteo_url(url) for url in site["balise"]]
+        for balise in site.get("balises_proches", ()):
+            balise["url"] = balisemeteo_url(balise["url"])
+
+
+def balisemeteo_url(url):
+    """URL balisemeteo d'une URL intranet, ou l'URL d'origine si elle ne correspond pas au modèle."""
+    if url.startswith("https://intranet.ffvl.fr/structure/"):
+        # Extraire le dernier chiffre de l'URL
+        match = re.search(r"/(\d+)$", url)
+        if match:
+            # Construire la nouvelle URL
+            return f"https://www.balisemeteo.com/balise.php?idBalise={match.group(1)}"
+    return url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Associe les balises météo aux sites par leur nom et leur proximité")
+    parser.add_argument("--stats", action="store_true",
+                        help="affiche les statistiques d'association au lieu d'une ligne par site")
+    parser.add_argument("--rayon", type=float, default=DEFAULT_RADIUS_KM,
+                        help=f"distance maximale en km d'une balise au décollage (défaut : {DEFAULT_RADIUS_KM})")
+    parser.add_argument("--nombre", type=int, default=DEFAULT_NEAREST,
+                        help=f"balises proches retenues par site, 0 pour n'associer que par le nom (défaut : {DEFAULT_NEAREST})")
+    parser.add_argument("--denivele", type=float, default=DEFAULT_ALTITUDE_BAND,
+                        help=f"écart d'altitude maximal en m entre la balise et le décollage (défaut : {DEFAULT_ALTITUDE_BAND})")
+    add_store_argument(parser)
+    args = parser.parse_args()
+
+    # Chemins des fichiers
+    sites_file = "./merged_sites.json"
+    balises_file = "./balises_all.json"
+    output_file = "./merged_sites_with_balises.json"
+
+    # Ajouter les balises aux sites
+    sites = add_balises_to_sites(sites_file, balises_file, output_file, verbose=not args.stats,
+                                 radius_km=args.rayon, k=args.nombre, altitude_band=args.denivele)
+
+    store = open_store(args)
+    if store is not None:
+        with store:
+            changed, removed = store.replace_sites(sites)
+        print(f"🗄️ Base {args.base} : {changed} sites mis à jour, {removed} supprimés")
\ No newline at end of file
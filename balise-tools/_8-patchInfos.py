@@ -1,62 +1,65 @@
+import argparse
 import json
+import os
+import sys
 
-def apply_corrections(sites_file, corrections_file, output_file):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+from site_store import add_store_argument, open_store
+from corrections_engine import CorrectionsEngine
+
+
+def apply_corrections(sites_file, corrections_file, output_file, report_unused=True, store=None):
     """
     Applique des corrections aux noms et orientations des sites dans un fichier JSON.
     Permet également de supprimer des sites si le paramètre "supprimer" est défini sur True.
     
     :param sites_file: Chemin du fichier JSON contenant les sites (merged_sites_with_balises.json).
-    :param corrections_file: Chemin du fichier JSON contenant les corrections (corrections.json).
+    :param corrections_file: Chemin du fichier JSON contenant les corrections (corrections.json),
+                             ou liste de fichiers du moins au plus prioritaire.
     :param output_file: Chemin du fichier JSON de sortie avec les corrections appliquées.
+    :param report_unused: Afficher les corrections qui ne correspondent à aucun site.
+    :param store: Base SiteStore à mettre à jour avec les sites corrigés (optionnel).
     """
     # Charger les fichiers JSON
     with open(sites_file, "r", encoding="utf-8") as f:
         sites = json.load(f)
-    
-    with open(corrections_file, "r", encoding="utf-8") as f:
-        corrections = json.load(f)
-    
-    # Liste pour stocker les sites à conserver
-    updated_sites = []
 
-    # Appliquer les corrections
-    for site in sites:
-        # Vérifier si le site doit être corrigé ou supprimé
-        site_modified = False
-        for correction in corrections:
-            nom_actuel = correction.get("nom_actuel", "").lower()  # Convertir en minuscule pour éviter les problèmes de casse
-            nouveau_nom = correction.get("nouveau_nom")
-            nouvelle_orientation = correction.get("nouvelle_orientation")
-            supprimer = correction.get("supprimer", False)  # Par défaut, ne pas supprimer
-            
-            if site.get("nom", "").lower() == nom_actuel:  # Comparer les noms en minuscule
-                if supprimer:
-                    print(f"🗑️ Site supprimé : {nom_actuel}")
-                    site_modified = True  # Marquer le site comme modifié pour ne pas l'ajouter
-                    break  # Ne pas ajouter ce site à la liste mise à jour
-                if nouveau_nom:
-                    site["nom"] = nouveau_nom
-                if nouvelle_orientation:
-                    site["orientation"] = nouvelle_orientation
-                print(f"✅ Correction appliquée : {nom_actuel} -> {nouveau_nom}, Orientation : {nouvelle_orientation}")
-                site_modified = True  # Marquer le site comme modifié
-                break
-        
-        # Ajouter le site corrigé ou non modifié à la liste mise à jour
-        if not site_modified or not supprimer:
-            updated_sites.append(site)
-    
+    corrections_files = [corrections_file] if isinstance(corrections_file, str) else list(corrections_file)
+    engine = CorrectionsEngine.load(corrections_files)
+
+    # Appliquer les corrections en un seul passage
+    updated_sites = engine.apply(sites)
+
     # Sauvegarder les sites corrigés dans le fichier de sortie
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(updated_sites, f, ensure_ascii=False, indent=4)
-    
+
     print(f"✅ Les corrections ont été appliquées et enregistrées dans : {output_file}")
+    if store is not None:
+        changed, removed = store.replace_sites(updated_sites)
+        print(f"🗄️ Base {store.path} : {changed} sites mis à jour, {removed} supprimés")
+    if report_unused:
+        engine.print_unused()
+    return engine
 
 
-# Chemins des fichiers
-sites_file = "./merged_sites_with_balises.json"
-corrections_file = "./corrections.json"
-output_file = "./merged_sites_with_balises_corrected.json"
+def main():
+    parser = argparse.ArgumentParser(description="Applique les corrections manuelles au catalogue des sites")
+    parser.add_argument("corrections", nargs="*", default=["./corrections.json"],
+                        help="fichiers de corrections, du moins au plus prioritaire (défaut : ./corrections.json)")
+    parser.add_argument("--sites", default="./merged_sites_with_balises.json", help="catalogue des sites à corriger")
+    parser.add_argument("--sortie", default="./merged_sites_with_balises_corrected.json", help="fichier de sortie")
+    add_store_argument(parser)
+    args = parser.parse_args()
+
+    # Appliquer les corrections
+    store = open_store(args)
+    try:
+        apply_corrections(args.sites, args.corrections, args.sortie, store=store)
+    finally:
+        if store is not None:
+            store.close()
+
 
-# Appliquer les corrections
-apply_corrections(sites_file, corrections_file, output_file)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
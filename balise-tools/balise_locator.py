@@ -0,0 +1,46 @@
+from spatial_index import GridIndex
+
+# Valeurs par défaut de l'association par proximité
+DEFAULT_RADIUS_KM = 10
+DEFAULT_NEAREST = 3
+DEFAULT_ALTITUDE_BAND = 600
+
+
+class BaliseLocator:
+    """
+    Association des balises aux sites par proximité : les `k` balises les
+    plus proches à moins de `radius_km` du décollage, dont l'altitude est à
+    moins de `altitude_band` mètres de la sienne (une balise de fond de
+    vallée ne renseigne pas sur le vent au décollage). Une altitude
+    inconnue, du site ou de la balise, n'écarte pas la balise.
+
+    Les balises sont rangées une seule fois dans une grille (GridIndex) :
+    chaque site ne parcourt que les cellules voisines, soit un coût total
+    proportionnel au nombre de sites et de balises. Les balises sans
+    coordonnées sont ignorées.
+
+    :param balises: Liste des balises ({"url", "nom", "latitude", "longitude", "altitude"}).
+    """
+
+    def __init__(self, balises, radius_km=DEFAULT_RADIUS_KM, k=DEFAULT_NEAREST, altitude_band=DEFAULT_ALTITUDE_BAND):
+        self.radius_km = radius_km
+        self.k = k
+        self.altitude_band = altitude_band
+        self.index = GridIndex(balises)
+
+    def __len__(self):
+        return self.index.size
+
+    def nearest(self, site):
+        """
+        Balises retenues pour un site, sous forme de liste (distance_km, balise)
+        triée par distance croissante ; vide si le site n'a pas de coordonnées.
+        """
+        if not self.index.size or self.k <= 0 or site.get("latitude") is None or site.get("longitude") is None:
+            return []
+        accept = None
+        altitude = site.get("altitude")
+        if altitude is not None and self.altitude_band is not None:
+            def accept(balise):
+                return balise.get("altitude") is None or abs(balise["altitude"] - altitude) <= self.altitude_band
+        return self.index.nearest(site["latitude"], site["longitude"], self.k, self.radius_km, accept)
@@ -0,0 +1,87 @@
+from collections import deque
+
+
+def normalize_site_name(name):
+    """Normalisation du nom d'un site avant la recherche des balises."""
+    return name.lower().replace("-", " ").replace("saint", "st").replace("é", "e").replace("ff", "f")
+
+
+def normalize_balise_name(name):
+    """Normalisation du nom d'une balise (sans remplacement des accents)."""
+    return name.lower().replace("-", " ").replace("saint", "st").replace("ff", "f")
+
+
+class BaliseMatcher:
+    """
+    Recherche simultanée de tous les noms de balises dans un nom de site
+    (automate d'Aho-Corasick).
+
+    Chaque nom de balise est normalisé une seule fois à la construction ;
+    un nom de site est ensuite parcouru en un seul passage, quel que soit le
+    nombre de balises. Le résultat est identique au test
+    `balise_name in site_name` appliqué à chaque balise.
+
+    :param balises: Liste des balises ({"url": ..., "nom": ...}).
+    """
+
+    def __init__(self, balises):
+        self.balises = balises
+        # Automate : transitions, lien d'échec et balises reconnues par état
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        # Un nom vide est contenu dans tous les noms de site
+        self.always = []
+        for index, balise in enumerate(balises):
+            pattern = normalize_balise_name(balise.get("nom", ""))
+            if pattern:
+                self._add(pattern, index)
+            else:
+                self.always.append(index)
+        self._build_fail_links()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(index)
+
+    def _build_fail_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                # Les motifs suffixes sont aussi reconnus dans cet état
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, site_name):
+        """
+        Indices des balises dont le nom normalisé apparaît dans le nom de
+        site (déjà normalisé), dans l'ordre de la liste des balises.
+        """
+        found = set(self.always)
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in site_name:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return sorted(found)
+
+    def match(self, site_name):
+        """Balises correspondant à un nom de site brut."""
+        return [self.balises[index] for index in self.find(normalize_site_name(site_name))]
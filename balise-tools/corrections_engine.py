@@ -0,0 +1,110 @@
+import json
+
+from site_rules import sectors_mask
+
+
+class CorrectionsEngine:
+    """
+    Corrections manuelles des sites, indexées une seule fois.
+
+    Une correction est trouvée par l'identifiant du site ("id") s'il est
+    renseigné, sinon par son nom actuel ("nom_actuel", sans tenir compte de
+    la casse). Une correction par identifiant l'emporte sur une correction
+    par nom. Dans un même fichier, la première correction d'un site
+    s'applique, comme auparavant ; entre plusieurs fichiers, le dernier
+    chargé est prioritaire (ex: corrections.json puis corrections locales).
+
+    :param sources: Liste de (nom de la source, liste de corrections), de la
+                    moins prioritaire à la plus prioritaire.
+    """
+
+    def __init__(self, sources):
+        self.rules = []
+        self.by_id = {}
+        self.by_name = {}
+        for source, corrections in sources:
+            file_by_id = {}
+            file_by_name = {}
+            for position, correction in enumerate(corrections):
+                rule = {"source": source, "position": position, "correction": correction, "used": 0}
+                self.rules.append(rule)
+                if correction.get("id") is not None:
+                    file_by_id.setdefault(str(correction["id"]), rule)
+                if "nom_actuel" in correction or correction.get("id") is None:
+                    file_by_name.setdefault(correction.get("nom_actuel", "").lower(), rule)
+            # Un fichier plus prioritaire remplace les règles des précédents
+            self.by_id.update(file_by_id)
+            self.by_name.update(file_by_name)
+
+    @classmethod
+    def load(cls, paths):
+        sources = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                sources.append((path, json.load(f)))
+        return cls(sources)
+
+    def lookup(self, site):
+        """Règle qui s'applique au site, ou None."""
+        rule = None
+        if site.get("id") is not None:
+            rule = self.by_id.get(str(site["id"]))
+        if rule is None:
+            rule = self.by_name.get(site.get("nom", "").lower())
+        return rule
+
+    def apply(self, sites):
+        """
+        Applique les corrections en un seul passage et renvoie la liste des
+        sites conservés (les sites marqués "supprimer" sont retirés).
+        """
+        updated_sites = []
+        for site in sites:
+            rule = self.lookup(site)
+            if rule is None:
+                updated_sites.append(site)
+                continue
+            rule["used"] += 1
+            correction = rule["correction"]
+            nom_actuel = correction.get("nom_actuel", site.get("nom", "")).lower()
+            if correction.get("supprimer", False):
+                print(f"🗑️ Site supprimé : {nom_actuel}")
+                continue
+            nouveau_nom = correction.get("nouveau_nom")
+            nouvelle_orientation = correction.get("nouvelle_orientation")
+            if nouveau_nom:
+                site["nom"] = nouveau_nom
+            if nouvelle_orientation:
+                site["orientation"] = nouvelle_orientation
+                if "secteurs_favorables" in site:
+                    self.correct_sectors(site, nouvelle_orientation)
+            print(f"✅ Correction appliquée : {nom_actuel} -> {nouveau_nom}, Orientation : {nouvelle_orientation}")
+            updated_sites.append(site)
+        return updated_sites
+
+    @staticmethod
+    def correct_sectors(site, orientation):
+        """
+        Remplace les secteurs favorables du site par l'orientation corrigée,
+        qui n'est plus comptée parmi ses secteurs défavorables.
+        """
+        favorable = sectors_mask(orientation)
+        if favorable is None:
+            return
+        site["secteurs_favorables"] = favorable
+        unfavorable = (site.get("secteurs_defavorables") or 0) & ~favorable
+        site["secteurs_defavorables"] = unfavorable or None
+
+    def unused(self):
+        """Règles qui n'ont été appliquées à aucun site."""
+        return [rule for rule in self.rules if not rule["used"]]
+
+    def print_unused(self):
+        unused = self.unused()
+        if not unused:
+            return
+        print(f"ℹ️ Corrections sans effet ({len(unused)}) :")
+        for rule in unused:
+            correction = rule["correction"]
+            target = correction.get("nom_actuel") or f"id {correction.get('id')}"
+            print(f"   - {target} ({rule['source']}, règle n°{rule['position'] + 1})")
@@ -0,0 +1,268 @@
+"""
+Mesure chaque étape du traitement (temps et pic mémoire) sur les fichiers
+réels du dépôt puis sur des catalogues synthétiques de 10k et 100k sites,
+et enregistre les résultats en JSON pour les comparer d'une exécution à
+l'autre. Les étapes de collecte interrogent un serveur HTTP local.
+
+Le pic mémoire est celui des allocations Python (tracemalloc), mesuré lors
+d'une exécution séparée : le traçage ralentit le code et fausserait les temps.
+
+Usage : python benchmarks/bench_pipeline.py [--tailles 10000,100000]
+                                            [--sortie resultats.json] [--reference baseline.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import requests
+
+from common import BALISE_TOOLS_DIR, ROOT, best_time, load_script
+from fixtures import make_archive_response, make_balises, make_corrections, make_listing_page, make_sites
+from stub_server import terrain_server
+
+sys.path.insert(0, BALISE_TOOLS_DIR)
+
+from balise_history import BaliseHistory
+from balise_poller import BalisePoller
+from checkpoint import write_json_atomic
+from climatology import ClimateArchive, climatology, ingest_files
+from site_rules import get_average_orientation, mask_sectors
+
+STAGES = ("parse_html_to_json", "extract_data_from_site", "get_average_orientation",
+          "add_balises_to_sites", "apply_corrections", "poll_balises", "climatology")
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "resultats.json")
+
+# Jours d'historique horaire archivés par site pour l'étape climatology
+CLIMATOLOGY_DAYS = 31
+
+# Proportions des fichiers réels : ~1 balise pour 4 sites, ~1 correction pour 20
+BALISES_PER_SITE = 0.25
+CORRECTIONS_PER_SITE = 0.05
+
+
+class Dataset:
+    """
+    Fichiers d'entrée d'un jeu de données.
+
+    :param name: "reel" ou taille du catalogue synthétique.
+    :param site_ids: Identifiants des pages terrain à récupérer (un par ligne de la liste).
+    :param sites_count: Nombre de sites du catalogue `sites_file`.
+    :param orientations: Secteurs favorables de chaque site ("SO;O;NO").
+    """
+
+    def __init__(self, name, listing, sites_file, sites_count, balises_file, corrections_file, site_ids,
+                 orientations):
+        self.name = name
+        self.listing = listing
+        self.sites_file = sites_file
+        self.sites_count = sites_count
+        self.balises_file = balises_file
+        self.corrections_file = corrections_file
+        self.site_ids = site_ids
+        self.orientations = orientations
+
+
+def real_dataset():
+    """Fichiers réels du dépôt."""
+    with open(os.path.join(ROOT, "tools", "sites_ffvl.json"), "r", encoding="utf-8") as f:
+        site_ids = [site["id"] for site in json.load(f)]
+    with open(os.path.join(BALISE_TOOLS_DIR, "merged_sites.json"), "r", encoding="utf-8") as f:
+        sites = json.load(f)
+    # Catalogue d'avant les masques de secteurs ('orientation_all') ou d'après
+    orientations = [site.get("orientation_all") or mask_sectors(site.get("secteurs_favorables")) for site in sites]
+    return Dataset("reel",
+                   os.path.join(ROOT, "tools", "_0-reponse_ffvl.html"),
+                   os.path.join(BALISE_TOOLS_DIR, "merged_sites.json"), len(sites),
+                   os.path.join(BALISE_TOOLS_DIR, "balises_all.json"),
+                   os.path.join(BALISE_TOOLS_DIR, "corrections.json"),
+                   site_ids, orientations)
+
+
+def synthetic_dataset(count, folder):
+    """Catalogue synthétique de `count` sites, écrit dans `folder`."""
+    sites = make_sites(count)
+    paths = {name: os.path.join(folder, f"{name}_{count}.json") for name in ("sites", "balises", "corrections")}
+    listing = os.path.join(folder, f"liste_{count}.html")
+    with open(listing, "w", encoding="utf-8") as f:
+        f.write(make_listing_page(sites))
+    for name, data in (("sites", sites),
+                       ("balises", make_balises(sites, int(count * BALISES_PER_SITE))),
+                       ("corrections", make_corrections(sites, int(count * CORRECTIONS_PER_SITE)))):
+        with open(paths[name], "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+    return Dataset(str(count), listing, paths["sites"], count, paths["balises"], paths["corrections"],
+                   [site["id"] for site in sites], [mask_sectors(site["secteurs_favorables"]) for site in sites])
+
+
+def stage_runner(stage, dataset, scripts, session, folder, pages, base_url):
+    """
+    Fonction exécutant l'étape sur le jeu de données, et nombre d'éléments traités.
+    """
+    if stage == "parse_html_to_json":
+        return lambda: scripts["_1"].parse_html_to_json(dataset.listing), len(dataset.site_ids)
+    if stage == "extract_data_from_site":
+        site_ids = dataset.site_ids[:pages]
+        return lambda: [scripts["_2"].extract_data_from_site(site_id, session) for site_id in site_ids], len(site_ids)
+    if stage == "get_average_orientation":
+        orientations = [value.split(";") for value in dataset.orientations
+                        if value and "non" not in value.lower()]
+        return lambda: [get_average_orientation(value) for value in orientations], len(orientations)
+
+    if stage == "poll_balises":
+        with open(dataset.balises_file, "r", encoding="utf-8") as f:
+            balises = json.load(f)[:pages]
+        poller = BalisePoller(balises, BaliseHistory(), session, base_url)
+        return lambda: asyncio.run(poller.poll_once()), len(balises)
+
+    if stage == "climatology":
+        with open(dataset.sites_file, "r", encoding="utf-8") as f:
+            sites = json.load(f)[:pages]
+        fixtures = os.path.join(folder, f"archive_{dataset.name}")
+        os.makedirs(fixtures, exist_ok=True)
+        paths = []
+        for site in sites:
+            paths.append(os.path.join(fixtures, f"{site['id']}.json"))
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                json.dump(make_archive_response(site, datetime(2024, 7, 1, tzinfo=timezone.utc),
+                                                CLIMATOLOGY_DAYS * 24), f)
+        archive_dir = os.path.join(folder, f"climatologie_{dataset.name}")
+
+        def run():
+            shutil.rmtree(archive_dir, ignore_errors=True)
+            archive = ClimateArchive(archive_dir)
+            ingest_files(archive, paths)
+            archive.flush()
+            return climatology(archive, sites)
+        return run, len(sites)
+
+    output = os.path.join(folder, f"{stage}_{dataset.name}.json")
+    if stage == "add_balises_to_sites":
+        return lambda: scripts["_7"].add_balises_to_sites(dataset.sites_file, dataset.balises_file, output,
+                                                          verbose=False), dataset.sites_count
+    return lambda: scripts["_8"].apply_corrections(dataset.sites_file, dataset.corrections_file, output,
+                                                   report_unused=False), dataset.sites_count
+
+
+def quiet(func):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+    return run
+
+
+def measure(func, repeat):
+    """Meilleur temps (s) sur `repeat` essais, puis pic mémoire (octets) d'un essai tracé."""
+    seconds = best_time(func, repeat)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmarks(stages, sizes, repeat, pages):
+    scripts = {
+        "_1": load_script("tools/_1-analyseffvl.py"),
+        "_2": load_script("tools/_2-requestInfosSite.py"),
+        "_7": load_script("balise-tools/_7-addBalises.py"),
+        "_8": load_script("balise-tools/_8-patchInfos.py"),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as folder, terrain_server() as base_url, requests.Session() as session:
+        scripts["_2"].FFVL_BASE_URL = base_url
+        datasets = [real_dataset()]
+        for count in sizes:
+            print(f"🧪 Génération du catalogue synthétique de {count} sites")
+            datasets.append(synthetic_dataset(count, folder))
+
+        for dataset in datasets:
+            for stage in stages:
+                func, count = stage_runner(stage, dataset, scripts, session, folder, pages, base_url)
+                seconds, peak = measure(quiet(func), repeat)
+                key = f"{stage}[{dataset.name}]"
+                results[key] = {"etape": stage, "jeu": dataset.name, "elements": count,
+                                "temps_s": round(seconds, 6), "memoire_pic_ko": round(peak / 1024, 1)}
+                print(f"⏱️ {key:<42} {count:>7} éléments : {seconds * 1000:10.1f} ms, "
+                      f"{seconds / max(count, 1) * 1e6:8.1f} µs/élément, pic {peak / 1024 / 1024:8.1f} Mo")
+    return results
+
+
+def compare(results, reference, threshold):
+    """
+    Compare les mesures à celles d'une exécution de référence.
+
+    :return: Nombre de mesures dégradées de plus de `threshold` (ex: 0.2 pour 20 %).
+    """
+    regressions = 0
+    print(f"\n📊 Comparaison avec la référence du {reference.get('date', '?')} :")
+    for key, result in results.items():
+        previous = reference.get("cas", {}).get(key)
+        if previous is None:
+            print(f"   🆕 {key:<42} nouveau")
+            continue
+        if previous["elements"] != result["elements"]:
+            print(f"   ⚠️ {key:<42} non comparable ({previous['elements']} -> {result['elements']} éléments)")
+            continue
+        ratios = {name: result[name] / previous[name] if previous[name] else 1.0
+                  for name in ("temps_s", "memoire_pic_ko")}
+        worse = [name for name, ratio in ratios.items() if ratio > 1 + threshold]
+        regressions += len(worse)
+        print(f"   {'❌' if worse else '✅'} {key:<42} temps x{ratios['temps_s']:.2f}, "
+              f"mémoire x{ratios['memoire_pic_ko']:.2f}")
+    return regressions
+
+
+def parse_sizes(value):
+    return [int(size) for size in value.split(",") if size.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tailles", type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help="tailles des catalogues synthétiques, séparées par des virgules (défaut : 10000,100000)")
+    parser.add_argument("--etapes", nargs="+", choices=STAGES, default=list(STAGES), help="étapes mesurées")
+    parser.add_argument("--repetitions", type=int, default=3, help="essais par mesure (meilleur temps retenu)")
+    parser.add_argument("--pages", type=int, default=500,
+                        help="nombre maximal de pages terrain et balises récupérées, et de sites archivés, "
+                             "par jeu de données (défaut : 500)")
+    parser.add_argument("--sortie", default=DEFAULT_OUTPUT, help="fichier JSON des résultats")
+    parser.add_argument("--reference", help="résultats JSON d'une exécution précédente à comparer")
+    parser.add_argument("--seuil", type=float, default=0.2,
+                        help="dégradation tolérée avant de signaler une régression (défaut : 0.2, soit 20 %%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.etapes, args.tailles, args.repetitions, args.pages)
+    write_json_atomic({
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "repetitions": args.repetitions,
+        "cas": results,
+    }, args.sortie)
+    print(f"\n✅ Résultats enregistrés dans : {args.sortie}")
+
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        regressions = compare(results, reference, args.seuil)
+        if regressions:
+            print(f"❌ {regressions} mesure(s) dégradée(s) de plus de {args.seuil:.0%}")
+            sys.exit(1)
+        print("✅ Aucune régression")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare la recherche des sites proches par index de grille (spatial_index)
+au parcours complet de findNearbySites(), sur 1k, 10k et 100k sites
+synthétiques, et vérifie que les résultats sont identiques.
+
+Usage : python benchmarks/bench_spatial_index.py [--requetes N] [--rayon KM]
+"""
+import argparse
+import random
+
+from common import best_time
+from fixtures import make_sites
+from spatial_index import GridIndex, linear_nearby
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requetes", type=int, default=200, help="nombre de recherches par taille")
+    parser.add_argument("--rayon", type=float, default=30, help="rayon de recherche en km")
+    parser.add_argument("--k", type=int, default=5, help="nombre de plus proches voisins")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    queries = [(rng.uniform(42.3, 51.0), rng.uniform(-4.8, 8.2)) for _ in range(args.requetes)]
+
+    for count in (1_000, 10_000, 100_000):
+        sites = make_sites(count)
+        index = GridIndex(sites)
+        for latitude, longitude in queries[:20]:
+            expected = {id(site) for site in linear_nearby(sites, latitude, longitude, args.rayon)}
+            assert {id(site) for site in index.nearby(latitude, longitude, args.rayon)} == expected
+
+        linear = best_time(lambda: [linear_nearby(sites, lat, lon, args.rayon) for lat, lon in queries], repeat=1)
+        grid = best_time(lambda: [index.nearby(lat, lon, args.rayon) for lat, lon in queries], repeat=3)
+        knn = best_time(lambda: [index.nearest(lat, lon, args.k) for lat, lon in queries], repeat=3)
+        per_query = 1000 / len(queries)
+        print(f"📍 {count:>7} sites : parcours {linear * per_query:8.3f} ms, grille {grid * per_query:6.3f} ms "
+              f"(x{linear / grid:.0f}), {args.k} plus proches {knn * per_query:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare l'extracteur rapide (terrain_parser) à l'extracteur BeautifulSoup de
+référence sur des pages terrain : celles du cache HTTP si une collecte a déjà
+été faite, sinon des pages synthétiques. Vérifie aussi que les résultats sont
+identiques.
+
+Usage : python benchmarks/bench_terrain_parser.py [--pages N]
+"""
+import argparse
+import contextlib
+import glob
+import gzip
+import io
+import json
+import os
+
+from common import ROOT, best_time, load_script
+from fixtures import make_terrain_page
+from terrain_parser import parse_terrain_page
+
+
+def load_cached_pages(limit):
+    """Pages terrain présentes dans le cache HTTP (.cache_http)."""
+    pages = []
+    for meta_path in glob.glob(os.path.join(ROOT, ".cache_http", "*", "*.json")):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if "/terrain/" not in meta.get("url", ""):
+            continue
+        with gzip.open(meta_path[:-len(".json")] + ".gz", "rb") as f:
+            pages.append(f.read().decode(meta.get("encoding") or "utf-8", errors="replace"))
+        if len(pages) >= limit:
+            break
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50, help="nombre de pages à analyser")
+    args = parser.parse_args()
+
+    request_infos = load_script("tools/_2-requestInfosSite.py")
+    pages = load_cached_pages(args.pages)
+    source = "cache HTTP"
+    if not pages:
+        pages = [make_terrain_page(site_id) for site_id in range(args.pages)]
+        source = "pages synthétiques"
+
+    def run(parse):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [parse(html, i) for i, html in enumerate(pages)]
+
+    reference = run(request_infos.parse_terrain_page_soup)
+    fast = run(parse_terrain_page)
+    mismatches = sum(1 for a, b in zip(reference, fast) if a != b)
+
+    soup_time = best_time(lambda: run(request_infos.parse_terrain_page_soup), repeat=3)
+    fast_time = best_time(lambda: run(parse_terrain_page), repeat=3)
+    size = sum(len(html) for html in pages) / len(pages)
+
+    print(f"📄 {len(pages)} pages ({source}), {size / 1024:.0f} Ko en moyenne")
+    print(f"🐢 BeautifulSoup : {soup_time / len(pages) * 1000:.2f} ms/page")
+    print(f"🚀 Extracteur rapide : {fast_time / len(pages) * 1000:.2f} ms/page (x{soup_time / fast_time:.1f})")
+    if mismatches:
+        print(f"❌ {mismatches} page(s) avec un résultat différent")
+    else:
+        print("✅ Résultats identiques sur toutes les pages")
+
+
+if __name__ == "__main__":
+    main()
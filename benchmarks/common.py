@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TOOLS_DIR = os.path.join(ROOT, "tools")
+BALISE_TOOLS_DIR = os.path.join(ROOT, "balise-tools")
+
+sys.path.insert(0, TOOLS_DIR)
+
+
+def load_script(relative_path, name=None):
+    """
+    Importe un script numéroté du dépôt (ex: "tools/_2-requestInfosSite.py"),
+    dont le nom de fichier n'est pas un nom de module Python valide.
+    """
+    path = os.path.join(ROOT, relative_path)
+    name = name or os.path.splitext(os.path.basename(path))[0].lstrip("_").replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_time(func, repeat=5):
+    """Meilleur temps d'exécution (s) sur `repeat` essais."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
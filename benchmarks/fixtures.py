@@ -0,0 +1,200 @@
+import random
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+ORIENTATIONS = ["N", "NE", "E", "SE", "S", "SO", "O", "NO"]
+
+
+def make_terrain_page(site_id, rng=None, menu_size=300):
+    """
+    Page terrain synthétique au format de federation.ffvl.fr/terrain/{id} :
+    gabarit Drupal avec menu, blocs imbriqués, coordonnées, altitude,
+    secteurs de vent et description publique avec balise.
+    """
+    rng = rng or random.Random(site_id)
+    favorables = ";".join(rng.sample(ORIENTATIONS, rng.randint(1, 3)))
+    defavorables = ";".join(o for o in ORIENTATIONS if o not in favorables.split(";"))
+    lat, lon = 44 + rng.random() * 2, 3 + rng.random() * 4
+    menu = "\n".join(
+        f'          <li class="menu-item"><a href="/page/{i}"><span>Rubrique {i}</span></a></li>'
+        for i in range(menu_size)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+  <meta charset="utf-8">
+  <title>Terrain {site_id} | FFVL</title>
+  <script>window.drupalSettings = {{"path": "/terrain/{site_id}"}};</script>
+</head>
+<body>
+  <div class="dialog-off-canvas-main-canvas">
+    <div class="layout-container">
+      <header><nav><ul class="menu">
+{menu}
+      </ul></nav></header>
+      <main>
+        <div class="region region-content">
+          <div class="field field--name-coordonnees">
+            <span class="label">Coordonnées</span>
+            <a href="https://www.google.com/maps/preview?q={lat:.6f},{lon:.6f}">{lat:.6f}, {lon:.6f}</a>
+          </div>
+          <div id="edit-terrain-altitude" class="form-item">
+            <label>Altitude :</label> {rng.randint(300, 2800)} m
+          </div>
+          <div class="field field--name-vent">
+            <div class="field__label">Secteurs de vent favorables : </div><div class="field__item">{favorables}</div><div class="field__label">Secteurs de vent défavorables : </div><div class="field__item">{defavorables}</div><div class="field__label">Conditions aérologiques idéales : </div><div class="field__item">Vent faible, thermiques en milieu de journée.</div>
+          </div>
+          <div id="edit-terrain-description-publique" class="form-item">
+            <pre>Décollage en herbe, atterrissage balisé.
+Balise météo : <a href="https://intranet.ffvl.fr/structure/{rng.randint(1, 400)}/balises/modifier/{rng.randint(1, 200)}">balise</a></pre>
+          </div>
+        </div>
+      </main>
+      <footer><p>Fédération Française de Vol Libre</p></footer>
+    </div>
+  </div>
+</body>
+</html>
+"""
+
+
+def make_balise_page(balise_id, timestamp):
+    """
+    Page synthétique de relevés au format de balisemeteo.com/balise.php :
+    vent moyen, rafale et direction du créneau de 10 minutes de `timestamp`.
+    """
+    slot = int(timestamp) // 600
+    rng = random.Random(balise_id * 1_000_003 + slot)
+    moyen = rng.randint(0, 40)
+    local = datetime.fromtimestamp(slot * 600, ZoneInfo("Europe/Paris"))
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="utf-8"><title>Balise {balise_id} - Balisemeteo</title></head>
+<body>
+  <table class="releve">
+    <tr><td>Relevé du</td><td>{local.strftime("%d/%m/%Y à %Hh%M")}</td></tr>
+    <tr><td>Vent moyen</td><td>{moyen} km/h</td></tr>
+    <tr><td>Vent maxi</td><td>{moyen + rng.randint(0, 25)} km/h</td></tr>
+    <tr><td>Direction</td><td>{ORIENTATIONS[rng.randrange(8)]} ({rng.randrange(360)}&deg;)</td></tr>
+  </table>
+</body>
+</html>
+"""
+
+
+def make_archive_response(site, start, hours, seed=0):
+    """
+    Réponse synthétique de l'API d'archive Open-Meteo (timezone=GMT) pour un
+    site : `hours` heures de vent à partir de `start` (datetime UTC), avec
+    un vent dominant propre au site et quelques valeurs manquantes.
+    """
+    rng = random.Random(f"{seed}:{site['id']}")
+    prevailing = rng.randrange(360)
+    times, speeds, directions, gusts = [], [], [], []
+    for hour in range(hours):
+        times.append((start + timedelta(hours=hour)).strftime("%Y-%m-%dT%H:%M"))
+        if rng.random() < 0.01:
+            speeds.append(None)
+            directions.append(None)
+            gusts.append(None)
+            continue
+        speed = round(rng.expovariate(1 / 10), 1)
+        speeds.append(speed)
+        directions.append(round((prevailing + rng.gauss(0, 60)) % 360))
+        gusts.append(round(speed * rng.uniform(1.2, 2.0), 1))
+    return {"latitude": site["latitude"], "longitude": site["longitude"], "timezone": "GMT",
+            "hourly": {"time": times, "windspeed_10m": speeds, "winddirection_10m": directions,
+                       "windgusts_10m": gusts}}
+
+
+def make_sites(count, seed=0):
+    """
+    Catalogue synthétique de `count` sites répartis sur la France
+    métropolitaine, au format de merged_sites_with_balises_corrected.json.
+    """
+    rng = random.Random(seed)
+    sites = []
+    for i in range(count):
+        favorables = rng.sample(ORIENTATIONS, rng.randint(1, 3))
+        sites.append({
+            "id": str(100000 + i),
+            "nom": f"SITE {i} ({favorables[0]})",
+            "code": str(100000 + i),
+            "commune": f"COMMUNE {i % 5000}",
+            "code_postal": f"{rng.randint(1, 95):02d}{rng.randint(0, 999):03d}",
+            "activite": "parapente  [ déco ]",
+            "statut": "actif",
+            "latitude": round(rng.uniform(42.3, 51.0), 4),
+            "longitude": round(rng.uniform(-4.8, 8.2), 4),
+            "altitude": rng.randint(100, 2800),
+            "orientation": favorables[0],
+            # Bit 2i de la rose à 16 points pour le point i de ORIENTATIONS
+            "secteurs_favorables": sum(1 << 2 * ORIENTATIONS.index(orientation) for orientation in favorables),
+            "secteurs_defavorables": None,
+            "conditions_aerologiques": None,
+        })
+    return sites
+
+
+def make_listing_page(sites):
+    """
+    Page de la liste des terrains au format de tools/_0-reponse_ffvl.html
+    (tableau d'une ligne par site), pour une liste de sites de make_sites().
+    """
+    rows = "\n".join(
+        f'<tr class="{"odd" if i % 2 == 0 else "even"}"><td><a href="/terrain/{site["id"]}">{site["nom"]} [{site["code"]}]</a></td>'
+        f'<td>{site["commune"]}</td><td>{site["code_postal"]}</td><td>{site["activite"]}</td><td>{site["statut"]}</td></tr>'
+        for i, site in enumerate(sites)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="utf-8"><title>Terrains | FFVL</title></head>
+<body>
+<table class="tablesaw">
+<thead><tr><th>Nom</th><th>Commune</th><th>Code postal</th><th>Activité</th><th>Statut</th></tr></thead>
+<tbody>
+{rows}
+</tbody>
+</table>
+</body>
+</html>
+"""
+
+
+def make_balises(sites, count, seed=0):
+    """
+    Liste synthétique de `count` balises au format de balises_all.json : la
+    moitié porte le nom d'un site de `sites`, les autres ne correspondent à
+    aucun site.
+    """
+    rng = random.Random(seed)
+    balises = []
+    for i in range(count):
+        structure, balise_id = rng.randint(1, 400), 1000 + i
+        if i % 2 == 0 and sites:
+            # "Site 12 (" ne figure que dans le nom "SITE 12 (...)"
+            name = rng.choice(sites)["nom"].split("(")[0].title() + "("
+        else:
+            name = f"Balise {i}"
+        balises.append({"url": f"https://intranet.ffvl.fr/structure/{structure}/balises/modifier/{balise_id}",
+                        "nom": name})
+    return balises
+
+
+def make_corrections(sites, count, seed=0):
+    """
+    Liste synthétique de `count` corrections au format de corrections.json,
+    par nom ou par identifiant : renommages avec nouvelle orientation et
+    suppressions.
+    """
+    rng = random.Random(seed)
+    corrections = []
+    for i, site in enumerate(rng.sample(sites, min(count, len(sites)))):
+        key = {"id": site["id"]} if i % 3 == 0 else {"nom_actuel": site["nom"]}
+        if i % 4 == 0:
+            corrections.append({**key, "supprimer": True})
+        else:
+            orientation = rng.choice(ORIENTATIONS)
+            corrections.append({**key, "nouveau_nom": f"{site['nom'].split(' (')[0]} ({orientation})",
+                                "nouvelle_orientation": orientation})
+    return corrections
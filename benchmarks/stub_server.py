@@ -0,0 +1,69 @@
+"""
+Serveur HTTP local qui imite federation.ffvl.fr pour mesurer les étapes de
+collecte sans dépendre du réseau : /terrain/{id} renvoie une page terrain
+synthétique (fixtures.make_terrain_page) et /balise.php?idBalise={id} la
+page de relevés d'une balise (fixtures.make_balise_page), qui change toutes
+les 10 minutes.
+
+Le serveur tourne dans un processus séparé pour que son temps de calcul et
+sa mémoire ne soient pas comptés dans les mesures.
+"""
+import contextlib
+import functools
+import multiprocessing
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fixtures import make_balise_page, make_terrain_page
+
+
+@functools.lru_cache(maxsize=None)
+def terrain_page(site_id):
+    return make_terrain_page(site_id).encode("utf-8")
+
+
+class TerrainHandler(BaseHTTPRequestHandler):
+    # Connexions persistantes, comme le serveur réel, sans attente de
+    # l'accusé de réception entre les en-têtes et le corps
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        match = re.fullmatch(r"/terrain/(\d+)", self.path)
+        balise = re.fullmatch(r"/balise\.php\?idBalise=(\d+)", self.path)
+        if match:
+            body = terrain_page(int(match.group(1)))
+        elif balise:
+            body = make_balise_page(int(balise.group(1)), time.time()).encode("utf-8")
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TerrainHandler)
+    server.daemon_threads = True
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+@contextlib.contextmanager
+def terrain_server():
+    """Démarre le serveur et renvoie son URL de base (ex: http://127.0.0.1:8123)."""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(port_queue,), daemon=True)
+    process.start()
+    try:
+        yield f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+    finally:
+        process.terminate()
+        process.join()
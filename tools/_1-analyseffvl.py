@@ -1,7 +1,11 @@
+import argparse
 import json
+import sys
 from bs4 import BeautifulSoup
 import re
 
+from listing_parser import iter_sites_from_files, dump_json_array
+
 def extract_site_id(href_text):
     """Extrait l'ID d'un site à partir du lien href"""
     match = re.search(r'/terrain/(\d+)', href_text)
@@ -10,7 +14,11 @@ def extract_site_id(href_text):
     return None
 
 def parse_html_to_json(html_file_path):
-    """Analyse un fichier HTML et extrait les informations des terrains en JSON"""
+    """
+    Analyse un fichier HTML et extrait les informations des terrains en JSON.
+    Version BeautifulSoup d'origine, qui charge tout le document : main()
+    utilise la lecture en flux de listing_parser, au résultat identique.
+    """
     
     # Lire le fichier HTML
     with open(html_file_path, 'r', encoding='utf-8') as file:
@@ -66,26 +74,39 @@ def parse_html_to_json(html_file_path):
     return json_data
 
 def main():
-    # Chemin vers le fichier HTML récupéré
-    html_file_path = "_0-reponse_ffvl.html"  # Utiliser le fichier sauvegardé précédemment
-    
+    parser = argparse.ArgumentParser(description="Convertit la liste des terrains FFVL (HTML) en JSON")
+    parser.add_argument("pages", nargs="*", default=["_0-reponse_ffvl.html"],
+                        help="pages HTML de la liste, lues l'une après l'autre (défaut : _0-reponse_ffvl.html)")
+    parser.add_argument("-o", "--sortie", default="sites_ffvl.json",
+                        help="fichier JSON de sortie, - pour la sortie standard (défaut : sites_ffvl.json)")
+    args = parser.parse_args()
+
     try:
-        # Extraire les données et les convertir en JSON
-        json_data = parse_html_to_json(html_file_path)
-        
-        # Enregistrer le JSON dans un fichier
-        with open("sites_ffvl.json", "w", encoding="utf-8") as json_file:
-            json_file.write(json_data)
+        # Les sites sont lus ligne par ligne et sérialisés une seule fois
+        sites = iter_sites_from_files(args.pages)
+        if args.sortie == "-":
+            dump_json_array(sites, sys.stdout)
+            return
+
+        first_sites = []
+
+        def keep_first(sites):
+            for site in sites:
+                if not first_sites:
+                    first_sites.append(site)
+                yield site
+
+        with open(args.sortie, "w", encoding="utf-8") as json_file:
+            count = dump_json_array(keep_first(sites), json_file)
         
         print("Conversion HTML vers JSON réussie!")
-        print("Les données ont été enregistrées dans 'sites_ffvl.json'")
+        print(f"Les données ont été enregistrées dans '{args.sortie}'")
         
         # Afficher un exemple des données extraites
-        sites = json.loads(json_data)
-        if sites:
-            print(f"\nExtraction réussie: {len(sites)} site(s) trouvé(s)")
+        if first_sites:
+            print(f"\nExtraction réussie: {count} site(s) trouvé(s)")
             print("\nExemple du premier site extrait:")
-            print(json.dumps(sites[0], ensure_ascii=False, indent=2))
+            print(json.dumps(first_sites[0], ensure_ascii=False, indent=2))
     
     except Exception as e:
         print(f"Une erreur s'est produite lors de la conversion: {e}")
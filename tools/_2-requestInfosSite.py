@@ -1,9 +1,40 @@
+import argparse
 import json
+import os
 import requests
 from bs4 import BeautifulSoup
-import time
 import re
 
+from crawler import HostRateLimiter, RateLimitedSession, CrawlStats
+from checkpoint import CheckpointLog, compact, write_json_atomic
+from departments import add_department_arguments, department_of, selected_departments
+from http_cache import HttpCache
+from metrics import METRICS, add_metrics_arguments, export, get_logger, setup
+from terrain_parser import parse_terrain_page
+from site_rules import is_takeoff_activity, is_open_status
+from site_store import add_store_argument, open_store
+from script_loader import load_script
+from work_queue import DEFAULT_MAX_ATTEMPTS, FAILED, PENDING, WorkQueue, check_response, run_queue
+
+# Serveur interrogé et débit autorisé par défaut (requêtes/s)
+FFVL_BASE_URL = "https://federation.ffvl.fr"
+DEFAULT_RATE = 2.0
+DEFAULT_CONCURRENCY = 4
+
+# Journal de reprise, file de travail et fichier final attendu par _3-formatdetails.py
+CHECKPOINT_FILE = "sites_ffvl_details.jsonl"
+QUEUE_FILE = "sites_ffvl_details.queue.jsonl"
+FAILED_FILE = "sites_ffvl_details.echecs.json"
+OUTPUT_FILE = "sites_ffvl_details.json"
+
+# Dossier des fichiers par département lus par data-dpt/_4-bis-mergefile.py
+DEPARTMENT_DIR = os.path.join("..", "data-dpt")
+
+# Les pages terrain changent rarement : une semaine avant revalidation
+DEFAULT_CACHE_TTL_HOURS = 24 * 7
+
+logger = get_logger("requestInfosSite")
+
 def get_orientation_from_wind_sector(wind_sector):
     """
     Convertit le code d'orientation du vent en nom complet
@@ -34,85 +65,162 @@ def get_orientation_from_wind_sector(wind_sector):
     
     return None
 
-def extract_data_from_site(site_id):
+def parse_terrain_page_soup(html, site_id):
     """
-    Récupère les détails d'un site à partir de son ID
+    Extrait les détails d'une page terrain avec un arbre BeautifulSoup complet.
+    Extracteur de référence, plus lent que terrain_parser.parse_terrain_page
     """
-    url = f"https://federation.ffvl.fr/terrain/{site_id}"
-    print(f"Récupération des données pour le site {site_id} à partir de {url}")
+    soup = BeautifulSoup(html, 'html.parser')
     
-    try:
-        response = requests.get(url)
-        if response.status_code != 200:
-            print(f"Erreur lors de la récupération pour le site {site_id}: {response.status_code}")
-            return None
-            
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Dictionnaire pour stocker les détails extraits
-        details = {}
-        
-        # Recherche des coordonnées (Latitude, Longitude)
-        coords_link = soup.find('a', href=lambda href: href and 'google.com/maps/preview?q=' in href)
-        if coords_link:
-            # Extraire les coordonnées du texte du lien
-            coords_text = coords_link.get_text().strip()
-            coords_match = re.search(r'(\d+\.\d+),\s*(\d+\.\d+)', coords_text)
+    # Dictionnaire pour stocker les détails extraits
+    details = {}
+    
+    # Recherche des coordonnées (Latitude, Longitude)
+    coords_link = soup.find('a', href=lambda href: href and 'google.com/maps/preview?q=' in href)
+    if coords_link:
+        # Extraire les coordonnées du texte du lien
+        coords_text = coords_link.get_text().strip()
+        coords_match = re.search(r'(\d+\.\d+),\s*(\d+\.\d+)', coords_text)
+        if coords_match:
+            # Arrondir à 4 décimales
+            details['latitude'] = round(float(coords_match.group(1)), 4)
+            details['longitude'] = round(float(coords_match.group(2)), 4)
+        # Alternativement, extraire de l'URL si le texte ne contient pas les coordonnées
+        elif 'href' in coords_link.attrs:
+            href = coords_link['href']
+            coords_match = re.search(r'q=(\d+\.\d+),(\d+\.\d+)', href)
             if coords_match:
                 # Arrondir à 4 décimales
                 details['latitude'] = round(float(coords_match.group(1)), 4)
                 details['longitude'] = round(float(coords_match.group(2)), 4)
-            # Alternativement, extraire de l'URL si le texte ne contient pas les coordonnées
-            elif 'href' in coords_link.attrs:
-                href = coords_link['href']
-                coords_match = re.search(r'q=(\d+\.\d+),(\d+\.\d+)', href)
-                if coords_match:
-                    # Arrondir à 4 décimales
-                    details['latitude'] = round(float(coords_match.group(1)), 4)
-                    details['longitude'] = round(float(coords_match.group(2)), 4)
-        
-        # Recherche de l'altitude
-        altitude_div = soup.find('div', id='edit-terrain-altitude')
-        if altitude_div:
-            alt_text = altitude_div.get_text().strip()
-            alt_match = re.search(r'Altitude\s*:\s*(\d+)', alt_text)
-            if alt_match:
-                details['altitude'] = int(alt_match.group(1))
-        
-        # Recherche des secteurs de vent favorables
-        wind_sectors = None
-        for element in soup.find_all(['div', 'p', 'span']):
-            text = element.get_text()
-            if 'Secteurs de vent favorables' in text:
-                wind_match = re.search(r'Secteurs de vent favorables\s*:\s*(.*?)(?:\n|$)', text)
-                if wind_match:
-                    wind_sectors = wind_match.group(1).strip()
-                    break
-        
-        if wind_sectors:
-            details['secteurs_vent'] = wind_sectors
-        
-        # Recherche des balises météo
-        balises = []
-        description_div = soup.find('div', id='edit-terrain-description-publique')
-        if description_div:
-            # Rechercher les balises météo dans le contenu de <pre>
-            pre_element = description_div.find('pre')
-            if pre_element:
-                print(f"Balises météo trouvées dans le site {site_id}:")
-                for link in pre_element.find_all('a', href=True):
-                    if 'Balise météo' in pre_element.get_text():
-                        balises.append(link['href'])  # Ajouter l'URL de la balise météo
-
-        if balises:
-            details['balise'] = balises
-        
-        return details
-        
-    except Exception as e:
-        print(f"Erreur lors de la récupération des détails pour le site {site_id}: {e}")
-        return None
+    
+    # Recherche de l'altitude
+    altitude_div = soup.find('div', id='edit-terrain-altitude')
+    if altitude_div:
+        alt_text = altitude_div.get_text().strip()
+        alt_match = re.search(r'Altitude\s*:\s*(\d+)', alt_text)
+        if alt_match:
+            details['altitude'] = int(alt_match.group(1))
+    
+    # Recherche des secteurs de vent favorables
+    wind_sectors = None
+    for element in soup.find_all(['div', 'p', 'span']):
+        text = element.get_text()
+        if 'Secteurs de vent favorables' in text:
+            wind_match = re.search(r'Secteurs de vent favorables\s*:\s*(.*?)(?:\n|$)', text)
+            if wind_match:
+                wind_sectors = wind_match.group(1).strip()
+                break
+    
+    if wind_sectors:
+        details['secteurs_vent'] = wind_sectors
+    
+    # Recherche des balises météo
+    balises = []
+    description_div = soup.find('div', id='edit-terrain-description-publique')
+    if description_div:
+        # Rechercher les balises météo dans le contenu de <pre>
+        pre_element = description_div.find('pre')
+        if pre_element:
+            logger.debug(f"Balises météo trouvées dans le site {site_id}:")
+            for link in pre_element.find_all('a', href=True):
+                if 'Balise météo' in pre_element.get_text():
+                    balises.append(link['href'])  # Ajouter l'URL de la balise météo
+
+    if balises:
+        details['balise'] = balises
+    
+    return details
+
+def extract_data_from_site(site_id, session=None, cache=None, parse_page=parse_terrain_page):
+    """
+    Récupère les détails d'un site à partir de son ID
+    :param session: Session HTTP partagée (keep-alive, débit limité), requests par défaut
+    :param cache: Cache HTTP optionnel (HttpCache)
+    :param parse_page: Extracteur utilisé (rapide par défaut, ou parse_terrain_page_soup)
+    :raises RetryableError: Code HTTP temporaire (429, 5xx), à retenter plus tard
+    :raises PermanentError: Autre code d'erreur (page absente...)
+    :raises requests.RequestException: Erreur réseau, à retenter plus tard
+    """
+    url = f"{FFVL_BASE_URL}/terrain/{site_id}"
+    logger.debug(f"Récupération des données pour le site {site_id} à partir de {url}")
+    http = session or requests
+
+    if cache:
+        response = cache.get(http, url, timeout=30)
+    else:
+        response = http.get(url, timeout=30)
+    check_response(response, url)
+
+    with METRICS.timer("page_parse_seconds", parser=parse_page.__name__):
+        return parse_page(response.text, site_id)
+
+def is_takeoff_site(site):
+    """
+    Indique si le site est un décollage parapente praticable
+    """
+    return is_takeoff_activity(site.get('activite')) and is_open_status(site.get('statut'))
+
+def write_department_files(sites, departments, output_dir=DEPARTMENT_DIR):
+    """
+    Répartit les sites par département (d'après leur code postal), leur
+    applique le traitement de _3-formatdetails.py et écrit chaque
+    département dans son fichier sites_ffvl_details_XX.json, remplacé d'un bloc.
+
+    :return: Nombre de sites écrits par département.
+    """
+    format_details = load_script("tools/_3-formatdetails.py").format_details
+    by_department = {department: [] for department in departments}
+    for site in sites:
+        department = department_of(site.get('code_postal'))
+        if department in by_department:
+            by_department[department].append(site)
+
+    counts = {}
+    for department, department_sites in by_department.items():
+        if not department_sites:
+            logger.warning(f"⚠️ Aucun site pour le département {department}")
+            continue
+        output_file = os.path.join(output_dir, f"sites_ffvl_details_{department}.json")
+        write_json_atomic(format_details(department_sites), output_file)
+        counts[department] = len(department_sites)
+        logger.info(f"✅ {len(department_sites)} sites du département {department} enregistrés dans '{output_file}'")
+    return counts
+
 def main():
+    parser = argparse.ArgumentParser(description="Récupère les détails des sites FFVL listés dans sites_ffvl.json")
+    parser.add_argument("--concurrence", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"nombre de requêtes simultanées au départ (défaut : {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--concurrence-max", type=int,
+                        help="nombre maximal de requêtes simultanées quand le serveur répond vite (défaut : --concurrence)")
+    parser.add_argument("--essais", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"essais par site avant abandon (défaut : {DEFAULT_MAX_ATTEMPTS})")
+    parser.add_argument("--reessayer-echecs", action="store_true",
+                        help=f"retente les sites en échec lors d'une exécution précédente (voir {FAILED_FILE})")
+    parser.add_argument("--debit", type=float, default=DEFAULT_RATE,
+                        help=f"requêtes par seconde maximum vers {FFVL_BASE_URL} (défaut : {DEFAULT_RATE})")
+    parser.add_argument("--recommencer", action="store_true",
+                        help=f"ignore les journaux {CHECKPOINT_FILE} et {QUEUE_FILE} et recommence la collecte depuis le début")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL_HOURS,
+                        help=f"durée en heures avant revalidation d'une page en cache, 0 pour toujours revalider (défaut : {DEFAULT_CACHE_TTL_HOURS})")
+    parser.add_argument("--sans-cache", action="store_true", help="désactive le cache HTTP")
+    parser.add_argument("--moteur", choices=["rapide", "soup"], default="rapide",
+                        help="extracteur des pages terrain : lecture ciblée (rapide) ou arbre BeautifulSoup complet (soup)")
+    add_department_arguments(parser)
+    parser.add_argument("--dossier-dpt", default=DEPARTMENT_DIR,
+                        help=f"dossier des fichiers par département (défaut : {DEPARTMENT_DIR})")
+    add_store_argument(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup(args)
+    # Sans département demandé, tous les sites de la liste sont traités sans répartition
+    departments = selected_departments(args)
+
+    if args.recommencer:
+        for path in (CHECKPOINT_FILE, QUEUE_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+
     # Charger le fichier JSON existant
     try:
         with open("sites_ffvl.json", "r", encoding="utf-8") as f:
@@ -123,66 +231,108 @@ def main():
     
     print(f"Chargement de {len(sites)} sites depuis le fichier JSON.")
     
-    # Parcourir chaque site et ajouter les détails supplémentaires
+    # Sites déjà présents dans le journal : reprise après interruption
+    checkpoint = CheckpointLog(CHECKPOINT_FILE)
+    done_ids = checkpoint.done_ids()
+    if done_ids:
+        print(f"Reprise : {len(done_ids)} sites déjà enregistrés dans '{CHECKPOINT_FILE}'.")
+
+    # Sélectionner les sites de décollage parapente à traiter
+    to_fetch = []
     for i, site in enumerate(sites):
-        activite_type = site.get('activite')
-        statut_type = site.get('statut')
-        if (not 'parapente' in activite_type) or 'atterro' in activite_type or 'interdit' in statut_type or 'non praticable définitivement' in statut_type:
-            print(f"Site #{i} n'est pas adapté au décollage en parapente.")
-            # flush le site et passe au suivant
-            site.clear()
+        if not is_takeoff_site(site):
+            logger.debug(f"Site #{i} n'est pas adapté au décollage en parapente.")
+            continue
+        if not site.get('id'):
+            logger.debug(f"Site #{i} n'a pas d'ID, passage au suivant.")
+            continue
+        if departments is not None and department_of(site.get('code_postal')) not in departments:
             continue
-        else:
-            site_id = site.get('id')
-            if not site_id:
-                print(f"Site #{i} n'a pas d'ID, passage au suivant.")
-                continue
-            
-            print(f"Traitement du site {i+1}/{len(sites)}: {site.get('nom', 'Sans nom')} (ID: {site_id})")
-            
-            # Récupérer les détails supplémentaires
-            details = extract_data_from_site(site_id)
-            # Mettre à jour le site avec les nouvelles informations
+        if site['id'] in done_ids:
+            continue
+        to_fetch.append(site)
+
+    # File de travail : état de chaque site entre deux exécutions
+    queue = WorkQueue(QUEUE_FILE, args.essais)
+    queue.open()  # refermée avec la session
+    if args.reessayer_echecs:
+        print(f"{queue.retry_failed()} sites en échec remis en attente.")
+    # Sites de la liste par identifiant : un site resté en attente d'une
+    # exécution précédente (avec d'autres --departements) garde ses champs
+    sites_by_id = {site['id']: site for site in sites if site.get('id')}
+    dropped = queue.discard([site_id for site_id in queue.items if site_id not in sites_by_id])
+    if dropped:
+        print(f"ℹ️ {dropped} sites absents de la liste retirés de la file de travail.")
+    queue.add(site['id'] for site in to_fetch)
+    previously_failed = sum(1 for site in to_fetch if queue.items[site['id']]['etat'] == FAILED)
+    if previously_failed:
+        print(f"⚠️ {previously_failed} sites en échec lors d'une exécution précédente ignorés "
+              f"(--reessayer-echecs pour les retenter).")
+
+    print(f"{len(to_fetch) - previously_failed} sites à récupérer avec {args.concurrence} requêtes simultanées, "
+          f"{args.debit} requêtes/s max.")
+
+    # Session partagée : pool de connexions keep-alive et seau à jetons par hôte
+    limiter = HostRateLimiter(args.debit)
+    cache = None if args.sans_cache else HttpCache(ttl=args.cache_ttl * 3600)
+    parse_page = parse_terrain_page if args.moteur == "rapide" else parse_terrain_page_soup
+    stats = CrawlStats()
+    store = open_store(args)
+    max_concurrency = max(args.concurrence, args.concurrence_max or args.concurrence)
+    with RateLimitedSession(limiter, pool_size=max_concurrency) as session, checkpoint, queue, \
+            METRICS.stage("details") as stage:
+        def fetch(site_id):
+            return extract_data_from_site(site_id, session, cache, parse_page)
+
+        stage.records_in = len(to_fetch) - previously_failed
+        for done, (site_id, details) in enumerate(
+                run_queue(queue, fetch, args.concurrence, stats, max_concurrency, session, label="Site"), start=1):
+            site = sites_by_id[site_id]
+            logger.debug(f"Traitement du site {done}/{len(to_fetch)}: {site.get('nom', 'Sans nom')} (ID: {site_id})")
+            # Mettre à jour le site et l'ajouter au journal
             site.update(details)
-            # if details:
-            #     # Mettre à jour le site avec les nouvelles informations
-            #     site.update(details)
-            #     # Ajouter l'orientation basée sur le premier secteur de vent
-            #     if 'secteurs_vent' in details:
-            #         orientation = get_orientation_from_wind_sector(details['secteurs_vent'])
-            #         if orientation:
-            #             site['orientation'] = orientation
-            #             print(f"Détails ajoutés: {', '.join(details.keys())}, orientation")
-            #         else:
-            #             print(f"Détails ajoutés: {', '.join(details.keys())}")
-            #     else:
-            #         print(f"Détails ajoutés: {', '.join(details.keys())}")
-                
-            # Charger les données existantes dans le fichier JSON
-            try:
-                with open("sites_ffvl_details.json", "r", encoding="utf-8") as f:
-                    existing_sites = json.load(f)
-            except FileNotFoundError:
-                existing_sites = []  # Si le fichier n'existe pas, initialisez une liste vide
-            except json.JSONDecodeError:
-                existing_sites = []  # Si le fichier est corrompu ou vide, initialisez une liste vide
-            
-            # Ajouter le site traité à la liste
-            existing_sites.append(site)
-            
-            # Écrire la liste mise à jour dans le fichier JSON
-            try:
-                with open("sites_ffvl_details.json", "w", encoding="utf-8") as f:
-                    json.dump(existing_sites, f, ensure_ascii=False, indent=4)
-                print(f"✅ Site {site_id} mis à jour et enregistré dans 'sites_ffvl_details.json'")
-            except Exception as e:
-                print(f"Erreur lors de l'enregistrement du site {site_id} : {e}")
-
-        
-        # Pause pour ne pas surcharger le serveur
-        if i < len(sites) - 1:  # Pas de pause après le dernier site
-            time.sleep(1)
-    
-    print(f"\nTraitement terminé. Tous les sites ont été mis à jour.")
+            checkpoint.append(site)
+            if store is not None:
+                store.upsert_sites([site])
+            logger.debug(f"✅ Site {site_id} mis à jour et enregistré dans '{CHECKPOINT_FILE}'")
+        stage.records_out = stats.ok
+    if store is not None:
+        print(f"🗄️ Base {args.base} : {len(store)} sites")
+        store.close()
+
+    # Compacter le journal en tableau JSON pour les étapes suivantes, fusionné
+    # par identifiant avec les sites des collectes précédentes
+    count = compact(CHECKPOINT_FILE, OUTPUT_FILE, merge=True)
+    if count:
+        print(f"✅ {count} sites enregistrés dans '{OUTPUT_FILE}'")
+    else:
+        print(f"ℹ️ Aucun site récupéré, '{OUTPUT_FILE}' inchangé")
+    if departments is not None and count:
+        # Fichiers par département, dans l'ordre de la liste des sites
+        position = {site['id']: i for i, site in enumerate(sites)}
+        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+            records = sorted(json.load(f), key=lambda site: position.get(site.get('id'), len(position)))
+        with METRICS.stage("departements") as stage:
+            stage.records_in = len(records)
+            stage.records_out = sum(write_department_files(records, departments, args.dossier_dpt).values())
+    stats.print_summary()
+    failed = queue.write_report(FAILED_FILE)
+    if failed:
+        print(f"❌ {failed} sites en échec, détail dans '{FAILED_FILE}' (--reessayer-echecs pour les retenter)")
+    if cache:
+        cache.print_stats()
+    export(args, "requestInfosSite")
+
+    # Collecte complète : la reprise ne concerne que les collectes
+    # interrompues, la suivante récupère de nouveau tous les sites
+    counts = queue.counts()
+    if counts[PENDING] or counts[FAILED]:
+        print(f"\nTraitement terminé. {counts[PENDING]} sites en attente et {counts[FAILED]} en échec "
+              f"conservés dans '{CHECKPOINT_FILE}' et '{QUEUE_FILE}' pour la reprise.")
+    else:
+        queue.reset()
+        if os.path.exists(CHECKPOINT_FILE):
+            os.remove(CHECKPOINT_FILE)
+        print(f"\nTraitement terminé. Tous les sites ont été mis à jour.")
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,85 +1,65 @@
-import json
-import math
-
-# Table de correspondance des orientations cardinales en degrés
-ORIENTATION_TO_DEGREES = {
-    "N": 0,
-    "NE": 45,
-    "E": 90,
-    "SE": 135,
-    "S": 180,
-    "SO": 225,
-    "O": 270,
-    "NO": 315
-}
-
-# Table inverse pour convertir des degrés en orientations cardinales
-DEGREES_TO_ORIENTATION = {v: k for k, v in ORIENTATION_TO_DEGREES.items()}
-
-def get_average_orientation(orientations):
+from site_table import SiteTable
+from site_rules import ideal_conditions, wind_sector_masks
+
+
+def with_orientation_suffix(name, suffix):
+    """Nom du site suivi de son orientation, sans la répéter si elle y figure déjà."""
+    if name is None or suffix is None or name.endswith(f" ({suffix})"):
+        return name
+    return f"{name} ({suffix})"
+
+
+def format_table(table):
     """
-    Calcule la moyenne des orientations cardinales.
-    :param orientations: Liste des orientations (ex: ["N", "SE", "S", "SO", "O", "NO"])
-    :return: Orientation moyenne (ex: "S")
+    Remplace le texte 'secteurs_vent' de chaque site par des champs prêts à
+    l'emploi, et concatène l'orientation moyenne au nom :
+
+    - 'orientation', l'orientation moyenne des secteurs favorables ;
+    - 'secteurs_favorables' et 'secteurs_defavorables', masques de la rose à
+      16 points (voir site_rules.COMPASS_POINTS) : les consommateurs testent
+      une direction de vent sans relire le texte ;
+    - 'conditions_aerologiques', le texte libre qui suit les secteurs.
+
+    Les sites déjà traités (sans 'secteurs_vent') sont laissés tels quels :
+    relancer le traitement sur sa propre sortie ne modifie rien.
     """
-    if not orientations:
-        return None
+    pending = table.has_field("secteurs_vent")
+    texts = table.strings("secteurs_vent")
 
-    # Convertir les orientations en radians
-    radians = [math.radians(ORIENTATION_TO_DEGREES[orientation]) for orientation in orientations if orientation in ORIENTATION_TO_DEGREES]
+    # Ajouter le champ 'orientation' à chaque site, calculé une fois par texte distinct
+    orientation = table.average_orientation("secteurs_vent")
+    table.update("orientation", orientation, where=pending)
 
-    # Calculer les moyennes des coordonnées x et y sur le cercle trigonométrique
-    x = sum(math.cos(r) for r in radians) / len(radians)
-    y = sum(math.sin(r) for r in radians) / len(radians)
+    # Masques des secteurs et conditions, calculés une fois par texte distinct
+    masks = texts.map(wind_sector_masks, missing=(None, None))
+    table.update("secteurs_favorables", [favorable for favorable, _ in masks], where=pending)
+    table.update("secteurs_defavorables", [unfavorable for _, unfavorable in masks], where=pending)
+    table.update("conditions_aerologiques", texts.map_strings(ideal_conditions), where=pending)
 
-    # Calculer l'angle moyen en radians
-    average_radians = math.atan2(y, x)
+    # Concaténer l'orientation moyenne au champ 'nom'
+    oriented = pending & (orientation.codes >= 0)
+    names = table.strings("nom")
+    table.update("nom", [with_orientation_suffix(name, suffix)
+                         for name, suffix in zip(names.tolist(), orientation.tolist())], where=oriented)
 
-    # Convertir l'angle moyen en degrés
-    average_degrees = math.degrees(average_radians) % 360
+    # Le texte d'origine et la liste des secteurs favorables ('orientation_all'
+    # des versions précédentes) sont entièrement repris par les champs ci-dessus
+    table.remove("secteurs_vent", where=pending)
+    table.remove("orientation_all", where=pending)
+    return table
 
-    # Trouver l'orientation cardinale la plus proche
-    closest_orientation = min(DEGREES_TO_ORIENTATION.keys(), key=lambda d: abs(d - average_degrees))
-    return DEGREES_TO_ORIENTATION[closest_orientation]
 
-def extract_orientation(secteurs_vent):
-    """
-    Extrait l'orientation à partir du champ 'secteurs_vent'.
-    Récupère uniquement les données avant 'Secteurs de vent défavorables'.
-    """
-    if not secteurs_vent:
-        return None
-
-    # Diviser le texte au niveau de "Secteurs de vent défavorables"
-    parts = secteurs_vent.split("Secteurs de vent défavorables")
-    if len(parts) > 0:
-        # Retourner la partie avant "Secteurs de vent défavorables", en supprimant les espaces inutiles
-        return parts[0].strip()
-    return None
-
-# Charger les données JSON
-with open("sites_ffvl_details.json", "r", encoding="utf-8") as f:
-    sites = json.load(f)
-
-# Ajouter le champ 'orientation' à chaque site
-for site in sites:
-    secteurs_vent = site.get("secteurs_vent", "")
-    orientation = extract_orientation(secteurs_vent)
-    site["orientation_all"] = orientation
-    # recherche uniquement si ne contient pas "non" dans orientation    
-    if not (orientation and "non" not in orientation.lower()):
-        site["orientation"] = None
-    else:
-        if "orientation_all" in site:
-            orientations = site["orientation_all"].split(";")
-            site["orientation"] = get_average_orientation(orientations)
-
-        # Concaténer l'orientation moyenne au champ 'nom'
-        if site["orientation"]:
-            site["nom"] = f"{site['nom']} ({site['orientation']})"
-        
-# Sauvegarder les données mises à jour
-with open("sites_ffvl_details.json", "w", encoding="utf-8") as f:
-    json.dump(sites, f, ensure_ascii=False, indent=4)
-
-print("Les données ont été mises à jour avec la moyenne des orientations.")
\ No newline at end of file
+def format_details(sites):
+    """Même traitement que format_table() sur une liste de sites."""
+    return format_table(SiteTable.from_records(sites)).to_records()
+
+
+if __name__ == "__main__":
+    # Charger les données JSON dans une table en colonnes
+    table = SiteTable.load("sites_ffvl_details.json")
+    format_table(table)
+
+    # Sauvegarder les données mises à jour
+    table.save("sites_ffvl_details.json")
+
+    print("Les données ont été mises à jour avec la moyenne des orientations, les masques des secteurs de vent et les conditions aérologiques.")
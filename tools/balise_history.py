@@ -0,0 +1,198 @@
+import os
+
+import numpy as np
+
+from metrics import get_logger
+
+# Un relevé toutes les 10 minutes, conservé 3 jours
+DEFAULT_RESOLUTION = 600
+DEFAULT_DAYS = 3
+
+# Valeurs d'un relevé : vent moyen et rafale (km/h), direction (degrés)
+FIELDS = ("vent_moy", "vent_max", "direction")
+
+logger = get_logger("balise_history")
+
+
+class BaliseHistory:
+    """
+    Relevés récents des balises dans des tableaux NumPy de taille fixe.
+
+    Chaque balise occupe une ligne de `capacity` cases ; un relevé est rangé
+    dans la case de son créneau (`heure // resolution` modulo `capacity`),
+    ce qui fait de chaque ligne un tampon circulaire : le relevé le plus
+    récent d'un créneau écrase celui du tour précédent, et une case dont
+    l'heure ne correspond pas au tour courant est simplement ignorée. La
+    mémoire est donc proportionnelle au nombre de balises, quelle que soit
+    la durée de la collecte (environ 7 Ko par balise pour 3 jours à 10 min).
+
+    :param capacity: Nombre de créneaux conservés par balise.
+    :param resolution: Durée d'un créneau en secondes.
+    """
+
+    def __init__(self, capacity=DEFAULT_DAYS * 86400 // DEFAULT_RESOLUTION, resolution=DEFAULT_RESOLUTION):
+        self.capacity = capacity
+        self.resolution = resolution
+        self.rows = {}
+        # Début du créneau de chaque case (0 = vide) et valeurs (NaN = inconnue)
+        self.times = np.zeros((0, capacity), dtype=np.uint32)
+        self.values = np.full((0, capacity, len(FIELDS)), np.nan, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+    def _row(self, url):
+        row = self.rows.get(url)
+        if row is None:
+            row = self.rows[url] = len(self.rows)
+            if row == len(self.times):
+                # Lignes allouées par blocs pour éviter une copie à chaque balise
+                extra = max(16, len(self.times))
+                self.times = np.concatenate([self.times, np.zeros((extra, self.capacity), dtype=np.uint32)])
+                self.values = np.concatenate([self.values, np.full((extra, self.capacity, len(FIELDS)), np.nan,
+                                                                   dtype=np.float32)])
+        return row
+
+    def add(self, url, timestamp, vent_moy=None, vent_max=None, direction=None):
+        """
+        Enregistre un relevé ; un relevé plus ancien que celui déjà présent
+        dans la case est ignoré.
+
+        :return: True si le relevé a été enregistré.
+        """
+        row = self._row(url)
+        start = int(timestamp) // self.resolution * self.resolution
+        slot = start // self.resolution % self.capacity
+        if self.times[row, slot] > start:
+            return False
+        self.times[row, slot] = start
+        self.values[row, slot] = [np.nan if value is None else value for value in (vent_moy, vent_max, direction)]
+        return True
+
+    def series(self, url, since=None):
+        """
+        Relevés d'une balise par heure croissante, limités au dernier tour du
+        tampon (et postérieurs à `since` si précisé).
+
+        :return: (heures de début des créneaux, valeurs [n, 3]).
+        """
+        row = self.rows.get(url)
+        if row is None:
+            return np.zeros(0, dtype=np.uint32), np.zeros((0, len(FIELDS)), dtype=np.float32)
+        times = self.times[row]
+        latest = int(times.max())
+        valid = (times > 0) & (times.astype(np.int64) > latest - self.capacity * self.resolution)
+        if since is not None:
+            valid &= times >= since
+        order = np.argsort(times[valid], kind="stable")
+        return times[valid][order], self.values[row][valid][order]
+
+    def latest(self, url):
+        """Dernier relevé d'une balise ({"heure", "vent_moy", "vent_max", "direction"}) ou None."""
+        times, values = self.series(url)
+        if not len(times):
+            return None
+        return reading(int(times[-1]), values[-1])
+
+    def aggregate(self, url, step=3600, since=None):
+        """
+        Relevés regroupés par période de `step` secondes : vent moyen, rafale
+        maximale et direction moyenne (moyenne circulaire), calculés sur les
+        tableaux sans boucle par relevé.
+
+        :return: Liste de {"heure", "vent_moy", "vent_max", "direction", "releves"}.
+        """
+        times, values = self.series(url, since)
+        if not len(times):
+            return []
+        periods = times // step * step
+        starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        known = ~np.isnan(values)
+        filled = np.nan_to_num(values)
+        counts = np.add.reduceat(known.astype(np.int32), starts, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_speed = np.add.reduceat(filled[:, 0], starts) / counts[:, 0]
+            radians = np.radians(filled[:, 2])
+            sin = np.add.reduceat(np.where(known[:, 2], np.sin(radians), 0), starts)
+            cos = np.add.reduceat(np.where(known[:, 2], np.cos(radians), 0), starts)
+            direction = np.where(counts[:, 2] > 0, np.degrees(np.arctan2(sin, cos)) % 360, np.nan)
+            gust = np.fmax.reduceat(values[:, 1], starts)
+        return [reading(int(periods[start]), (mean_speed[i], gust[i], direction[i]),
+                        releves=int(np.diff(np.r_[starts, len(times)])[i]))
+                for i, start in enumerate(starts)]
+
+    def save(self, path):
+        """Enregistre les tableaux (.npz), remplacés d'un bloc."""
+        tmp_path = f"{path}.tmp.npz"
+        count = len(self.rows)
+        np.savez(tmp_path, times=self.times[:count], values=self.values[:count],
+                 urls=np.array(list(self.rows), dtype=str), resolution=self.resolution)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, capacity=None, resolution=DEFAULT_RESOLUTION):
+        """
+        Relit un historique enregistré par save(), ou un historique vide si
+        le fichier est absent. Un historique de résolution ou de capacité
+        différente est converti : les relevés les plus récents de chaque
+        balise qui tiennent dans le nouveau tampon sont conservés.
+        """
+        history = cls(capacity or DEFAULT_DAYS * 86400 // resolution, resolution)
+        if not os.path.exists(path):
+            return history
+        with np.load(path) as data:
+            urls = [str(url) for url in data["urls"]]
+            times = data["times"].copy()
+            values = data["values"].copy()
+            saved_resolution = int(data["resolution"])
+        if saved_resolution == resolution and times.shape[1] == history.capacity:
+            history.rows = {url: row for row, url in enumerate(urls)}
+            history.times = times
+            history.values = values
+            return history
+        kept = history._import(urls, times, values, saved_resolution)
+        logger.warning(f"⚠️ Historique {path} converti de {times.shape[1]} créneaux de {saved_resolution} s "
+                       f"en {history.capacity} créneaux de {resolution} s : {kept} relevés conservés "
+                       f"sur {int(np.count_nonzero(times))}")
+        return history
+
+    def _import(self, urls, times, values, resolution):
+        """
+        Range les relevés d'un historique d'une autre résolution ou capacité :
+        relevés du dernier tour de son tampon qui tiennent dans celui-ci, le
+        plus récent l'emportant dans chaque case, comme avec add().
+
+        :return: Nombre de relevés conservés.
+        """
+        for url in urls:
+            self._row(url)
+        capacity = times.shape[1]
+        times = times.astype(np.int64)
+        latest = times.max(axis=1, initial=0)[:, None]
+        starts = times // self.resolution * self.resolution
+        valid = ((times > 0) & (times > latest - capacity * resolution)
+                 & (starts > latest // self.resolution * self.resolution - self.capacity * self.resolution))
+        rows, columns = np.nonzero(valid)
+        # Relevés par heure croissante, puis le dernier de chaque case de destination
+        order = np.argsort(times[rows, columns], kind="stable")
+        rows, columns = rows[order], columns[order]
+        slots = starts[rows, columns] // self.resolution % self.capacity
+        _, last = np.unique((rows * self.capacity + slots)[::-1], return_index=True)
+        last = len(rows) - 1 - last
+        rows, columns, slots = rows[last], columns[last], slots[last]
+        self.times[rows, slots] = starts[rows, columns]
+        self.values[rows, slots] = values[rows, columns]
+        return len(rows)
+
+
+def reading(timestamp, values, **extra):
+    """Relevé sous forme de dictionnaire JSON (valeurs inconnues à None, arrondies au dixième)."""
+    result = {"heure": timestamp}
+    for field, value in zip(FIELDS, values):
+        result[field] = None if np.isnan(value) else round(float(value), 1)
+    result.update(extra)
+    return result
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import html
+import json
+import os
+import re
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo
+
+from balise_history import DEFAULT_DAYS, DEFAULT_RESOLUTION, BaliseHistory
+from checkpoint import write_json_atomic
+from crawler import HostRateLimiter, RateLimitedSession
+from metrics import METRICS, add_metrics_arguments, export, get_logger, setup
+from site_rules import COMPASS_POINTS, SECTOR_DEGREES
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_BALISES = os.path.join(REPO_ROOT, "balise-tools", "balises_all.json")
+DEFAULT_HISTORY = os.path.join(REPO_ROOT, "releves_balises.npz")
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, "releves_balises.json")
+
+BALISEMETEO_BASE_URL = "https://www.balisemeteo.com"
+DEFAULT_INTERVAL = 600
+# Requêtes simultanées et débit (requêtes/s) par hôte
+DEFAULT_HOST_LIMIT = 4
+DEFAULT_RATE = 2.0
+# Heures conservées dans les moyennes horaires exportées
+DEFAULT_EXPORT_HOURS = 24
+
+PARIS = ZoneInfo("Europe/Paris")
+
+# Directions de la rose des vents à 16 points, en degrés
+COMPASS_DEGREES = {name: i * SECTOR_DEGREES for i, name in enumerate(COMPASS_POINTS)}
+
+TAG_RE = re.compile(r"<[^>]+>")
+SPEED = r"[^0-9]{0,30}?(\d+(?:[.,]\d+)?)\s*km/?h"
+MEAN_RE = re.compile(r"(?:moy(?:en(?:ne)?)?)" + SPEED, re.IGNORECASE)
+GUST_RE = re.compile(r"(?:max(?:i(?:mum|mal))?|rafales?)" + SPEED, re.IGNORECASE)
+DIRECTION_DEGREES_RE = re.compile(r"direction[^0-9]{0,30}?(\d{1,3}(?:[.,]\d+)?)\s*°", re.IGNORECASE)
+DIRECTION_COMPASS_RE = re.compile(r"direction[^0-9]{0,30}?\b(" + "|".join(
+    sorted(COMPASS_DEGREES, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+DATE_RE = re.compile(r"(\d{2})/(\d{2})/(\d{4})\D{1,10}?(\d{1,2})\s*[h:]\s*(\d{2})")
+
+logger = get_logger("balise_poller")
+
+
+def balise_page_url(url, base_url=BALISEMETEO_BASE_URL):
+    """
+    URL de la page de relevés d'une balise, à partir de son URL intranet
+    (.../balises/modifier/{id}) ou balisemeteo (balise.php?idBalise={id}).
+    """
+    match = re.search(r"idBalise=(\d+)", url) or re.search(r"/(\d+)/?$", url)
+    if not match:
+        return None
+    return f"{base_url}/balise.php?idBalise={match.group(1)}"
+
+
+def _number(match):
+    return float(match.group(1).replace(",", ".")) if match else None
+
+
+def parse_balise_page(page, now=None):
+    """
+    Dernier relevé d'une page balise : vent moyen et rafale (km/h),
+    direction (degrés, d'après la valeur en degrés ou le point cardinal) et
+    heure du relevé (heure de Paris, heure de la requête à défaut).
+
+    :return: {"heure", "vent_moy", "vent_max", "direction"} ou None si la page ne contient aucun relevé.
+    """
+    text = html.unescape(TAG_RE.sub(" ", page))
+    text = " ".join(text.split())
+    reading = {
+        "vent_moy": _number(MEAN_RE.search(text)),
+        "vent_max": _number(GUST_RE.search(text)),
+        "direction": _number(DIRECTION_DEGREES_RE.search(text)),
+    }
+    if reading["direction"] is None:
+        match = DIRECTION_COMPASS_RE.search(text)
+        if match:
+            reading["direction"] = COMPASS_DEGREES[match.group(1).upper()]
+    if all(value is None for value in reading.values()):
+        return None
+
+    timestamp = time.time() if now is None else now
+    match = DATE_RE.search(text)
+    if match:
+        day, month, year, hour, minute = (int(value) for value in match.groups())
+        try:
+            timestamp = datetime(year, month, day, hour, minute, tzinfo=PARIS).timestamp()
+        except ValueError:
+            pass
+    return {"heure": int(timestamp), **reading}
+
+
+class BalisePoller:
+    """
+    Relève périodiquement toutes les balises et range les relevés dans un
+    BaliseHistory.
+
+    Les requêtes partent d'une boucle asyncio : chaque balise est une tâche,
+    limitée par un sémaphore par hôte (`host_limit` requêtes simultanées),
+    et la requête HTTP elle-même est exécutée dans un thread avec la session
+    requests partagée (connexions keep-alive, débit limité par hôte).
+
+    :param balises: Liste des balises ({"url", "nom"}).
+    :param session: Session requests (RateLimitedSession conseillée).
+    :param base_url: Serveur des pages balises (stub local pour les essais).
+    """
+
+    def __init__(self, balises, history, session, base_url=BALISEMETEO_BASE_URL, host_limit=DEFAULT_HOST_LIMIT):
+        self.history = history
+        self.session = session
+        self.host_limit = host_limit
+        self.pages = {}
+        for balise in balises:
+            page_url = balise_page_url(balise["url"], base_url)
+            if page_url is None:
+                logger.warning(f"⚠️ Identifiant introuvable dans l'URL de la balise {balise.get('nom')} : {balise['url']}")
+                continue
+            self.pages[balise["url"]] = page_url
+        self.semaphores = {}
+
+    def _semaphore(self, url):
+        host = urlsplit(url).hostname or ""
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.host_limit)
+        return self.semaphores[host]
+
+    async def fetch(self, url, page_url):
+        """Relève une balise. :return: True si un relevé a été enregistré."""
+        async with self._semaphore(page_url):
+            try:
+                response = await asyncio.to_thread(self.session.get, page_url, timeout=30)
+            except Exception as e:
+                logger.warning(f"❌ {page_url} : {e}")
+                return False
+        if response.status_code != 200:
+            logger.warning(f"❌ {page_url} : {response.status_code}")
+            return False
+        with METRICS.timer("page_parse_seconds", parser="parse_balise_page"):
+            reading = parse_balise_page(response.text)
+        if reading is None:
+            logger.debug(f"Aucun relevé dans la page {page_url}")
+            return False
+        self.history.add(url, reading.pop("heure"), **reading)
+        return True
+
+    async def poll_once(self):
+        """Relève toutes les balises une fois. :return: (relevés enregistrés, échecs)."""
+        # Sémaphores liés à la boucle asyncio en cours
+        self.semaphores = {}
+        results = await asyncio.gather(*(self.fetch(url, page_url) for url, page_url in self.pages.items()))
+        ok = sum(results)
+        METRICS.inc("balise_readings_total", ok, result="ok")
+        METRICS.inc("balise_readings_total", len(results) - ok, result="echec")
+        return ok, len(results) - ok
+
+    async def run(self, interval=DEFAULT_INTERVAL, rounds=None, on_round=None):
+        """
+        Relève les balises toutes les `interval` secondes (`rounds` fois, ou
+        sans fin), en appelant `on_round()` après chaque tour.
+        """
+        done = 0
+        while rounds is None or done < rounds:
+            start = time.monotonic()
+            with METRICS.stage("releves") as stage:
+                ok, failed = await self.poll_once()
+                stage.records_in = len(self.pages)
+                stage.records_out = ok
+            logger.info(f"🌬️ {ok} balises relevées, {failed} en échec en {time.monotonic() - start:.1f} s")
+            if on_round:
+                on_round()
+            done += 1
+            if rounds is None or done < rounds:
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+
+def export_readings(history, balises, output_file, hours=DEFAULT_EXPORT_HOURS, now=None):
+    """
+    Écrit pour chaque balise son dernier relevé et ses moyennes horaires
+    des `hours` dernières heures.
+
+    :return: Nombre de balises exportées.
+    """
+    since = (time.time() if now is None else now) - hours * 3600
+    readings = {}
+    for balise in balises:
+        latest = history.latest(balise["url"])
+        if latest is None:
+            continue
+        readings[balise["url"]] = {"nom": balise.get("nom"), "dernier": latest,
+                                   "horaire": history.aggregate(balise["url"], 3600, since)}
+    write_json_atomic(readings, output_file)
+    return len(readings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relève en continu le vent des balises de balises_all.json")
+    parser.add_argument("--balises", default=DEFAULT_BALISES, help="liste JSON des balises")
+    parser.add_argument("--url", default=BALISEMETEO_BASE_URL, help=f"serveur des balises (défaut : {BALISEMETEO_BASE_URL})")
+    parser.add_argument("--intervalle", type=float, default=DEFAULT_INTERVAL,
+                        help=f"secondes entre deux relevés (défaut : {DEFAULT_INTERVAL})")
+    parser.add_argument("--tours", type=int, help="nombre de relevés avant de s'arrêter (défaut : sans fin)")
+    parser.add_argument("--par-hote", type=int, default=DEFAULT_HOST_LIMIT,
+                        help=f"requêtes simultanées par hôte (défaut : {DEFAULT_HOST_LIMIT})")
+    parser.add_argument("--debit", type=float, default=DEFAULT_RATE,
+                        help=f"requêtes par seconde maximum par hôte (défaut : {DEFAULT_RATE})")
+    parser.add_argument("--jours", type=float, default=DEFAULT_DAYS,
+                        help=f"jours de relevés conservés par balise (défaut : {DEFAULT_DAYS})")
+    parser.add_argument("--historique", default=DEFAULT_HISTORY, help="fichier de l'historique (.npz)")
+    parser.add_argument("--sortie", default=DEFAULT_OUTPUT, help="relevés JSON exportés après chaque tour")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup(args)
+
+    with open(args.balises, "r", encoding="utf-8") as f:
+        balises = json.load(f)
+    history = BaliseHistory.load(args.historique, int(args.jours * 86400 // DEFAULT_RESOLUTION))
+    print(f"📡 {len(balises)} balises, historique de {len(history)} balises ({history.nbytes / 1024:.0f} Ko)")
+
+    def save():
+        history.save(args.historique)
+        count = export_readings(history, balises, args.sortie)
+        logger.info(f"✅ Relevés de {count} balises enregistrés dans : {args.sortie}")
+
+    with RateLimitedSession(HostRateLimiter(args.debit), pool_size=args.par_hote) as session:
+        poller = BalisePoller(balises, history, session, args.url, args.par_hote)
+        try:
+            asyncio.run(poller.run(args.intervalle, args.tours, save))
+        except KeyboardInterrupt:
+            save()
+    export(args, "balise_poller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+
+from checkpoint import write_json_atomic
+from flyability import DEFAULT_BATCH_SIZE, OPEN_METEO_URL, fetch_hourly, score_sites
+from forecast_cache import DEFAULT_GRID_DEG, ForecastCache, current_run
+from metrics import METRICS, InstrumentedSession, add_metrics_arguments, export, setup
+from spatial_index import DEFAULT_CATALOG, DEFAULT_CELL_DEG, cell_of, haversine
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_OUTPUT_DIR = os.path.join(REPO_ROOT, "classements")
+MANIFEST = "manifest.json"
+
+# Rayon de recherche de la page (findNearbySites)
+DEFAULT_RADIUS_KM = 30
+
+
+def distance_to_cell(latitude, longitude, cell, cell_deg=DEFAULT_CELL_DEG):
+    """Distance (km) entre un point et le point le plus proche d'une cellule."""
+    row, col = cell
+    nearest_lat = min(max(latitude, row * cell_deg), (row + 1) * cell_deg)
+    nearest_lon = min(max(longitude, col * cell_deg), (col + 1) * cell_deg)
+    return haversine(latitude, longitude, nearest_lat, nearest_lon)
+
+
+def cells_in_range(site, radius_km, cell_deg=DEFAULT_CELL_DEG):
+    """Cellules dont au moins un point est à moins de `radius_km` du site."""
+    latitude, longitude = site["latitude"], site["longitude"]
+    row, col = cell_of(latitude, longitude, cell_deg)
+    row_span = math.ceil(radius_km / 111 / cell_deg) + 1
+    col_span = math.ceil(radius_km / (111 * max(math.cos(math.radians(latitude)), 0.01)) / cell_deg) + 1
+    for r in range(row - row_span, row + row_span + 1):
+        for c in range(col - col_span, col + col_span + 1):
+            if distance_to_cell(latitude, longitude, (r, c), cell_deg) <= radius_km:
+                yield r, c
+
+
+def build_rankings(sites, counts, radius_km=DEFAULT_RADIUS_KM, cell_deg=DEFAULT_CELL_DEG):
+    """
+    Classement des sites pour chaque cellule de la grille : tous les sites à
+    moins de `radius_km` d'un point de la cellule, par nombre de périodes
+    favorables décroissant (ordre du catalogue en cas d'égalité). La page n'a
+    plus qu'à garder ceux à moins de `radius_km` de sa position : le premier
+    restant est le meilleur site, comme avec findBestSite().
+
+    :return: {(ligne, colonne): [[nom, commune, latitude, longitude, périodes], ...]}.
+    """
+    scored = [(site, count) for site, count in zip(sites, counts.tolist()) if count >= 0]
+    rankings = {}
+    for position, (site, count) in enumerate(scored):
+        for cell in cells_in_range(site, radius_km, cell_deg):
+            rankings.setdefault(cell, []).append((position, site, count))
+    return {cell: [[site.get("nom"), site.get("commune"), site["latitude"], site["longitude"], count]
+                   for _, site, count in sorted(entries, key=lambda entry: (-entry[2], entry[0]))]
+            for cell, entries in rankings.items()}
+
+
+def catalog_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_rankings(rankings, output_dir, run, radius_km=DEFAULT_RADIUS_KM):
+    """
+    Écrit un fichier minifié par cellule (`{ligne}_{colonne}.json`) et
+    supprime ceux des cellules qui n'ont plus de site à portée.
+
+    :return: Nombre de fichiers écrits.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    names = set()
+    for (row, col), ranking in rankings.items():
+        name = f"{row}_{col}.json"
+        names.add(name)
+        payload = {"run": run, "rayon": radius_km, "sites": ranking}
+        tmp_path = os.path.join(output_dir, name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, os.path.join(output_dir, name))
+    for name in os.listdir(output_dir):
+        if name.endswith(".json") and name != MANIFEST and name not in names:
+            os.remove(os.path.join(output_dir, name))
+    return len(names)
+
+
+def update_rankings(catalog=DEFAULT_CATALOG, output_dir=DEFAULT_OUTPUT_DIR, fetch=None, now=None,
+                    radius_km=DEFAULT_RADIUS_KM, cell_deg=DEFAULT_CELL_DEG, force=False):
+    """
+    Recalcule les classements si un nouveau run de prévision est publié
+    depuis la dernière exécution (ou si le catalogue a changé).
+
+    :param fetch: Fonction fetch(coordonnées) -> blocs "hourly" (voir flyability.fetch_hourly).
+    :return: True si les classements ont été recalculés.
+    """
+    now = time.time() if now is None else now
+    run = current_run(now)
+    digest = catalog_digest(catalog)
+    manifest = read_manifest(output_dir)
+    if (not force and manifest and manifest.get("run") == run and manifest.get("catalogue") == digest
+            and manifest.get("rayon") == radius_km and manifest.get("cell_deg") == cell_deg):
+        print(f"⏭️ Classements à jour pour le run de {time.strftime('%d/%m %H:%M', time.gmtime(run))} UTC")
+        return False
+
+    with open(catalog, "r", encoding="utf-8") as f:
+        sites = json.load(f)
+    start = time.perf_counter()
+    with METRICS.stage("classements") as stage:
+        cache = ForecastCache(fetch or fetch_hourly, DEFAULT_GRID_DEG)
+        counts = score_sites(sites, cache.get_many)
+        rankings = build_rankings(sites, counts, radius_km, cell_deg)
+        count = write_rankings(rankings, output_dir, run, radius_km)
+        stage.records_in = len(sites)
+        stage.records_out = count
+    write_json_atomic({"run": run, "catalogue": digest, "rayon": radius_km, "cell_deg": cell_deg,
+                       "cellules": count, "genere": int(now)}, os.path.join(output_dir, MANIFEST))
+    cache.print_stats()
+    print(f"✅ Classements de {len(sites)} sites écrits pour {count} cellules dans {output_dir} "
+          f"en {time.perf_counter() - start:.1f} s (run de {time.strftime('%d/%m %H:%M', time.gmtime(run))} UTC)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précalcule le meilleur site pour 48 h, par cellule de grille")
+    parser.add_argument("--catalogue", default=DEFAULT_CATALOG, help="catalogue JSON des sites")
+    parser.add_argument("--sortie", default=DEFAULT_OUTPUT_DIR, help="dossier des classements (défaut : classements/)")
+    parser.add_argument("--url", default=OPEN_METEO_URL, help=f"API de prévisions (défaut : {OPEN_METEO_URL})")
+    parser.add_argument("--lot", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"nombre de points par requête (défaut : {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--rayon", type=float, default=DEFAULT_RADIUS_KM,
+                        help=f"rayon de recherche en km (défaut : {DEFAULT_RADIUS_KM})")
+    parser.add_argument("--forcer", action="store_true", help="recalcule même si aucun nouveau run n'est publié")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup(args)
+
+    with InstrumentedSession() as session:
+        update_rankings(args.catalogue, args.sortie,
+                        lambda coordinates: fetch_hourly(coordinates, session, args.url, batch_size=args.lot),
+                        radius_km=args.rayon, force=args.forcer)
+    export(args, "best_sites")
+
+
+if __name__ == "__main__":
+    main()
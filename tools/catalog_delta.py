@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from checkpoint import write_json_atomic
+from metrics import get_logger
+from site_bundle import minified, write_compressed
+from spatial_index import DEFAULT_CATALOG
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_OUTPUT_DIR = os.path.join(REPO_ROOT, "deltas")
+
+# Fichiers publiés : manifeste des versions, catalogue de la dernière version
+# et un delta par version
+MANIFEST_FILE = "versions.json"
+SNAPSHOT_FILE = "catalogue.json"
+DELTA_FILE = "delta-{version}.json"
+
+# Deltas conservés : un consommateur plus ancien recharge le catalogue complet
+DEFAULT_KEEP = 50
+
+logger = get_logger("catalog_delta")
+
+
+class DeltaError(ValueError):
+    """Delta inapplicable : version de départ ou empreinte du résultat différente."""
+
+
+def fingerprint(sites):
+    """Empreinte SHA-256 du catalogue minifié, pour vérifier un catalogue reconstruit."""
+    return hashlib.sha256(minified(sites)).hexdigest()
+
+
+def site_key(site):
+    return str(site["id"])
+
+
+def patch_site(site, change):
+    """Site modifié par une entrée "modifies" d'un delta."""
+    if "site" in change:
+        return dict(change["site"])
+    patched = {key: value for key, value in site.items() if key not in change.get("retires", ())}
+    patched.update(change.get("champs", {}))
+    return patched
+
+
+def same_value(a, b):
+    """Valeurs égales et de même type (1 et 1.0 ne s'écrivent pas pareil en JSON)."""
+    return a == b and type(a) is type(b)
+
+
+def diff_site(old, new):
+    """
+    Changements d'un site : champs nouveaux ou modifiés ("champs") et champs
+    retirés ("retires"), ou le site complet ("site") si l'ordre de ses champs
+    ne peut pas être reconstitué. None si le site est inchangé.
+    """
+    fields = {key: value for key, value in new.items() if key not in old or not same_value(old[key], value)}
+    removed = [key for key in old if key not in new]
+    if not fields and not removed and list(old) == list(new):
+        return None
+    change = {}
+    if fields:
+        change["champs"] = fields
+    if removed:
+        change["retires"] = removed
+    if list(patch_site(old, change)) != list(new):
+        return {"site": new}
+    return change
+
+
+def diff_catalogs(old_sites, new_sites):
+    """
+    Différences entre deux catalogues, sites appariés par "id" : sites
+    ajoutés (complets), identifiants des sites supprimés et champs modifiés.
+    L'ordre complet des identifiants ("ordre") n'est ajouté que s'il ne se
+    déduit pas de l'ancien ordre (supprimés retirés, ajoutés à la fin).
+    """
+    old_by_key = {site_key(site): site for site in old_sites}
+    new_keys = [site_key(site) for site in new_sites]
+    new_key_set = set(new_keys)
+    if len(new_key_set) != len(new_keys):
+        raise DeltaError("Identifiants de sites en double dans le nouveau catalogue")
+
+    added = []
+    changed = {}
+    for key, site in zip(new_keys, new_sites):
+        old = old_by_key.get(key)
+        if old is None:
+            added.append(site)
+            continue
+        change = diff_site(old, site)
+        if change is not None:
+            changed[key] = change
+    removed = [key for key in old_by_key if key not in new_key_set]
+
+    delta = {"ajoutes": added, "supprimes": removed, "modifies": changed}
+    expected_order = [key for key in old_by_key if key in new_key_set] + [site_key(site) for site in added]
+    if expected_order != new_keys:
+        delta["ordre"] = new_keys
+    return delta
+
+
+def is_empty(delta):
+    return not (delta["ajoutes"] or delta["supprimes"] or delta["modifies"] or "ordre" in delta)
+
+
+def apply_delta(sites, delta, version=None):
+    """
+    Applique un delta à un catalogue.
+
+    :param version: Version du catalogue `sites`, vérifiée si précisée.
+    :return: Nouveau catalogue (les sites non modifiés sont partagés).
+    :raises DeltaError: Si le delta ne part pas de `version` ou que le
+                        résultat ne correspond pas à son empreinte.
+    """
+    if version is not None and delta.get("depuis") != version:
+        raise DeltaError(f"Le delta {delta.get('version')} part de la version {delta.get('depuis')}, "
+                         f"pas de la version {version}")
+    removed = set(delta["supprimes"])
+    by_key = {}
+    for site in sites:
+        key = site_key(site)
+        if key in removed:
+            continue
+        change = delta["modifies"].get(key)
+        by_key[key] = site if change is None else patch_site(site, change)
+    for site in delta["ajoutes"]:
+        by_key[site_key(site)] = site
+
+    order = delta.get("ordre") or list(by_key)
+    result = [by_key[key] for key in order]
+    if "empreinte" in delta and fingerprint(result) != delta["empreinte"]:
+        raise DeltaError(f"Empreinte du catalogue différente après le delta {delta.get('version')}")
+    return result
+
+
+def apply_deltas(sites, version, deltas):
+    """
+    Amène un catalogue de la version `version` à la dernière version des
+    deltas (dans l'ordre des versions, les plus anciens étant ignorés).
+
+    :return: (catalogue, version atteinte).
+    """
+    for delta in sorted(deltas, key=lambda delta: delta["version"]):
+        if delta["version"] <= version:
+            continue
+        sites = apply_delta(sites, delta, version)
+        version = delta["version"]
+    return sites, version
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"version": 0, "deltas": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_snapshot(output_dir):
+    path = os.path.join(output_dir, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def publish(sites, output_dir=DEFAULT_OUTPUT_DIR, keep=DEFAULT_KEEP, now=None):
+    """
+    Compare le catalogue à la dernière version publiée dans `output_dir` et,
+    s'il a changé, publie la version suivante : le delta (delta-N.json et sa
+    version .gz), le catalogue complet (catalogue.json) et le manifeste
+    (versions.json) qui liste les deltas disponibles. Seuls les `keep`
+    derniers deltas sont conservés.
+
+    :return: (version publiée, delta) ou (version courante, None) si rien n'a changé.
+    :raises ValueError: Si `keep` est inférieur à 1.
+    """
+    if keep < 1:
+        raise ValueError(f"Nombre de deltas conservés invalide : {keep} (au moins 1)")
+    manifest = load_manifest(output_dir)
+    previous = load_snapshot(output_dir)
+    delta = diff_catalogs(previous, sites)
+    if manifest["version"] and is_empty(delta):
+        return manifest["version"], None
+
+    version = manifest["version"] + 1
+    delta = {"version": version, "depuis": manifest["version"], "empreinte": fingerprint(sites), **delta}
+    os.makedirs(output_dir, exist_ok=True)
+    filename = DELTA_FILE.format(version=version)
+    sizes = write_compressed(os.path.join(output_dir, filename), minified(delta))
+    snapshot_sizes = write_compressed(os.path.join(output_dir, SNAPSHOT_FILE), minified(sites))
+
+    entries = manifest["deltas"] + [{"version": version, "depuis": version - 1, "fichier": filename,
+                                     "taille": sizes[""], "ajoutes": len(delta["ajoutes"]),
+                                     "supprimes": len(delta["supprimes"]), "modifies": len(delta["modifies"])}]
+    for entry in entries[:-keep]:
+        for extension in ("", ".gz", ".br"):
+            path = os.path.join(output_dir, entry["fichier"] + extension)
+            if os.path.exists(path):
+                os.remove(path)
+    write_json_atomic({
+        "version": version,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now)),
+        "sites": len(sites),
+        "empreinte": delta["empreinte"],
+        "catalogue": {"fichier": SNAPSHOT_FILE, "taille": snapshot_sizes[""]},
+        "deltas": entries[-keep:],
+    }, os.path.join(output_dir, MANIFEST_FILE))
+    logger.info(f"🆕 Version {version} : {len(delta['ajoutes'])} ajoutés, {len(delta['supprimes'])} supprimés, "
+                f"{len(delta['modifies'])} modifiés ({sizes[''] / 1024:.1f} Ko, "
+                f"catalogue complet {snapshot_sizes[''] / 1024:.1f} Ko)")
+    return version, delta
+
+
+def update_catalog(sites, version, output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Mise à jour d'un catalogue local de la version `version` à partir des
+    deltas publiés dans `output_dir`, ou du catalogue complet si un delta
+    intermédiaire n'est plus disponible.
+
+    :return: (catalogue, version atteinte).
+    """
+    manifest = load_manifest(output_dir)
+    entries = [entry for entry in manifest["deltas"] if entry["version"] > version]
+    if version == manifest["version"]:
+        return sites, version
+    if not entries or entries[0]["depuis"] != version:
+        logger.info(f"ℹ️ Deltas depuis la version {version} indisponibles : rechargement du catalogue complet")
+        return load_snapshot(output_dir), manifest["version"]
+    deltas = []
+    for entry in entries:
+        with open(os.path.join(output_dir, entry["fichier"]), "r", encoding="utf-8") as f:
+            deltas.append(json.load(f))
+    return apply_deltas(sites, version, deltas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publie les différences entre deux versions du catalogue des sites")
+    parser.add_argument("--dossier", default=DEFAULT_OUTPUT_DIR,
+                        help="dossier des versions publiées (défaut : deltas/ à la racine)")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    publish_command = commands.add_parser("publier", help="publie une nouvelle version si le catalogue a changé")
+    publish_command.add_argument("--catalogue", default=DEFAULT_CATALOG, help="catalogue JSON des sites")
+    publish_command.add_argument("--garder", type=int, default=DEFAULT_KEEP,
+                                 help=f"nombre de deltas conservés (défaut : {DEFAULT_KEEP})")
+    update_command = commands.add_parser("appliquer", help="met à jour un catalogue local avec les deltas publiés")
+    update_command.add_argument("catalogue", help="catalogue JSON local, réécrit à la dernière version")
+    update_command.add_argument("version", type=int, help="version du catalogue local")
+    args = parser.parse_args()
+    if args.commande == "publier" and args.garder < 1:
+        parser.error("--garder doit valoir au moins 1")
+
+    if args.commande == "publier":
+        with open(args.catalogue, "r", encoding="utf-8") as f:
+            sites = json.load(f)
+        version, delta = publish(sites, args.dossier, args.garder)
+        if delta is None:
+            print(f"ℹ️ Catalogue inchangé, version {version}")
+        else:
+            print(f"✅ Version {version} publiée dans : {args.dossier}")
+    else:
+        with open(args.catalogue, "r", encoding="utf-8") as f:
+            sites = json.load(f)
+        sites, version = update_catalog(sites, args.version, args.dossier)
+        with open(args.catalogue, "w", encoding="utf-8") as f:
+            json.dump(sites, f, ensure_ascii=False, indent=4)
+        print(f"✅ Catalogue à la version {version} : {args.catalogue}")
+
+
+if __name__ == "__main__":
+    main()
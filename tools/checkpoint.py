@@ -0,0 +1,120 @@
+import json
+import os
+
+
+class CheckpointLog:
+    """
+    Journal de reprise en ajout seul (JSON Lines) : un site traité par ligne.
+    Chaque ligne est transmise au système dès son écriture, la synchronisation
+    sur disque (fsync) se fait par lots de `fsync_every` enregistrements, et
+    une ligne tronquée par un arrêt brutal est ignorée à la relecture puis
+    supprimée à la réouverture.
+
+    :param path: Chemin du fichier .jsonl.
+    :param fsync_every: Nombre d'enregistrements entre deux fsync.
+    """
+
+    def __init__(self, path, fsync_every=20):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.pending = 0
+        self.file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        self._truncate_partial_line()
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def _truncate_partial_line(self):
+        """Supprime une éventuelle dernière ligne incomplète."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self.file and self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def records(self):
+        """Relit les enregistrements valides du journal."""
+        return read_records(self.path)
+
+    def done_ids(self, key="id"):
+        """Identifiants déjà présents dans le journal."""
+        return {record.get(key) for record in self.records()}
+
+
+def read_records(path):
+    """
+    Générateur des enregistrements d'un journal JSON Lines, en ignorant les
+    lignes vides ou illisibles (écriture interrompue).
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def write_json_atomic(data, output_file):
+    """Écrit un fichier JSON via un fichier temporaire renommé atomiquement."""
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, output_file)
+
+
+def compact(log_path, output_file, key="id", merge=False):
+    """
+    Compacte le journal en tableau JSON attendu par les étapes suivantes.
+    En cas de doublon, le dernier enregistrement d'un identifiant l'emporte.
+    Un journal vide laisse `output_file` intact.
+
+    :param merge: Fusionne le journal avec les enregistrements déjà présents
+                  dans `output_file` (remplacés par identifiant, nouveaux
+                  ajoutés à la fin) au lieu de remplacer le fichier.
+    :return: Nombre d'enregistrements écrits, 0 si le journal est vide.
+    """
+    records = list(read_records(log_path))
+    if not records:
+        return 0
+    by_key = {}
+    if merge and os.path.exists(output_file):
+        with open(output_file, "r", encoding="utf-8") as f:
+            for record in json.load(f):
+                by_key[record.get(key)] = record
+    for record in records:
+        by_key[record.get(key)] = record
+    write_json_atomic(list(by_key.values()), output_file)
+    return len(by_key)
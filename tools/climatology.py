@@ -0,0 +1,370 @@
+import argparse
+import glob
+import json
+import os
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from checkpoint import write_json_atomic
+from flyability import FIRST_HOUR, LAST_HOUR, Forecast, direction_sectors, favorable_hours, fetch_hourly
+from metrics import METRICS, InstrumentedSession, add_metrics_arguments, export, get_logger, setup
+from site_rules import COMPASS_POINTS
+from site_table import SiteTable
+from spatial_index import DEFAULT_CATALOG
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_ARCHIVE_DIR = os.path.join(REPO_ROOT, "climatologie")
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, "climatologie.json")
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+META_FILE = "archive.json"
+# Colonnes de l'archive (un fichier .npy sites × heures chacune) et variable Open-Meteo correspondante
+COLUMNS = {"vent_moy": "windspeed_10m", "direction": "winddirection_10m", "rafales": "windgusts_10m"}
+
+# Croissance des fichiers : au moins un an d'heures, au moins 64 sites
+HOURS_BLOCK = 366 * 24
+SITES_BLOCK = 64
+# Taille des blocs lus pour les statistiques (sites × heures)
+STATS_SITES = 2048
+STATS_HOURS = 31 * 24
+
+# Heures locales de la règle de vol (fetchWeatherForAllSites), sites en France métropolitaine
+PARIS = ZoneInfo("Europe/Paris")
+DOMINANT_SECTORS = 3
+
+logger = get_logger("climatology")
+
+
+def epoch_hours(times):
+    """Heures depuis 1970 (UTC) de dates ISO Open-Meteo ("2024-05-01T10:00")."""
+    return np.array(times, dtype="datetime64[h]").astype(np.int64)
+
+
+def local_calendar(hours):
+    """Heure locale (0-23) et mois (1-12) à Paris de chaque heure UTC depuis 1970."""
+    local_hours = np.empty(len(hours), dtype=np.int8)
+    months = np.empty(len(hours), dtype=np.int8)
+    for i, hour in enumerate(hours.tolist()):
+        local = datetime.fromtimestamp(hour * 3600, timezone.utc).astimezone(PARIS)
+        local_hours[i] = local.hour
+        months[i] = local.month
+    return local_hours, months
+
+
+class ClimateArchive:
+    """
+    Archive des vents horaires passés de chaque site.
+
+    Chaque variable (vent moyen, direction, rafales) est un fichier .npy
+    ouvert en mémoire projetée (np.memmap) de forme sites × heures : une
+    ligne par site, une colonne par heure UTC depuis `debut`. Seuls les
+    blocs lus ou écrits sont chargés, si bien que l'archive peut dépasser
+    la mémoire disponible. Les fichiers sont agrandis par blocs (un an
+    d'heures, 64 sites) : un ajout ne réécrit que les cases concernées.
+    Les valeurs absentes valent NaN.
+
+    Le fichier archive.json contient l'heure de la première colonne, le
+    nombre d'heures remplies et l'identifiant du site de chaque ligne.
+
+    :param folder: Dossier de l'archive, créé au premier ajout.
+    """
+
+    def __init__(self, folder=DEFAULT_ARCHIVE_DIR):
+        self.folder = folder
+        self.start = None
+        self.hours = 0
+        self.site_ids = []
+        self.columns = {}
+        meta_path = os.path.join(folder, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.start = meta["debut"]
+            self.hours = meta["heures"]
+            self.site_ids = meta["sites"]
+            self.columns = {name: open_memmap(self._path(name), mode="r+") for name in COLUMNS}
+        self.rows = {site_id: row for row, site_id in enumerate(self.site_ids)}
+
+    def __len__(self):
+        return len(self.site_ids)
+
+    def _path(self, name):
+        return os.path.join(self.folder, f"{name}.npy")
+
+    @property
+    def shape(self):
+        """Taille allouée (sites, heures)."""
+        return self.columns["vent_moy"].shape if self.columns else (0, 0)
+
+    def _reserve(self, sites, hours):
+        """Agrandit les fichiers pour contenir `sites` lignes et `hours` colonnes."""
+        current_sites, current_hours = self.shape
+        if sites <= current_sites and hours <= current_hours:
+            return
+        new_shape = (max(sites, current_sites + current_sites // 2, SITES_BLOCK) if sites > current_sites
+                     else current_sites,
+                     max(hours, current_hours + HOURS_BLOCK) if hours > current_hours else current_hours)
+        os.makedirs(self.folder, exist_ok=True)
+        for name in COLUMNS:
+            tmp_path = self._path(name) + ".tmp"
+            grown = open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=new_shape)
+            grown[:] = np.nan
+            old = self.columns.get(name)
+            if old is not None:
+                for first in range(0, current_sites, STATS_SITES):
+                    last = min(first + STATS_SITES, current_sites)
+                    grown[first:last, :current_hours] = old[first:last]
+                del old
+            grown.flush()
+            del grown
+            os.replace(tmp_path, self._path(name))
+            self.columns[name] = open_memmap(self._path(name), mode="r+")
+        logger.debug(f"Archive agrandie à {new_shape[0]} sites × {new_shape[1]} heures")
+
+    def _row(self, site_id):
+        row = self.rows.get(site_id)
+        if row is None:
+            row = self.rows[site_id] = len(self.site_ids)
+            self.site_ids.append(site_id)
+        return row
+
+    def add(self, site_id, hourly):
+        """
+        Range le bloc "hourly" d'un site (heures UTC, réponse Open-Meteo avec
+        timezone=GMT). Une heure déjà présente est remplacée ; les heures
+        antérieures au début de l'archive sont ignorées.
+
+        :return: Nombre d'heures enregistrées.
+        """
+        times = hourly.get("time") or []
+        if not times:
+            return 0
+        hours = epoch_hours(times)
+        if self.start is None:
+            self.start = int(hours.min())
+        columns = hours - self.start
+        keep = columns >= 0
+        if not keep.all():
+            logger.warning(f"⚠️ Site {site_id} : {int((~keep).sum())} heures antérieures au début de l'archive ignorées")
+        columns = columns[keep]
+        if not len(columns):
+            return 0
+        row = self._row(str(site_id))
+        end = int(columns.max()) + 1
+        self._reserve(len(self.site_ids), end)
+        for name, variable in COLUMNS.items():
+            values = np.array([np.nan if value is None else value for value in hourly.get(variable, [])],
+                              dtype=np.float32)
+            series = np.full(len(times), np.nan, dtype=np.float32)
+            series[:min(len(values), len(times))] = values[:len(times)]
+            self.columns[name][row, columns] = series[keep]
+        self.hours = max(self.hours, end)
+        return len(columns)
+
+    def flush(self):
+        """Écrit les colonnes sur le disque et met à jour archive.json."""
+        if self.start is None:
+            return
+        for column in self.columns.values():
+            column.flush()
+        write_json_atomic({"debut": self.start, "heures": self.hours, "sites": self.site_ids},
+                          os.path.join(self.folder, META_FILE))
+
+    def hour_range(self):
+        """Heures UTC (depuis 1970) de la première et de la dernière colonne remplie."""
+        if self.start is None or not self.hours:
+            return None
+        return self.start, self.start + self.hours - 1
+
+    def statistics(self, direction_masks, orientation_degrees=None):
+        """
+        Statistiques par site et par mois (heure locale), calculées en
+        tableaux par blocs de sites × heures :
+
+        - heures de jour renseignées et heures volables, selon les règles de
+          fetchWeatherForAllSites() (flyability.favorable_hours) ;
+        - nombre d'heures par secteur de la rose à 16 points (toutes heures).
+
+        :param direction_masks: Masque des directions acceptées de chaque
+                                ligne de l'archive (0 : aucune heure volable).
+        :param orientation_degrees: Orientation des lignes sans masque (NaN
+                                    pour les autres), voir favorable_hours.
+        :return: (heures de jour [sites, 12], heures volables [sites, 12],
+                  heures par secteur [sites, 12, 16]).
+        """
+        sites = len(self.site_ids)
+        sectors_count = len(COMPASS_POINTS)
+        daytime_hours = np.zeros((sites, 12), dtype=np.int64)
+        flyable_hours = np.zeros((sites, 12), dtype=np.int64)
+        sector_hours = np.zeros((sites, 12, sectors_count), dtype=np.int64)
+        masks = np.asarray(direction_masks, dtype=np.int64)
+        degrees = None if orientation_degrees is None else np.asarray(orientation_degrees, dtype=np.float64)
+        for first_hour in range(0, self.hours, STATS_HOURS):
+            last_hour = min(first_hour + STATS_HOURS, self.hours)
+            local_hours, months = local_calendar(np.arange(first_hour, last_hour) + self.start)
+            for first in range(0, sites, STATS_SITES):
+                last = min(first + STATS_SITES, sites)
+                block = {name: np.asarray(self.columns[name][first:last, first_hour:last_hour]) for name in COLUMNS}
+                forecast = Forecast(np.broadcast_to(local_hours, block["vent_moy"].shape),
+                                    block["vent_moy"], block["direction"], block["rafales"])
+                known = ~(np.isnan(forecast.speed) | np.isnan(forecast.gust) | np.isnan(forecast.direction))
+                daytime = known & (forecast.hours >= FIRST_HOUR) & (forecast.hours <= LAST_HOUR)
+                flyable = favorable_hours(forecast, masks[first:last],
+                                          None if degrees is None else degrees[first:last])
+                sectors = direction_sectors(forecast.direction)
+                for month in np.unique(months).tolist():
+                    selected = months == month
+                    daytime_hours[first:last, month - 1] += daytime[:, selected].sum(axis=1)
+                    flyable_hours[first:last, month - 1] += flyable[:, selected].sum(axis=1)
+                    # Comptage par (site, secteur) en un seul bincount
+                    month_sectors = sectors[:, selected]
+                    rows = np.broadcast_to(np.arange(last - first)[:, None], month_sectors.shape)
+                    valid = month_sectors >= 0
+                    counts = np.bincount(rows[valid] * sectors_count + month_sectors[valid],
+                                         minlength=(last - first) * sectors_count)
+                    sector_hours[first:last, month - 1] += counts.reshape(last - first, sectors_count)
+        return daytime_hours, flyable_hours, sector_hours
+
+
+def ingest_files(archive, paths):
+    """
+    Range dans l'archive des réponses Open-Meteo enregistrées, un fichier
+    JSON par site nommé d'après son identifiant ({id}.json).
+
+    :return: Nombre d'heures enregistrées.
+    """
+    total = 0
+    for path in sorted(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        site_id = os.path.splitext(os.path.basename(path))[0]
+        total += archive.add(site_id, data.get("hourly") or {})
+    return total
+
+
+def download(sites, folder, start_date, end_date, session=None, base_url=ARCHIVE_URL, batch_size=50):
+    """
+    Récupère les vents horaires passés des sites (API d'archive Open-Meteo,
+    heures UTC) et les enregistre dans `folder`, un fichier {id}.json par
+    site, relu ensuite par ingest_files().
+
+    :return: Chemins des fichiers écrits.
+    """
+    located = [site for site in sites if site.get("latitude") is not None and site.get("longitude") is not None]
+    coordinates = [(site["latitude"], site["longitude"]) for site in located]
+    hourlies = fetch_hourly(coordinates, session, base_url, forecast_days=None, batch_size=batch_size,
+                            timeout=120, timezone="GMT", start_date=start_date, end_date=end_date)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for site, hourly in zip(located, hourlies):
+        if not hourly:
+            continue
+        path = os.path.join(folder, f"{site['id']}.json")
+        write_json_atomic({"latitude": site["latitude"], "longitude": site["longitude"], "hourly": hourly}, path)
+        paths.append(path)
+    return paths
+
+
+def site_direction_rules(archive, sites):
+    """
+    Masque des directions acceptées (SiteTable.direction_masks) et
+    orientation des sites sans masques (SiteTable.fallback_orientation_degrees)
+    de chaque ligne de l'archive.
+    """
+    masks = np.zeros(len(archive), dtype=np.int64)
+    degrees = np.full(len(archive), np.nan)
+    table = SiteTable.from_records(sites)
+    for site, mask, orientation in zip(sites, table.direction_masks.tolist(),
+                                       table.fallback_orientation_degrees.tolist()):
+        row = archive.rows.get(str(site.get("id")))
+        if row is not None:
+            masks[row] = mask
+            degrees[row] = orientation
+    return masks, degrees
+
+
+def climatology(archive, sites, dominant=DOMINANT_SECTORS):
+    """
+    Statistiques mensuelles des sites du catalogue présents dans l'archive :
+    part des heures de jour volables et secteurs de vent dominants.
+
+    :return: {id: {"nom", "mois": {"1": {"heures_jour", "heures_volables",
+              "part_volable", "secteurs_dominants": [[secteur, part], ...]}}}}.
+    """
+    daytime_hours, flyable_hours, sector_hours = archive.statistics(*site_direction_rules(archive, sites))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = flyable_hours / daytime_hours
+        sector_share = sector_hours / sector_hours.sum(axis=2, keepdims=True)
+    top = np.argsort(-sector_hours, axis=2, kind="stable")[:, :, :dominant]
+
+    results = {}
+    for site in sites:
+        row = archive.rows.get(str(site.get("id")))
+        if row is None:
+            continue
+        months = {}
+        for month in range(12):
+            if not sector_hours[row, month].any():
+                continue
+            months[str(month + 1)] = {
+                "heures_jour": int(daytime_hours[row, month]),
+                "heures_volables": int(flyable_hours[row, month]),
+                "part_volable": None if not daytime_hours[row, month] else round(float(share[row, month]), 3),
+                "secteurs_dominants": [[COMPASS_POINTS[sector], round(float(sector_share[row, month, sector]), 3)]
+                                       for sector in top[row, month].tolist() if sector_hours[row, month, sector]],
+            }
+        results[str(site["id"])] = {"nom": site.get("nom"), "mois": months}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive des vents passés des sites et statistiques mensuelles de vol")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR, help="dossier de l'archive (défaut : climatologie/)")
+    parser.add_argument("--catalogue", default=DEFAULT_CATALOG, help="catalogue JSON des sites")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    fetch_command = commands.add_parser("telecharger", help="récupère et archive les vents horaires d'une période")
+    fetch_command.add_argument("debut", help="premier jour (AAAA-MM-JJ)")
+    fetch_command.add_argument("fin", help="dernier jour (AAAA-MM-JJ)")
+    fetch_command.add_argument("--url", default=ARCHIVE_URL, help=f"API d'archive (défaut : {ARCHIVE_URL})")
+    fetch_command.add_argument("--brut", help="dossier des réponses enregistrées (défaut : brut/ dans l'archive)")
+    ingest_command = commands.add_parser("ingerer", help="archive des réponses enregistrées ({id}.json)")
+    ingest_command.add_argument("dossier", help="dossier des fichiers JSON")
+    stats_command = commands.add_parser("statistiques", help="part d'heures volables et secteurs dominants par mois")
+    stats_command.add_argument("--sortie", default=DEFAULT_OUTPUT, help="fichier JSON des statistiques")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup(args)
+
+    with open(args.catalogue, "r", encoding="utf-8") as f:
+        sites = json.load(f)
+    archive = ClimateArchive(args.archive)
+
+    if args.commande in ("telecharger", "ingerer"):
+        with METRICS.stage("ingestion") as stage:
+            if args.commande == "telecharger":
+                folder = args.brut or os.path.join(args.archive, "brut", f"{args.debut}_{args.fin}")
+                with InstrumentedSession() as session:
+                    paths = download(sites, folder, args.debut, args.fin, session, args.url)
+            else:
+                paths = glob.glob(os.path.join(args.dossier, "*.json"))
+            hours = ingest_files(archive, paths)
+            archive.flush()
+            stage.records_in = len(paths)
+            stage.records_out = hours
+        print(f"✅ {hours} heures de {len(paths)} sites archivées ({len(archive)} sites, "
+              f"{archive.hours} heures dans l'archive)")
+    else:
+        with METRICS.stage("statistiques") as stage:
+            results = climatology(archive, sites)
+            stage.records_in = len(archive)
+            stage.records_out = len(results)
+        write_json_atomic(results, args.sortie)
+        print(f"✅ Statistiques de {len(results)} sites enregistrées dans : {args.sortie}")
+    export(args, "climatology")
+
+
+if __name__ == "__main__":
+    main()
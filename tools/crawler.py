@@ -0,0 +1,120 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from metrics import InstrumentedSession
+
+
+class TokenBucket:
+    """
+    Seau à jetons : autorise en moyenne `rate` requêtes par seconde,
+    avec des rafales d'au plus `capacity` requêtes.
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("Le débit doit être strictement positif")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Réserve un jeton et attend le temps nécessaire s'il n'y en a plus.
+        Le solde peut devenir négatif : chaque appelant réserve sa place
+        dans la file et dort en dehors du verrou.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """
+    Limiteur de débit par hôte : un seau à jetons par nom d'hôte.
+    :param rate: Débit par défaut (requêtes/s) pour chaque hôte.
+    :param burst: Taille de rafale autorisée.
+    :param host_rates: Débits spécifiques, ex: {"federation.ffvl.fr": 2}.
+    """
+
+    def __init__(self, rate, burst=1, host_rates=None):
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = host_rates or {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, host):
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.host_rates.get(host, self.rate), self.burst)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        return self.bucket_for(urlsplit(url).hostname or "").acquire()
+
+
+class RateLimitedSession(InstrumentedSession):
+    """
+    Session requests partagée entre les threads : pool de connexions
+    keep-alive dimensionné sur la concurrence, débit limité par hôte.
+    Chaque requête est enregistrée dans les métriques (latence, octets).
+    """
+
+    def __init__(self, limiter, pool_size=10):
+        super().__init__()
+        self.limiter = limiter
+        self.local = threading.local()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def waited(self):
+        """Temps total (s) passé par le thread courant à attendre le limiteur de débit."""
+        return getattr(self.local, "waited", 0.0)
+
+    def request(self, method, url, *args, **kwargs):
+        self.local.waited = self.waited() + self.limiter.acquire(url)
+        return super().request(method, url, *args, **kwargs)
+
+
+class CrawlStats:
+    """Compteurs d'une collecte et calcul du débit obtenu."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.end = None
+        self.ok = 0
+        self.failed = 0
+
+    @property
+    def total(self):
+        return self.ok + self.failed
+
+    @property
+    def elapsed(self):
+        return (self.end or time.monotonic()) - self.start
+
+    @property
+    def throughput(self):
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def print_summary(self):
+        print("\n📊 Résumé de la collecte :")
+        print(f"✅ Sites récupérés : {self.ok}")
+        if self.failed:
+            print(f"❌ Sites en échec : {self.failed}")
+        print(f"⏱️ Durée : {self.elapsed:.1f} s, débit : {self.throughput:.2f} sites/s")
+
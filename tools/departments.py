@@ -0,0 +1,55 @@
+import json
+
+# Départements traités jusqu'ici par défaut
+DEFAULT_DEPARTMENTS = ["07", "43", "42", "48", "15", "63", "69", "26", "38"]
+
+# Tous les départements (métropole, Corse et outre-mer)
+ALL_DEPARTMENTS = ([f"{n:02d}" for n in range(1, 20)] + ["2A", "2B"] +
+                   [f"{n:02d}" for n in range(21, 96)] + ["971", "972", "973", "974", "976"])
+
+
+def department_of(code_postal):
+    """
+    Département d'un code postal (ex: "07000" -> "07", "20200" -> "2B",
+    "97400" -> "974"), ou None si le code est absent ou invalide.
+    """
+    code_postal = (code_postal or "").strip()
+    if len(code_postal) != 5 or not code_postal.isdigit():
+        return None
+    if code_postal.startswith("20"):
+        return "2A" if code_postal < "20200" else "2B"
+    if code_postal.startswith("97"):
+        return code_postal[:3]
+    return code_postal[:2]
+
+
+def add_department_arguments(parser):
+    """Options communes de sélection des départements."""
+    parser.add_argument("--departements", nargs="+", metavar="DPT",
+                        help="départements à traiter, ou « tous » pour l'ensemble des départements")
+    parser.add_argument("--config", help="fichier JSON contenant la liste des départements à traiter")
+
+
+def selected_departments(args, default=None):
+    """
+    Départements demandés sur la ligne de commande (--departements), sinon
+    dans le fichier de configuration (--config : liste JSON, ou objet avec
+    une clé "departements"), sinon `default`.
+    """
+    departments = args.departements
+    if departments is None and args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        departments = config.get("departements") if isinstance(config, dict) else config
+    if departments is None:
+        return default
+    if any(str(department).lower() == "tous" for department in departments):
+        return list(ALL_DEPARTMENTS)
+    # Sans doublon, dans l'ordre demandé ("7" équivaut à "07")
+    result = []
+    for department in departments:
+        department = str(department).upper()
+        department = department.zfill(2) if department.isdigit() else department
+        if department not in result:
+            result.append(department)
+    return result
@@ -0,0 +1,248 @@
+import argparse
+import json
+
+import numpy as np
+import requests
+
+from departments import department_of
+from forecast_cache import DEFAULT_GRID_DEG, ForecastCache
+from metrics import METRICS, InstrumentedSession, add_metrics_arguments, export, get_logger, setup
+from site_rules import COMPASS_POINTS, SECTOR_DEGREES
+from site_table import SiteTable
+from spatial_index import DEFAULT_CATALOG
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+HOURLY_VARIABLES = ("windspeed_10m", "winddirection_10m", "windgusts_10m")
+
+# Règles de fetchWeatherForAllSites() dans index.html
+MAX_WIND_SPEED = 15  # km/h, strictement
+MAX_WIND_GUST = 25  # km/h, strictement
+DIRECTION_TOLERANCE = 45  # degrés de part et d'autre de l'orientation d'un site sans masques
+FIRST_HOUR = 10
+LAST_HOUR = 19
+FORECAST_HOURS = 48
+
+# Nombre de coordonnées par requête Open-Meteo
+DEFAULT_BATCH_SIZE = 100
+
+# Région des sites sans code postal exploitable
+UNKNOWN_REGION = "xx"
+
+logger = get_logger("flyability")
+
+
+class Forecast:
+    """
+    Prévisions horaires de plusieurs points, en tableaux (points × heures).
+    Les valeurs absentes valent NaN et les heures absentes -1.
+
+    :param hours: Heure locale (0-23) de chaque échéance.
+    :param speed: Vent moyen à 10 m (km/h).
+    :param direction: Direction du vent à 10 m (degrés).
+    :param gust: Rafales à 10 m (km/h).
+    """
+
+    def __init__(self, hours, speed, direction, gust):
+        self.hours = hours
+        self.speed = speed
+        self.direction = direction
+        self.gust = gust
+
+    def __len__(self):
+        return len(self.hours)
+
+    @classmethod
+    def from_hourly(cls, hourlies, hours=FORECAST_HOURS):
+        """
+        Construit les tableaux à partir des blocs "hourly" d'Open-Meteo (un
+        par point, None si le point n'a pas pu être récupéré), limités aux
+        `hours` premières échéances.
+        """
+        size = len(hourlies)
+        local_hours = np.full((size, hours), -1, dtype=np.int8)
+        values = {name: np.full((size, hours), np.nan) for name in HOURLY_VARIABLES}
+        for row, hourly in enumerate(hourlies):
+            if not hourly:
+                continue
+            times = hourly.get("time", [])[:hours]
+            # Heures au format ISO local ("2024-05-01T10:00"), comme new Date() dans la page
+            local_hours[row, :len(times)] = [int(time[11:13]) for time in times]
+            for name in HOURLY_VARIABLES:
+                series = hourly.get(name, [])[:hours]
+                values[name][row, :len(series)] = [np.nan if value is None else value for value in series]
+        return cls(local_hours, values["windspeed_10m"], values["winddirection_10m"], values["windgusts_10m"])
+
+    def take(self, rows):
+        return Forecast(self.hours[rows], self.speed[rows], self.direction[rows], self.gust[rows])
+
+
+def fetch_hourly(coordinates, session=None, base_url=OPEN_METEO_URL, forecast_days=2,
+                 batch_size=DEFAULT_BATCH_SIZE, timeout=30, **extra_params):
+    """
+    Récupère les prévisions horaires de plusieurs points, `batch_size`
+    points par requête (Open-Meteo accepte des listes de latitudes et de
+    longitudes et renvoie alors une liste de résultats dans le même ordre).
+
+    :param coordinates: Liste de (latitude, longitude).
+    :param extra_params: Paramètres de requête supplémentaires ou remplacés
+                         (ex: start_date et end_date de l'API d'archive) ;
+                         un paramètre à None n'est pas envoyé.
+    :return: Bloc "hourly" de chaque point, None pour les lots en échec.
+    """
+    http = session or requests
+    hourlies = []
+    for start in range(0, len(coordinates), batch_size):
+        batch = coordinates[start:start + batch_size]
+        params = {
+            "latitude": ",".join(f"{latitude:.4f}" for latitude, _ in batch),
+            "longitude": ",".join(f"{longitude:.4f}" for _, longitude in batch),
+            "hourly": ",".join(HOURLY_VARIABLES),
+            "windspeed_unit": "kmh",
+            "timezone": "auto",
+            "forecast_days": forecast_days,
+            **extra_params,
+        }
+        params = {name: value for name, value in params.items() if value is not None}
+        try:
+            response = http.get(base_url, params=params, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"❌ Erreur lors de la récupération des prévisions ({len(batch)} points) : {e}")
+            hourlies.extend([None] * len(batch))
+            continue
+        if isinstance(data, dict):  # Un seul point : objet au lieu d'une liste
+            data = [data]
+        hourlies.extend(item.get("hourly") for item in data)
+    return hourlies
+
+
+def direction_sectors(direction):
+    """Secteur de la rose à 16 points (0-15) de chaque direction, -1 si elle est inconnue."""
+    sectors = np.full(direction.shape, -1, dtype=np.int64)
+    known = ~np.isnan(direction)
+    sectors[known] = np.floor(direction[known] / SECTOR_DEGREES + 0.5).astype(np.int64) % len(COMPASS_POINTS)
+    return sectors
+
+
+def favorable_hours(forecast, direction_masks, orientation_degrees=None):
+    """
+    Masque (points × heures) des heures favorables : vent < 15 km/h,
+    rafales < 25 km/h, direction acceptée par le site et heure locale entre
+    10 h et 19 h. La direction est un test de bit dans le masque du site
+    (SiteTable.direction_masks) ou, pour un site sans masques, à ±45° de son
+    orientation, bornes incluses (SiteTable.fallback_orientation_degrees).
+    Un point sans secteur ni orientation connus n'a aucune heure favorable,
+    comme dans la page.
+    """
+    masks = np.asarray(direction_masks, dtype=np.int64)[:, None]
+    sectors = direction_sectors(forecast.direction)
+    in_sector = (sectors >= 0) & ((masks >> np.maximum(sectors, 0)) & 1).astype(bool)
+    with np.errstate(invalid="ignore"):
+        if orientation_degrees is not None:
+            orientation = np.asarray(orientation_degrees, dtype=np.float64)[:, None]
+            low = (orientation - DIRECTION_TOLERANCE + 360) % 360
+            high = (orientation + DIRECTION_TOLERANCE) % 360
+            direction = forecast.direction
+            in_sector |= np.where(low <= high,
+                                  (direction >= low) & (direction <= high),
+                                  (direction >= low) | (direction <= high))
+        calm = (forecast.speed < MAX_WIND_SPEED) & (forecast.gust < MAX_WIND_GUST)
+    daytime = (forecast.hours >= FIRST_HOUR) & (forecast.hours <= LAST_HOUR)
+    return in_sector & calm & daytime
+
+
+def favorable_periods(forecast, direction_masks, orientation_degrees=None):
+    """Nombre d'heures favorables de chaque point."""
+    return favorable_hours(forecast, direction_masks, orientation_degrees).sum(axis=1)
+
+
+def site_coordinates(table):
+    """Lignes de la table ayant des coordonnées, et leurs (latitude, longitude)."""
+    rows = np.flatnonzero(~np.isnan(table.latitude) & ~np.isnan(table.longitude))
+    return rows, list(zip(table.latitude[rows].tolist(), table.longitude[rows].tolist()))
+
+
+def score_sites(sites, fetch=fetch_hourly, hours=FORECAST_HOURS):
+    """
+    Périodes favorables de chaque site du catalogue sur les `hours`
+    prochaines heures, en un seul passage : prévisions récupérées par lots,
+    puis évaluation de tous les sites × heures en tableaux NumPy.
+
+    :param fetch: Fonction fetch(coordonnées) -> blocs "hourly" (voir fetch_hourly).
+    :return: Tableau du nombre de périodes favorables par site (-1 sans coordonnées).
+    """
+    table = SiteTable.from_records(sites)
+    rows, coordinates = site_coordinates(table)
+    counts = np.full(len(table), -1, dtype=np.int64)
+    if coordinates:
+        forecast = Forecast.from_hourly(fetch(coordinates), hours)
+        counts[rows] = favorable_periods(forecast, table.direction_masks[rows],
+                                         table.fallback_orientation_degrees[rows])
+    return counts
+
+
+def site_region(site):
+    return department_of(site.get("code_postal")) or UNKNOWN_REGION
+
+
+def rank_by_region(sites, counts, region=site_region):
+    """
+    Classement des sites de chaque région par nombre de périodes favorables
+    décroissant (ordre du catalogue en cas d'égalité, comme findBestSite()).
+
+    :return: {région: [{"site", "commune", "favorablePeriods"}, ...]}.
+    """
+    rankings = {}
+    for site, count in zip(sites, counts.tolist()):
+        if count < 0:
+            continue
+        rankings.setdefault(region(site), []).append(
+            {"site": site.get("nom"), "commune": site.get("commune"), "favorablePeriods": count})
+    for ranking in rankings.values():
+        ranking.sort(key=lambda result: -result["favorablePeriods"])
+    return dict(sorted(rankings.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classe les sites par nombre de périodes favorables sur 48 h")
+    parser.add_argument("--catalogue", default=DEFAULT_CATALOG, help="catalogue JSON des sites")
+    parser.add_argument("--url", default=OPEN_METEO_URL, help=f"API de prévisions (défaut : {OPEN_METEO_URL})")
+    parser.add_argument("--lot", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"nombre de sites par requête (défaut : {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--maille", type=float, default=DEFAULT_GRID_DEG,
+                        help=f"maille du modèle en degrés : une prévision par maille (défaut : {DEFAULT_GRID_DEG})")
+    parser.add_argument("--top", type=int, default=3, help="nombre de sites affichés par département (défaut : 3)")
+    parser.add_argument("--sortie", help="fichier JSON où enregistrer le classement complet")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup(args)
+
+    with open(args.catalogue, "r", encoding="utf-8") as f:
+        sites = json.load(f)
+
+    with InstrumentedSession() as session, METRICS.stage("score") as stage:
+        def fetch(coordinates):
+            return fetch_hourly(coordinates, session, args.url, batch_size=args.lot)
+
+        cache = ForecastCache(fetch, args.maille)
+        counts = score_sites(sites, cache.get_many)
+        stage.records_in = len(sites)
+        stage.records_out = int((counts >= 0).sum())
+    rankings = rank_by_region(sites, counts)
+
+    for region, ranking in rankings.items():
+        print(f"\n📍 Département {region}")
+        for result in ranking[:args.top]:
+            print(f"   {result['favorablePeriods']:>2} périodes favorables : {result['site']} ({result['commune']})")
+    print()
+    cache.print_stats()
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(rankings, f, ensure_ascii=False, indent=4)
+        print(f"\n✅ Classement enregistré dans : {args.sortie}")
+    export(args, "flyability")
+
+
+if __name__ == "__main__":
+    main()
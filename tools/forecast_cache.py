@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from metrics import get_logger
+
+# Maille du modèle AROME France utilisé par Open-Meteo sur la métropole
+DEFAULT_GRID_DEG = 0.025
+# Un run toutes les 3 h, disponible environ 2 h après son heure nominale
+DEFAULT_CYCLE_HOURS = 3
+DEFAULT_PUBLICATION_DELAY_HOURS = 2
+
+logger = get_logger("forecast_cache")
+
+
+def grid_cell(latitude, longitude, grid_deg=DEFAULT_GRID_DEG):
+    """Point de grille du modèle le plus proche (indices ligne, colonne)."""
+    return round(latitude / grid_deg), round(longitude / grid_deg)
+
+
+def cell_center(cell, grid_deg=DEFAULT_GRID_DEG):
+    """Coordonnées (latitude, longitude) d'un point de grille."""
+    return round(cell[0] * grid_deg, 6), round(cell[1] * grid_deg, 6)
+
+
+def current_run(now, cycle_hours=DEFAULT_CYCLE_HOURS, delay_hours=DEFAULT_PUBLICATION_DELAY_HOURS):
+    """Heure nominale (timestamp UTC) du dernier run publié à l'instant `now`."""
+    cycle = cycle_hours * 3600
+    return int((now - delay_hours * 3600) // cycle * cycle)
+
+
+def next_run_available(now, cycle_hours=DEFAULT_CYCLE_HOURS, delay_hours=DEFAULT_PUBLICATION_DELAY_HOURS):
+    """Instant (timestamp) où le run suivant sera publié : fin de validité d'une prévision."""
+    return current_run(now, cycle_hours, delay_hours) + (cycle_hours + delay_hours) * 3600
+
+
+class ForecastCache:
+    """
+    Cache des prévisions par point de grille du modèle.
+
+    Des sites distants de quelques centaines de mètres tombent dans la même
+    maille : une seule prévision est demandée pour la maille (à ses
+    coordonnées) et partagée entre eux. Une prévision reste valable jusqu'à
+    la publication du run suivant. Les demandes simultanées d'une même maille,
+    depuis plusieurs threads ou dans un même lot, ne donnent lieu qu'à un seul
+    appel amont.
+
+    :param fetch: Fonction fetch(coordonnées) -> un bloc "hourly" par point
+                  (None en cas d'échec), ex: flyability.fetch_hourly.
+    :param grid_deg: Taille de maille en degrés.
+    :param clock: Horloge (timestamp), remplaçable pour les tests.
+    """
+
+    def __init__(self, fetch, grid_deg=DEFAULT_GRID_DEG, cycle_hours=DEFAULT_CYCLE_HOURS,
+                 delay_hours=DEFAULT_PUBLICATION_DELAY_HOURS, clock=time.time):
+        self.fetch = fetch
+        self.grid_deg = grid_deg
+        self.cycle_hours = cycle_hours
+        self.delay_hours = delay_hours
+        self.clock = clock
+        self.entries = {}  # maille -> (expiration, prévision)
+        self.inflight = {}  # maille -> Future de la requête en cours
+        self.lock = threading.Lock()
+        self.stats = {"points": 0, "hit": 0, "shared": 0, "fetched": 0, "upstream_calls": 0}
+
+    def _count(self, name, n=1):
+        self.stats[name] += n
+
+    def get(self, latitude, longitude):
+        return self.get_many([(latitude, longitude)])[0]
+
+    def get_many(self, coordinates):
+        """
+        Prévision de chaque point, dans l'ordre. Les mailles absentes ou
+        expirées sont récupérées en un seul appel à `fetch`.
+        """
+        cells = [grid_cell(latitude, longitude, self.grid_deg) for latitude, longitude in coordinates]
+        points = Counter(cells)
+        found = {}
+        waiting = {}
+        mine = {}
+        with self.lock:
+            now = self.clock()
+            self._count("points", len(cells))
+            for cell, count in points.items():
+                entry = self.entries.get(cell)
+                if entry is not None and entry[0] > now:
+                    found[cell] = entry[1]
+                    self._count("hit", count)
+                elif cell in self.inflight:
+                    waiting[cell] = self.inflight[cell]
+                    self._count("shared", count)
+                else:
+                    mine[cell] = self.inflight[cell] = Future()
+                    self._count("fetched")
+                    self._count("shared", count - 1)
+
+        if mine:
+            self._fetch_cells(mine)
+        for cell, future in list(mine.items()) + list(waiting.items()):
+            found[cell] = future.result()
+        return [found[cell] for cell in cells]
+
+    def _fetch_cells(self, futures):
+        """
+        Récupère les mailles de `futures` et résout chacune d'elles, avec None
+        pour une maille sans prévision, même si l'appel échoue : les autres
+        demandes de ces mailles ne restent jamais en attente.
+        """
+        cells = list(futures)
+        results = [None] * len(cells)
+        try:
+            try:
+                fetched = self.fetch([cell_center(cell, self.grid_deg) for cell in cells])
+                if fetched is None or len(fetched) != len(cells):
+                    raise ValueError(f"{0 if fetched is None else len(fetched)} prévisions reçues "
+                                     f"pour {len(cells)} mailles")
+                results = list(fetched)
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la récupération des prévisions : {e}")
+            with self.lock:
+                self._count("upstream_calls")
+                expires = next_run_available(self.clock(), self.cycle_hours, self.delay_hours)
+                for cell, result in zip(cells, results):
+                    # Un échec n'est pas mis en cache : la maille sera redemandée
+                    if result is not None:
+                        self.entries[cell] = (expires, result)
+        finally:
+            with self.lock:
+                for cell in cells:
+                    self.inflight.pop(cell, None)
+            for cell, result in zip(cells, results):
+                futures[cell].set_result(result)
+
+    def purge(self):
+        """Supprime les prévisions expirées."""
+        with self.lock:
+            now = self.clock()
+            self.entries = {cell: entry for cell, entry in self.entries.items() if entry[0] > now}
+
+    @property
+    def hit_rate(self):
+        """Part des points servis sans nouvelle maille demandée en amont."""
+        points = self.stats["points"]
+        return (points - self.stats["fetched"]) / points if points else 0.0
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"🌦️ Cache des prévisions : {stats['points']} points demandés, {stats['hit']} servis par le cache, "
+              f"{stats['shared']} partagés avec une maille voisine ou en cours, {stats['fetched']} mailles récupérées "
+              f"en {stats['upstream_calls']} appel(s), taux de succès {self.hit_rate:.0%}")
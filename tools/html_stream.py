@@ -0,0 +1,130 @@
+from html.parser import HTMLParser
+
+# Éléments vides : jamais empilés (comme dans BeautifulSoup)
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+    'command', 'frame', 'image', 'isindex', 'nextid', 'spacer',
+}
+
+# Éléments dont le texte est exclu de get_text() par BeautifulSoup
+HIDDEN_TEXT_ELEMENTS = {'script', 'style', 'template', 'rt', 'rp'}
+
+# Éléments où BeautifulSoup conserve les blancs tels quels
+PRESERVE_WHITESPACE_ELEMENTS = {'pre', 'textarea'}
+ASCII_SPACES = str.maketrans('', '', '\x20\x0a\x09\x0c\x0d')
+
+
+class StopParsing(Exception):
+    """Levée par une sous-classe pour interrompre la lecture."""
+
+
+class SoupTextParser(HTMLParser):
+    """
+    Lecture HTML en flux, sans arbre, qui reproduit le comportement de
+    BeautifulSoup avec html.parser : éléments vides non empilés, balises
+    fermantes orphelines ignorées, fermeture implicite des éléments enfants,
+    texte des <script>/<style> exclu et blancs réduits entre balises.
+    Le texte reçu par `on_text` est donc exactement celui de get_text().
+
+    Les sous-classes implémentent `on_start`, `on_end` et `on_text`.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.text_buffer = []
+        self.hidden_depth = 0
+
+    # Points d'extension
+
+    def on_start(self, tag, attrs, depth):
+        """Ouverture d'un élément, `depth` étant sa position dans la pile."""
+
+    def on_end(self, tag, depth):
+        """Fermeture (explicite ou implicite) d'un élément."""
+
+    def on_text(self, data):
+        """Texte visible par get_text() à la position courante."""
+
+    # Lecture
+
+    def parse(self, html):
+        """Lit un document complet puis ferme les éléments restés ouverts."""
+        try:
+            self.feed(html)
+            self.finish()
+        except StopParsing:
+            pass
+        return self
+
+    def finish(self):
+        """Fin de document : vide le tampon et ferme les éléments ouverts."""
+        self.close()
+        self._flush_text()
+        while self.stack:
+            self._pop()
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in VOID_ELEMENTS:
+            return
+        attrs = {name: (value if value is not None else '') for name, value in attrs}
+        self.stack.append(tag)
+        if tag in HIDDEN_TEXT_ELEMENTS:
+            self.hidden_depth += 1
+        self.on_start(tag, attrs, len(self.stack))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag not in self.stack:
+            return
+        while self.stack:
+            if self._pop() == tag:
+                break
+
+    def _pop(self):
+        depth = len(self.stack)
+        tag = self.stack.pop()
+        if tag in HIDDEN_TEXT_ELEMENTS:
+            self.hidden_depth -= 1
+        self.on_end(tag, depth)
+        return tag
+
+    def handle_data(self, data):
+        if not self.hidden_depth:
+            self.text_buffer.append(data)
+
+    def _flush_text(self):
+        """
+        Transmet le texte accumulé depuis la dernière balise. Comme
+        BeautifulSoup, un texte fait uniquement de blancs devient un seul
+        saut de ligne ou espace, sauf dans <pre> et <textarea>.
+        """
+        if not self.text_buffer:
+            return
+        data = ''.join(self.text_buffer)
+        self.text_buffer = []
+        if not data.translate(ASCII_SPACES) and not PRESERVE_WHITESPACE_ELEMENTS.intersection(self.stack):
+            data = '\n' if '\n' in data else ' '
+        self.on_text(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        self._flush_text()
+        # Les sections CDATA font toujours partie du texte pour BeautifulSoup
+        if data.upper().startswith('CDATA['):
+            self.on_text(data[len('CDATA['):])
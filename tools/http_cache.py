@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from metrics import METRICS
+
+# Dossier de cache partagé par tous les scripts, à la racine du dépôt
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache_http")
+
+
+class CachedResponse:
+    """
+    Réponse servie par le cache, avec les attributs utilisés par les scripts
+    (status_code, content, text, headers).
+    """
+
+    def __init__(self, url, status_code, content, encoding, headers, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise CacheHTTPError(f"{self.status_code} pour l'URL : {self.url}")
+
+
+class CacheHTTPError(Exception):
+    pass
+
+
+class HttpCache:
+    """
+    Cache HTTP sur disque, indexé par URL.
+
+    Une entrée plus récente que `ttl` secondes est servie sans requête ;
+    au-delà elle est revalidée avec If-None-Match / If-Modified-Since et
+    seules les pages modifiées sont retéléchargées. Le corps est stocké
+    compressé (gzip) et les métadonnées dans un fichier JSON voisin.
+
+    :param directory: Dossier du cache.
+    :param ttl: Durée de fraîcheur en secondes (0 = toujours revalider).
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=24 * 3600):
+        self.directory = directory
+        self.ttl = ttl
+        self.stats = {"hit": 0, "revalidated": 0, "miss": 0, "bytes_downloaded": 0}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return f"{base}.json", f"{base}.gz"
+
+    def _count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+        if name != "bytes_downloaded":
+            METRICS.inc("http_cache_total", n, result=name)
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with gzip.open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _store_meta(self, url, meta):
+        meta_path, _ = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _store(self, url, meta, body):
+        _, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, body_path)
+        self._store_meta(url, meta)
+
+    def get(self, session, url, **kwargs):
+        """
+        Récupère `url` via `session` (ou le module requests) en passant par le cache.
+        Seules les réponses 200 sont mises en cache.
+        """
+        meta, body = self._load(url)
+        if meta is not None and time.time() - meta["fetched_at"] < self.ttl:
+            self._count("hit")
+            return CachedResponse(url, 200, body, meta.get("encoding"), meta.get("headers", {}), True)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if meta is not None:
+            if meta.get("headers", {}).get("ETag"):
+                headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta.get("headers", {}).get("Last-Modified"):
+                headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        response = session.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and meta is not None:
+            self._count("revalidated")
+            meta["fetched_at"] = time.time()
+            self._store_meta(url, meta)
+            return CachedResponse(url, 200, body, meta.get("encoding"), meta.get("headers", {}), True)
+
+        self._count("miss")
+        self._count("bytes_downloaded", len(response.content))
+        encoding = response.encoding or response.apparent_encoding
+        if response.status_code == 200:
+            kept_headers = {name: response.headers[name]
+                            for name in ("ETag", "Last-Modified", "Content-Type")
+                            if name in response.headers}
+            meta = {"url": url, "fetched_at": time.time(), "encoding": encoding, "headers": kept_headers}
+            self._store(url, meta, response.content)
+        return CachedResponse(url, response.status_code, response.content, encoding, dict(response.headers), False)
+
+    def invalidate(self, url):
+        """Oublie la page `url` : la prochaine demande la retélécharge."""
+        for path in self._paths(url):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def hit_rate(self):
+        total = self.stats["hit"] + self.stats["revalidated"] + self.stats["miss"]
+        return (self.stats["hit"] + self.stats["revalidated"]) / total if total else 0.0
+
+    def print_stats(self):
+        print(f"🗄️ Cache HTTP : {self.stats['hit']} servies sans requête, "
+              f"{self.stats['revalidated']} revalidées (304), {self.stats['miss']} téléchargées "
+              f"({self.stats['bytes_downloaded'] / 1024:.0f} Ko), taux de succès {self.hit_rate:.0%}")
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+
+from checkpoint import write_json_atomic
+from listing_parser import dump_json_array
+
+# Champs identifiant un enregistrement : "id" pour les sites, "url" pour les balises
+KEY_FIELDS = ("id", "url")
+
+
+def list_json_files(input_folder, prefix, exclude=()):
+    """
+    Fichiers JSON d'un dossier dont le nom commence par `prefix`, triés par
+    nom pour que la fusion ne dépende pas de l'ordre du système de fichiers.
+
+    :param exclude: Chemins à ignorer (ex: le fichier de sortie de la fusion).
+    """
+    excluded = {os.path.abspath(path) for path in exclude}
+    paths = []
+    for filename in sorted(os.listdir(input_folder)):
+        path = os.path.join(input_folder, filename)
+        if filename.startswith(prefix) and filename.endswith(".json") and os.path.abspath(path) not in excluded:
+            paths.append(path)
+    return paths
+
+
+def load_json_files(paths):
+    """
+    Concatène le contenu de plusieurs fichiers JSON (listes ou objets isolés).
+    Un fichier illisible est signalé puis ignoré.
+    """
+    merged_data = []
+    for path in paths:
+        filename = os.path.basename(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, list):  # Si le fichier contient une liste
+                merged_data.extend(data)
+            elif isinstance(data, dict):  # Si le fichier contient un dictionnaire
+                merged_data.append(data)
+            print(f"✅ Fichier chargé : {filename}")
+        except Exception as e:
+            print(f"❌ Erreur lors du chargement de {filename} : {e}")
+    return merged_data
+
+
+def iter_json_records(path, chunk_size=1 << 16):
+    """
+    Enregistrements d'un fichier JSON lus au fil de l'eau, par blocs de
+    `chunk_size` caractères : éléments d'une liste, ou l'objet lui-même si
+    le fichier ne contient qu'un dictionnaire.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size)
+        eof = not buffer
+        position = 0
+
+        def refill():
+            nonlocal buffer, position, eof
+            more = f.read(chunk_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            refill()
+        if position == len(buffer):
+            return
+        if buffer[position] != "[":
+            data = json.loads(buffer[position:] + f.read())
+            if isinstance(data, dict):
+                yield data
+            return
+
+        position += 1
+        while True:
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ","):
+                position += 1
+            if position == len(buffer):
+                if eof:
+                    raise json.JSONDecodeError("Liste non terminée", buffer, position)
+                refill()
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+                continue
+            if end == len(buffer) and not eof:
+                # Valeur peut-être tronquée par la fin du bloc
+                refill()
+                continue
+            yield record
+            position = end
+
+
+def record_key(record, key_fields=KEY_FIELDS):
+    """Clé de dédoublonnage d'un enregistrement ("id:921"), None s'il n'en a pas."""
+    if isinstance(record, dict):
+        for field in key_fields:
+            value = record.get(field)
+            if value not in (None, ""):
+                return f"{field}:{value}"
+    return None
+
+
+def deduplicate(records, key_fields=KEY_FIELDS):
+    """
+    Retire les doublons d'une liste d'enregistrements : le dernier l'emporte,
+    à la position du premier (comme checkpoint.compact). Les enregistrements
+    sans clé sont tous conservés.
+    """
+    merged = {}
+    for position, record in enumerate(records):
+        merged[record_key(record, key_fields) or f"#{position}"] = record
+    return list(merged.values())
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def read_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def merge_files(paths, output_file, key_fields=KEY_FIELDS, manifest_file=None):
+    """
+    Fusionne des fichiers JSON en un seul, sans doublons : pour une même clé
+    (voir record_key), l'enregistrement du dernier fichier l'emporte, à la
+    position de sa première apparition. Les fichiers sont lus un par un et
+    la sortie est écrite au fil de l'eau dans un fichier temporaire renommé
+    atomiquement.
+
+    Le manifeste (`{output_file}.manifest`) conserve la date de
+    modification, la taille, l'empreinte sha256 et les clés de chaque
+    fichier d'entrée. À la fusion suivante, un fichier inchangé n'est pas
+    relu : ses enregistrements sont repris de la sortie précédente, si elle
+    n'a pas été modifiée depuis et qu'ils n'y avaient pas été remplacés par
+    ceux d'un autre fichier.
+
+    :return: Statistiques {"fichiers", "relus", "enregistrements", "doublons"}.
+    """
+    manifest_file = manifest_file or f"{output_file}.manifest"
+    previous = read_manifest(manifest_file)
+    previous_entries = previous.get("entrees", {})
+    # Fichier dont provenait chaque clé de la sortie précédente
+    previous_winner = {}
+    for name in previous.get("ordre", []):
+        for key in previous_entries.get(name, {}).get("cles", []):
+            previous_winner[key] = name
+
+    entries = {}
+    unchanged = set()
+    for path in paths:
+        name = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = previous_entries.get(name)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["taille"] == stat.st_size:
+            unchanged.add(name)
+        else:
+            digest = file_sha256(path)
+            if entry and entry["sha256"] == digest:
+                unchanged.add(name)
+            else:
+                entry = {"sha256": digest, "cles": None}
+        entries[name] = {**entry, "mtime_ns": stat.st_mtime_ns, "taille": stat.st_size}
+
+    previous_records = {}
+    if unchanged and os.path.exists(output_file) and previous.get("sortie") == file_sha256(output_file):
+        previous_records = dict(zip(previous.get("cles", []), iter_json_records(output_file)))
+
+    merged = {}
+    stats = {"fichiers": len(paths), "relus": 0, "enregistrements": 0, "doublons": 0}
+    for path in paths:
+        name = os.path.abspath(path)
+        filename = os.path.basename(path)
+        entry = entries[name]
+        records = None
+        if name in unchanged:
+            keys = entry["cles"]
+            if keys is not None and all(previous_winner.get(key) == name and key in previous_records
+                                        for key in keys):
+                records = [previous_records[key] for key in keys]
+                print(f"⏭️ Fichier inchangé : {filename}")
+        if records is None:
+            try:
+                records = list(iter_json_records(path))
+            except (OSError, ValueError) as e:
+                print(f"❌ Erreur lors du chargement de {filename} : {e}")
+                del entries[name]
+                continue
+            keys = [record_key(record, key_fields) or f"#{name}#{position}"
+                    for position, record in enumerate(records)]
+            entry["cles"] = keys
+            stats["relus"] += 1
+            print(f"✅ Fichier chargé : {filename}")
+        for key, record in zip(keys, records):
+            if key in merged:
+                stats["doublons"] += 1
+            merged[key] = record
+
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        stats["enregistrements"] = dump_json_array(merged.values(), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, output_file)
+
+    write_json_atomic({
+        "sortie": file_sha256(output_file),
+        "ordre": [name for name in map(os.path.abspath, paths) if name in entries],
+        "entrees": entries,
+        "cles": list(merged),
+    }, manifest_file)
+    return stats
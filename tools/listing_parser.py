@@ -0,0 +1,167 @@
+import json
+import re
+
+from html_stream import SoupTextParser
+
+TERRAIN_HREF_RE = re.compile(r'/terrain/\d+')
+CHUNK_SIZE = 64 * 1024
+
+
+def extract_site_id(href_text):
+    """Extrait l'ID d'un site à partir du lien href"""
+    match = re.search(r'/terrain/(\d+)', href_text)
+    if match:
+        return match.group(1)
+    return None
+
+
+class _Row:
+    """Ligne <tr> en cours : cellules et nombre de liens /terrain/."""
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.cells = []
+        self.terrain_links = 0
+
+
+class _Cell:
+    """Cellule <td> : texte complet et premier lien <a>."""
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.parts = []
+        self.link = None
+        self.link_parts = None
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+class ListingParser(SoupTextParser):
+    """
+    Lecture en flux de la liste des terrains FFVL : chaque ligne <tr> qui
+    contient un lien /terrain/ produit un site dès sa fermeture, sans garder
+    le reste du document en mémoire.
+
+    Même résultat que l'analyse BeautifulSoup de _1-analyseffvl.py : une
+    entrée par lien /terrain/, construite à partir des cellules <td> de la
+    ligne la plus proche.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.cells = []
+        self.links = []
+        self.ready = []
+
+    def on_start(self, tag, attrs, depth):
+        if tag == 'tr':
+            self.rows.append(_Row(depth))
+        elif tag == 'td':
+            cell = _Cell(depth)
+            self.cells.append(cell)
+            for row in self.rows:
+                row.cells.append(cell)
+        elif tag == 'a':
+            for cell in self.cells:
+                if cell.link is None:
+                    cell.link = attrs
+                    cell.link_parts = []
+                    self.links.append((cell, depth))
+            if self.rows and TERRAIN_HREF_RE.search(attrs.get('href', '')):
+                self.rows[-1].terrain_links += 1
+
+    def on_end(self, tag, depth):
+        if tag == 'tr' and self.rows and self.rows[-1].depth == depth:
+            row = self.rows.pop()
+            site = build_site(row.cells)
+            if site:
+                self.ready.extend([site] * row.terrain_links)
+        elif tag == 'td' and self.cells and self.cells[-1].depth == depth:
+            self.cells.pop()
+        elif tag == 'a':
+            self.links = [(cell, link_depth) for cell, link_depth in self.links if link_depth < depth]
+
+    def on_text(self, data):
+        for cell in self.cells:
+            cell.parts.append(data)
+        for cell, _ in self.links:
+            cell.link_parts.append(data)
+
+    def drain(self):
+        """Renvoie et oublie les sites terminés depuis le dernier appel."""
+        ready, self.ready = self.ready, []
+        return ready
+
+
+def build_site(cells):
+    """Construit l'entrée d'un site à partir des cellules d'une ligne."""
+    if len(cells) < 5:
+        return None
+    link = cells[0].link
+    site_name = ''.join(cells[0].link_parts).strip() if link is not None else ""
+    site_id = extract_site_id(link['href']) if link is not None and 'href' in link else ""
+
+    # Extraire le nom entre crochets si présent
+    match = re.search(r'(.*?)\s*\[(.*?)\]', site_name)
+    if match:
+        site_name = match.group(1).strip()
+        site_code = match.group(2).strip()
+    else:
+        site_code = site_id
+
+    return {
+        "id": site_id,
+        "nom": site_name,
+        "code": site_code,
+        "commune": cells[1].text.strip(),
+        "code_postal": cells[2].text.strip(),
+        "activite": cells[3].text.strip(),
+        "statut": cells[4].text.strip()
+    }
+
+
+def iter_sites(chunks):
+    """
+    Générateur des sites d'une liste HTML fournie par morceaux (fichier lu
+    par blocs, réponse HTTP en flux, ou plusieurs pages concaténées).
+    """
+    parser = ListingParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.drain()
+    parser.finish()
+    yield from parser.drain()
+
+
+def iter_file_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_sites_from_files(paths):
+    """Sites de plusieurs pages de liste, lues l'une après l'autre."""
+    for path in paths:
+        yield from iter_sites(iter_file_chunks(path))
+
+
+def dump_json_array(records, file):
+    """
+    Écrit les enregistrements au fil de l'eau, au même format que
+    json.dump(records, file, ensure_ascii=False, indent=4).
+
+    :return: Nombre d'enregistrements écrits.
+    """
+    count = 0
+    for record in records:
+        file.write("[\n    " if count == 0 else ",\n    ")
+        file.write(json.dumps(record, ensure_ascii=False, indent=4).replace("\n", "\n    "))
+        count += 1
+    file.write("\n]" if count else "[]")
+    return count
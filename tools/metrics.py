@@ -0,0 +1,311 @@
+import cProfile
+import contextlib
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+# Préfixe des métriques exportées pour Prometheus
+PREFIX = "meteo_"
+
+# Bornes (secondes) des histogrammes de latence HTTP et de temps d'analyse
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# Description des métriques (lignes # HELP du fichier Prometheus)
+DESCRIPTIONS = {
+    "stage_duration_seconds": "Durée de la dernière exécution de chaque étape",
+    "stage_records_in": "Nombre d'éléments en entrée de chaque étape",
+    "stage_records_out": "Nombre d'éléments produits par chaque étape",
+    "http_request_duration_seconds": "Latence des requêtes HTTP par hôte",
+    "http_requests_total": "Requêtes HTTP par hôte et code de retour",
+    "http_response_bytes_total": "Octets reçus par hôte",
+    "http_errors_total": "Requêtes HTTP sans réponse (erreur réseau, délai dépassé)",
+    "http_retries_total": "Nouvelles tentatives de requêtes HTTP",
+    "http_cache_total": "Pages demandées au cache HTTP par résultat",
+    "work_queue_retries_total": "Éléments de la file de travail replanifiés après un échec temporaire",
+    "work_queue_items": "Éléments de la file de travail par état",
+    "crawl_concurrency": "Nombre de requêtes simultanées autorisé par la file de travail",
+    "balise_readings_total": "Relevés de balises par résultat",
+    "page_parse_seconds": "Temps d'analyse d'une page par extracteur",
+    "last_run_timestamp_seconds": "Fin de la dernière exécution du script",
+}
+
+LOGGER_NAME = "meteo"
+
+
+def get_logger(name):
+    """Logger d'un script ou module, sous le logger commun "meteo"."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def configure_logging(level=logging.INFO):
+    """
+    Affiche les messages des scripts sur la sortie standard, sans préfixe,
+    à partir du niveau `level` (DEBUG affiche le détail site par site).
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes, au format Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class StageRecord:
+    """Mesures d'une étape, complétées par l'appelant (éléments en entrée et en sortie)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.records_in = None
+        self.records_out = None
+        self.duration = None
+
+
+class Metrics:
+    """
+    Métriques d'une exécution, partagées par tous les modules d'un script
+    (voir METRICS) et utilisables depuis plusieurs threads.
+
+    Les compteurs, jauges et histogrammes sont identifiés par leur nom et
+    leurs étiquettes (ex: host="federation.ffvl.fr"). Le rapport est écrit en
+    JSON et au format texte de Prometheus (textfile collector de node_exporter).
+
+    :param profile: Étapes à exécuter sous cProfile ("tout" pour toutes).
+    :param profile_dir: Dossier des fichiers .prof.
+    """
+
+    def __init__(self, profile=(), profile_dir="."):
+        self.profile = set(profile)
+        self.profile_dir = profile_dir
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.stages = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, buckets=HTTP_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name, buckets=PARSE_BUCKETS, **labels):
+        """Ajoute la durée du bloc à l'histogramme `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, buckets, **labels)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Mesure la durée d'une étape ; l'appelant renseigne records_in et
+        records_out sur l'objet renvoyé. Si l'étape fait partie des étapes à
+        profiler, elle est exécutée sous cProfile (thread appelant uniquement)
+        et les statistiques sont écrites dans `{profile_dir}/{name}.prof`.
+        """
+        record = StageRecord(name)
+        profiler = cProfile.Profile() if name in self.profile or "tout" in self.profile else None
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record.duration = time.perf_counter() - start
+            with self.lock:
+                self.stages[name] = record
+            self.set("stage_duration_seconds", round(record.duration, 6), stage=name)
+            if record.records_in is not None:
+                self.set("stage_records_in", record.records_in, stage=name)
+            if record.records_out is not None:
+                self.set("stage_records_out", record.records_out, stage=name)
+            if profiler:
+                self._dump_profile(name, profiler)
+
+    def _dump_profile(self, name, profiler):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}.prof")
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        logger = get_logger("profil")
+        logger.info(f"🔬 Profil de l'étape {name} enregistré dans : {path}")
+        logger.debug(summary.getvalue())
+
+    def record_response(self, url, seconds, response=None):
+        """Latence, code de retour, taille et nouvelles tentatives d'une requête HTTP."""
+        host = urlsplit(url).hostname or ""
+        self.observe("http_request_duration_seconds", seconds, HTTP_BUCKETS, host=host)
+        if response is None:
+            self.inc("http_errors_total", host=host)
+            return
+        self.inc("http_requests_total", host=host, status=response.status_code)
+        self.inc("http_response_bytes_total", len(response.content), host=host)
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        if retries is not None and retries.history:
+            self.inc("http_retries_total", len(retries.history), host=host)
+
+    def report(self, script):
+        """Rapport de l'exécution sous forme de dictionnaire JSON."""
+        def series(items, value):
+            return [{"nom": name, "etiquettes": dict(labels), **value(item)} for (name, labels), item in items]
+
+        with self.lock:
+            return {
+                "script": script,
+                "debut": round(self.started, 3),
+                "fin": round(time.time(), 3),
+                "etapes": {name: {"duree_s": round(record.duration, 6), "entrees": record.records_in,
+                                  "sorties": record.records_out}
+                           for name, record in self.stages.items()},
+                "compteurs": series(sorted(self.counters.items()), lambda value: {"valeur": value}),
+                "jauges": series(sorted(self.gauges.items()), lambda value: {"valeur": value}),
+                "histogrammes": series(sorted(self.histograms.items()), lambda histogram: {
+                    "bornes": list(histogram.buckets), "cumul": list(histogram.counts),
+                    "somme": round(histogram.sum, 6), "nombre": histogram.count}),
+            }
+
+    def prometheus(self, script):
+        """Métriques au format texte de Prometheus, étiquetées par script."""
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        def labels_text(labels, extra=()):
+            pairs = [("script", script)] + list(labels) + list(extra)
+            escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, "counter")
+                lines.append(f"{PREFIX}{name}{labels_text(labels)} {value}")
+            gauges = dict(self.gauges)
+            gauges[("last_run_timestamp_seconds", ())] = round(time.time(), 3)
+            for (name, labels), value in sorted(gauges.items()):
+                header(name, "gauge")
+                lines.append(f"{PREFIX}{name}{labels_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                header(name, "histogram")
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{PREFIX}{name}_bucket{labels_text(labels, [('le', str(bound))])} {count}")
+                lines.append(f"{PREFIX}{name}_bucket{labels_text(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{PREFIX}{name}_sum{labels_text(labels)} {histogram.sum:.6f}")
+                lines.append(f"{PREFIX}{name}_count{labels_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory, script):
+        """
+        Écrit `{script}.json` et `{script}.prom` dans `directory`, chacun
+        remplacé d'un bloc (node_exporter ne lit jamais un fichier partiel).
+
+        :return: Chemins des deux fichiers.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for extension, content in (("json", json.dumps(self.report(script), ensure_ascii=False, indent=4)),
+                                   ("prom", self.prometheus(script))):
+            path = os.path.join(directory, f"{script}.{extension}")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+
+# Métriques de l'exécution en cours, partagées par tous les modules
+METRICS = Metrics()
+
+
+class InstrumentedSession(requests.Session):
+    """Session requests qui enregistre chaque requête dans METRICS."""
+
+    def request(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            METRICS.record_response(url, time.perf_counter() - start)
+            raise
+        METRICS.record_response(url, time.perf_counter() - start, response)
+        return response
+
+
+def add_metrics_arguments(parser):
+    """Options communes de journalisation, de métriques et de profilage."""
+    group = parser.add_argument_group("journal et métriques")
+    verbosity = group.add_mutually_exclusive_group()
+    verbosity.add_argument("-v", "--verbeux", action="store_true", help="affiche le détail site par site")
+    verbosity.add_argument("-q", "--silencieux", action="store_true",
+                           help="n'affiche que les avertissements et les erreurs")
+    group.add_argument("--metriques", metavar="DOSSIER",
+                       help="écrit le rapport JSON et le fichier Prometheus (.prom) de l'exécution dans DOSSIER")
+    group.add_argument("--profil", nargs="+", metavar="ETAPE", default=[],
+                       help="exécute ces étapes sous cProfile (« tout » pour toutes)")
+
+
+def setup(args):
+    """Applique les options de add_metrics_arguments()."""
+    configure_logging(logging.DEBUG if args.verbeux else logging.WARNING if args.silencieux else logging.INFO)
+    METRICS.profile = set(args.profil)
+    METRICS.profile_dir = args.metriques or "."
+
+
+def export(args, script):
+    """Écrit les métriques si --metriques est demandé."""
+    if args.metriques:
+        paths = METRICS.export(args.metriques, script)
+        get_logger(script).info(f"📈 Métriques enregistrées dans : {', '.join(paths)}")
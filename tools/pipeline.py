@@ -0,0 +1,307 @@
+import argparse
+import copy
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+from checkpoint import write_json_atomic
+from metrics import METRICS, add_metrics_arguments, export, get_logger, setup
+from script_loader import REPO_ROOT, load_script
+
+STATE_FILE = os.path.join(REPO_ROOT, ".pipeline_state.json")
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "balise-tools"))
+
+logger = get_logger("pipeline")
+
+
+class FileHasher:
+    """
+    Empreintes sha256 du contenu des fichiers. Un fichier dont la date de
+    modification et la taille n'ont pas changé n'est pas relu.
+
+    :param known: Empreintes connues {chemin: [mtime_ns, taille, sha256]}.
+    """
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+
+    def digest(self, path):
+        stat = os.stat(path)
+        relative = os.path.relpath(path, REPO_ROOT)
+        entry = self.known.get(relative)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                sha.update(block)
+        self.known[relative] = [stat.st_mtime_ns, stat.st_size, sha.hexdigest()]
+        return sha.hexdigest()
+
+
+class Stage:
+    """
+    Étape du pipeline.
+
+    :param name: Nom de l'étape.
+    :param run: Fonction run(fichiers_entree, *sorties_des_dependances) qui
+                renvoie les données produites, sans modifier ses arguments.
+    :param deps: Étapes dont les sorties sont passées à `run`.
+    :param inputs: Motifs glob (relatifs à la racine du dépôt) des fichiers lus.
+    :param sources: Scripts et modules dont dépend le traitement : les
+                    modifier relance l'étape.
+    :param output: Fichier produit par l'étape (relatif à la racine), où le
+                   pipeline écrit en JSON les données renvoyées par `run`.
+                   L'étape est relancée si ce fichier disparaît ou change.
+    :param writes_output: `run` écrit lui-même `output` (et d'autres
+                          fichiers, pas forcément en JSON) : le pipeline ne
+                          fait que le suivre.
+    """
+
+    def __init__(self, name, run, deps=(), inputs=(), sources=(), output=None, writes_output=False):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)
+        self.sources = tuple(sources)
+        self.output = output
+        self.writes_output = writes_output
+
+    @property
+    def output_path(self):
+        return os.path.join(REPO_ROOT, self.output) if self.output else None
+
+
+class Pipeline:
+    """
+    Exécution incrémentale d'un graphe d'étapes.
+
+    L'empreinte d'une étape combine le contenu de ses fichiers d'entrée, de
+    ses sources et les empreintes de ses dépendances. Une étape dont
+    l'empreinte n'a pas changé depuis la dernière exécution n'est pas
+    relancée : sa sortie n'est relue sur disque que si une étape en aval en a
+    besoin. Les données passent en mémoire d'une étape relancée à la suivante.
+
+    :param stages: Liste des étapes.
+    :param state_file: Fichier où sont conservées les empreintes entre deux exécutions.
+    """
+
+    def __init__(self, stages, state_file=STATE_FILE):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.outputs = {os.path.abspath(stage.output_path) for stage in stages if stage.output}
+        self.values = {}
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"stages": {}, "files": {}}
+
+    def order(self, targets=None):
+        """Étapes nécessaires aux cibles, dans l'ordre des dépendances."""
+        ordered = []
+        visiting = set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name not in self.stages:
+                raise KeyError(f"Étape inconnue : {name}")
+            if name in visiting:
+                raise ValueError(f"Dépendance circulaire sur l'étape {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in targets or self.stages:
+            visit(name)
+        return ordered
+
+    def input_files(self, stage):
+        """Fichiers d'entrée d'une étape, hors fichiers produits par le pipeline."""
+        paths = []
+        for pattern in stage.inputs:
+            for path in sorted(glob.glob(os.path.join(REPO_ROOT, pattern))):
+                if os.path.abspath(path) not in self.outputs:
+                    paths.append(path)
+        return paths
+
+    def fingerprint(self, stage, paths, fingerprints, hasher):
+        sha = hashlib.sha256(stage.name.encode("utf-8"))
+        for path in [os.path.join(REPO_ROOT, source) for source in stage.sources] + paths:
+            sha.update(os.path.relpath(path, REPO_ROOT).encode("utf-8"))
+            sha.update(hasher.digest(path).encode("ascii"))
+        for dep in stage.deps:
+            sha.update(fingerprints[dep].encode("ascii"))
+        return sha.hexdigest()
+
+    def value(self, name):
+        """Sortie d'une étape : en mémoire si elle vient d'être calculée, sinon relue."""
+        if name not in self.values:
+            with open(self.stages[name].output_path, "r", encoding="utf-8") as f:
+                self.values[name] = json.load(f)
+        return self.values[name]
+
+    def run(self, targets=None, force=False):
+        """
+        Relance les étapes dont les entrées ont changé.
+
+        :return: Liste des noms des étapes exécutées.
+        """
+        state = self._load_state()
+        hasher = FileHasher(state.get("files"))
+        fingerprints = {}
+        executed = []
+        start = time.perf_counter()
+
+        for name in self.order(targets):
+            stage = self.stages[name]
+            paths = self.input_files(stage)
+            fingerprint = self.fingerprint(stage, paths, fingerprints, hasher)
+            fingerprints[name] = fingerprint
+            previous = state["stages"].get(name)
+            output_ok = stage.output is None or (
+                previous and os.path.exists(stage.output_path)
+                and hasher.digest(stage.output_path) == previous.get("output"))
+            if not force and previous and previous["fingerprint"] == fingerprint and output_ok:
+                logger.info(f"⏭️ {name} : à jour")
+                continue
+
+            stage_start = time.perf_counter()
+            logger.info(f"▶️ {name}")
+            inputs = [self.value(dep) for dep in stage.deps]
+            with METRICS.stage(name) as stage_record:
+                # Éléments reçus des dépendances, ou nombre de fichiers lus
+                stage_record.records_in = sum(len(value) for value in inputs) if inputs else len(paths)
+                self.values[name] = stage.run(paths, *inputs)
+                if isinstance(self.values[name], list):
+                    stage_record.records_out = len(self.values[name])
+            record = {"fingerprint": fingerprint}
+            if stage.output:
+                if stage.writes_output:
+                    # Sortie relue sur disque si une étape en aval en a besoin
+                    del self.values[name]
+                else:
+                    write_json_atomic(self.values[name], stage.output_path)
+                record["output"] = hasher.digest(stage.output_path)
+            state["stages"][name] = record
+            executed.append(name)
+            logger.info(f"✅ {name} terminé en {time.perf_counter() - stage_start:.3f} s")
+
+        state["files"] = hasher.known
+        write_json_atomic(state, self.state_file)
+        logger.info(f"📊 {len(executed)} étape(s) relancée(s) en {time.perf_counter() - start:.3f} s")
+        return executed
+
+
+# Étapes du traitement hors ligne. La récupération des détails des sites
+# (_2-requestInfosSite.py, suivi de _3-formatdetails.py et du classement par
+# département dans data-dpt/) et celle des balises (_5-searchBaliseByDpt.py)
+# interrogent des serveurs distants : elles restent des scripts séparés dont
+# les fichiers produits sont les entrées du pipeline.
+
+def run_listing(paths):
+    from listing_parser import iter_sites_from_files
+    return list(iter_sites_from_files(paths))
+
+
+def run_merge(paths):
+    from json_merge import deduplicate, load_json_files
+    return deduplicate(load_json_files(paths))
+
+
+def run_associations(paths, sites, balises):
+    module = load_script("balise-tools/_7-addBalises.py")
+    return module.associate_balises(copy.deepcopy(sites), balises, verbose=False)
+
+
+def run_corrections(paths, sites):
+    from corrections_engine import CorrectionsEngine
+    engine = CorrectionsEngine.load(paths)
+    updated_sites = engine.apply(copy.deepcopy(sites))
+    engine.print_unused()
+    return updated_sites
+
+
+def run_store(paths, sites, balises):
+    from site_store import SiteStore
+    with SiteStore() as store:
+        changed, removed = store.replace_sites(sites)
+        balises_changed, balises_removed = store.replace_balises(balises)
+    logger.info(f"🗄️ Base {store.path} : {changed} sites et {balises_changed} balises mis à jour, "
+                f"{removed + balises_removed} supprimés")
+
+
+def run_bundle(paths, sites):
+    from site_bundle import DEFAULT_OUTPUT_DIR, write_bundle
+    write_bundle(sites, DEFAULT_OUTPUT_DIR)
+
+
+def run_deltas(paths, sites):
+    from catalog_delta import DEFAULT_OUTPUT_DIR, publish
+    publish(sites, DEFAULT_OUTPUT_DIR)
+
+
+STAGES = [
+    Stage("liste", run_listing,
+          inputs=["tools/_0-reponse_ffvl.html"],
+          sources=["tools/listing_parser.py", "tools/html_stream.py"],
+          output="tools/sites_ffvl.json"),
+    Stage("sites", run_merge,
+          inputs=["data-dpt/sites_ffvl*.json"],
+          sources=["tools/json_merge.py"],
+          output="balise-tools/merged_sites.json"),
+    Stage("balises", run_merge,
+          inputs=["balise-tools/balises_*.json"],
+          sources=["tools/json_merge.py"],
+          output="balise-tools/balises_all.json"),
+    Stage("associations", run_associations,
+          deps=["sites", "balises"],
+          sources=["balise-tools/_7-addBalises.py", "balise-tools/balise_matcher.py", "balise-tools/balise_locator.py",
+                   "tools/spatial_index.py"],
+          output="balise-tools/merged_sites_with_balises.json"),
+    Stage("corrections", run_corrections,
+          deps=["associations"],
+          inputs=["balise-tools/corrections.json"],
+          sources=["balise-tools/corrections_engine.py", "tools/site_rules.py"],
+          output="balise-tools/merged_sites_with_balises_corrected.json"),
+    Stage("base", run_store,
+          deps=["corrections", "balises"],
+          sources=["tools/site_store.py"],
+          output="catalogue.sqlite", writes_output=True),
+    Stage("bundle", run_bundle,
+          deps=["corrections"],
+          sources=["tools/site_bundle.py", "tools/departments.py", "tools/spatial_index.py"],
+          output="sites/index.json", writes_output=True),
+    Stage("deltas", run_deltas,
+          deps=["corrections"],
+          sources=["tools/catalog_delta.py"],
+          output="deltas/versions.json", writes_output=True),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruit le catalogue des sites en ne relançant que les étapes modifiées")
+    parser.add_argument("etapes", nargs="*",
+                        help=f"étapes à produire avec leurs dépendances (défaut : toutes) parmi : "
+                             f"{', '.join(stage.name for stage in STAGES)}")
+    parser.add_argument("--forcer", action="store_true", help="relance toutes les étapes demandées")
+    parser.add_argument("--etat", default=STATE_FILE, help="fichier des empreintes (défaut : .pipeline_state.json)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup(args)
+
+    Pipeline(STAGES, args.etat).run(args.etapes or None, force=args.forcer)
+    export(args, "pipeline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import importlib.util
+import os
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def load_script(relative_path):
+    """
+    Importe un script numéroté du dépôt (ex: "balise-tools/_7-addBalises.py"),
+    dont le nom de fichier n'est pas un nom de module Python valide.
+    """
+    path = os.path.join(REPO_ROOT, relative_path)
+    name = os.path.splitext(os.path.basename(path))[0].lstrip("_").replace("-", "_")
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,173 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+
+from departments import department_of
+from spatial_index import DEFAULT_CATALOG, FRONT_FIELDS
+
+try:
+    import brotli
+except ImportError:  # Compression brotli optionnelle
+    brotli = None
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_OUTPUT_DIR = os.path.join(REPO_ROOT, "sites")
+
+# Département des sites sans code postal exploitable
+UNKNOWN_DEPARTMENT = "xx"
+
+BUNDLE_VERSION = 1
+
+
+def minified(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def site_row(site, fields=FRONT_FIELDS):
+    """Site sous forme de ligne (valeurs dans l'ordre de `fields`, None final retiré)."""
+    row = [site.get(field) for field in fields]
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def build_bundle(sites, fields=FRONT_FIELDS):
+    """
+    Découpe le catalogue en un index et un morceau par département.
+
+    L'index contient, dans l'ordre du catalogue, le nom et le département de
+    chaque site (pour le menu déroulant), puis pour chaque département son
+    fichier, son nombre de sites et son emprise [lat_min, lon_min, lat_max,
+    lon_max]. Un morceau est la liste des sites du département sous forme de
+    lignes dont les valeurs suivent l'ordre de "champs".
+
+    :return: (index, {département: lignes}).
+    """
+    chunks = {}
+    names = []
+    boxes = {}
+    for site in sites:
+        department = department_of(site.get("code_postal")) or UNKNOWN_DEPARTMENT
+        chunks.setdefault(department, []).append(site_row(site, fields))
+        names.append([site.get("nom"), department])
+        latitude, longitude = site.get("latitude"), site.get("longitude")
+        if latitude is None or longitude is None:
+            continue
+        box = boxes.get(department)
+        if box is None:
+            boxes[department] = [latitude, longitude, latitude, longitude]
+        else:
+            boxes[department] = [min(box[0], latitude), min(box[1], longitude),
+                                 max(box[2], latitude), max(box[3], longitude)]
+
+    index = {
+        "version": BUNDLE_VERSION,
+        "champs": list(fields),
+        "sites": names,
+        "departements": {department: {"fichier": f"sites-{department}.json",
+                                      "nombre": len(rows),
+                                      "emprise": boxes.get(department)}
+                         for department, rows in sorted(chunks.items())},
+    }
+    return index, chunks
+
+
+def write_compressed(path, payload):
+    """
+    Écrit le fichier minifié et ses versions précompressées (.gz, et .br si
+    le module brotli est installé).
+
+    :return: {extension: taille en octets}.
+    """
+    sizes = {"": len(payload)}
+    with open(path, "wb") as f:
+        f.write(payload)
+    gz_payload = gzip.compress(payload, compresslevel=9, mtime=0)
+    with open(path + ".gz", "wb") as f:
+        f.write(gz_payload)
+    sizes[".gz"] = len(gz_payload)
+    if brotli is not None:
+        br_payload = brotli.compress(payload, quality=11)
+        with open(path + ".br", "wb") as f:
+            f.write(br_payload)
+        sizes[".br"] = len(br_payload)
+    return sizes
+
+
+def write_bundle(sites, output_dir=DEFAULT_OUTPUT_DIR, fields=FRONT_FIELDS):
+    """
+    Génère le bundle dans `output_dir` : index.json et sites-XX.json, chacun
+    avec ses versions précompressées. Les morceaux d'un ancien bundle qui ne
+    correspondent plus à aucun département sont supprimés.
+
+    :return: {nom de fichier: {extension: taille}}.
+    """
+    index, chunks = build_bundle(sites, fields)
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = {"index.json": write_compressed(os.path.join(output_dir, "index.json"), minified(index))}
+    for department, rows in chunks.items():
+        filename = index["departements"][department]["fichier"]
+        sizes[filename] = write_compressed(os.path.join(output_dir, filename), minified(rows))
+
+    for filename in os.listdir(output_dir):
+        if re.fullmatch(r"sites-.+\.json(\.gz|\.br)?", filename) and filename.split(".json")[0] + ".json" not in sizes:
+            os.remove(os.path.join(output_dir, filename))
+    return sizes
+
+
+def parse_time(payload, repeat=20):
+    """Meilleur temps (ms) de décodage JSON d'un contenu, sur `repeat` essais."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def print_report(sites, output_dir, sizes):
+    """
+    Tailles et temps de décodage du catalogue complet en un seul tableau
+    (ce que coûterait son intégration à index.html) et du bundle découpé.
+    """
+    full = json.dumps(sites, ensure_ascii=False, indent=4).encode("utf-8")
+    chunk_sizes = {name: size for name, size in sizes.items() if name != "index.json"}
+    largest = max(chunk_sizes, key=lambda name: chunk_sizes[name][""])
+    with open(os.path.join(output_dir, "index.json"), "rb") as f:
+        index_payload = f.read()
+    with open(os.path.join(output_dir, largest), "rb") as f:
+        largest_payload = f.read()
+
+    print("\n📊 Taille et décodage du catalogue :")
+    print(f"   Catalogue complet en un seul tableau ({len(sites)} sites) : {len(full) / 1024:.1f} Ko, "
+          f"gzip {len(gzip.compress(full)) / 1024:.1f} Ko, décodage {parse_time(full):.2f} ms")
+    for name, label in (("index.json", "index"), (largest, "plus gros département")):
+        extra = ", ".join(f"{ext[1:]} {size / 1024:.1f} Ko" for ext, size in sizes[name].items() if ext)
+        print(f"   Bundle, {label} ({name}) : {sizes[name][''] / 1024:.1f} Ko, {extra}")
+    print(f"   Bundle, décodage index {parse_time(index_payload):.2f} ms, "
+          f"plus gros département {parse_time(largest_payload):.2f} ms")
+    total = sum(size[""] for size in chunk_sizes.values())
+    print(f"   {len(chunk_sizes)} départements, {total / 1024:.1f} Ko au total hors index")
+    if brotli is None:
+        print("ℹ️ Module brotli absent : seules les versions gzip ont été générées")
+    print("ℹ️ Temps de décodage mesurés avec le module json de Python, à titre de comparaison")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère le bundle des sites chargé à la demande par index.html")
+    parser.add_argument("--catalogue", default=DEFAULT_CATALOG, help="catalogue JSON des sites")
+    parser.add_argument("--sortie", default=DEFAULT_OUTPUT_DIR, help="dossier du bundle (défaut : sites/ à la racine)")
+    args = parser.parse_args()
+
+    with open(args.catalogue, "r", encoding="utf-8") as f:
+        sites = json.load(f)
+    sizes = write_bundle(sites, args.sortie)
+    print(f"✅ {len(sites)} sites exportés en {len(sizes) - 1} départements dans : {args.sortie}")
+    print_report(sites, args.sortie, sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import math
+
+# Table de correspondance des orientations cardinales en degrés
+ORIENTATION_TO_DEGREES = {
+    "N": 0,
+    "NE": 45,
+    "E": 90,
+    "SE": 135,
+    "S": 180,
+    "SO": 225,
+    "O": 270,
+    "NO": 315
+}
+
+# Table inverse pour convertir des degrés en orientations cardinales
+DEGREES_TO_ORIENTATION = {v: k for k, v in ORIENTATION_TO_DEGREES.items()}
+
+# Rose des vents à 16 points : le bit i d'un masque de secteurs correspond
+# au secteur centré sur i × 22,5°
+COMPASS_POINTS = ("N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+                  "S", "SSO", "SO", "OSO", "O", "ONO", "NO", "NNO")
+COMPASS_BITS = {point: 1 << i for i, point in enumerate(COMPASS_POINTS)}
+SECTOR_DEGREES = 360 / len(COMPASS_POINTS)
+ALL_SECTORS = (1 << len(COMPASS_POINTS)) - 1
+# Points de la rose à 8 points (bits pairs) et points intermédiaires (bits impairs)
+MAIN_SECTORS = sum(1 << i for i in range(0, len(COMPASS_POINTS), 2))
+INTERMEDIATE_SECTORS = ALL_SECTORS & ~MAIN_SECTORS
+
+UNFAVORABLE_MARKER = "Secteurs de vent défavorables"
+IDEAL_MARKER = "Conditions aérologiques idéales"
+NOT_PROVIDED = "Non renseigné"
+
+def get_average_orientation(orientations):
+    """
+    Calcule la moyenne des orientations cardinales.
+    :param orientations: Liste des orientations (ex: ["N", "SE", "S", "SO", "O", "NO"])
+    :return: Orientation moyenne (ex: "S")
+    """
+    if not orientations:
+        return None
+
+    # Convertir les orientations en radians
+    radians = [math.radians(ORIENTATION_TO_DEGREES[orientation]) for orientation in orientations if orientation in ORIENTATION_TO_DEGREES]
+
+    # Calculer les moyennes des coordonnées x et y sur le cercle trigonométrique
+    x = sum(math.cos(r) for r in radians) / len(radians)
+    y = sum(math.sin(r) for r in radians) / len(radians)
+
+    # Calculer l'angle moyen en radians
+    average_radians = math.atan2(y, x)
+
+    # Convertir l'angle moyen en degrés
+    average_degrees = math.degrees(average_radians) % 360
+
+    # Trouver l'orientation cardinale la plus proche
+    closest_orientation = min(DEGREES_TO_ORIENTATION.keys(), key=lambda d: abs(d - average_degrees))
+    return DEGREES_TO_ORIENTATION[closest_orientation]
+
+def extract_orientation(secteurs_vent):
+    """
+    Extrait l'orientation à partir du champ 'secteurs_vent'.
+    Récupère uniquement les données avant 'Secteurs de vent défavorables'.
+    """
+    if not secteurs_vent:
+        return None
+
+    # Diviser le texte au niveau de "Secteurs de vent défavorables"
+    parts = secteurs_vent.split("Secteurs de vent défavorables")
+    if len(parts) > 0:
+        # Retourner la partie avant "Secteurs de vent défavorables", en supprimant les espaces inutiles
+        return parts[0].strip()
+    return None
+
+def split_wind_sectors(secteurs_vent):
+    """
+    Sépare le champ 'secteurs_vent' en secteurs favorables et défavorables
+    ("SO;O;NO", "NE;E;SE"), sans les conditions aérologiques qui suivent.
+    """
+    if not secteurs_vent:
+        return None, None
+    favorable, _, rest = secteurs_vent.partition(UNFAVORABLE_MARKER)
+    unfavorable = rest.partition(IDEAL_MARKER)[0].lstrip(" :")
+    return favorable.strip() or None, unfavorable.strip() or None
+
+def sectors_mask(sectors):
+    """
+    Masque des secteurs d'une liste ("SO;O;NO" -> bits de SO, O et NO),
+    None si elle ne contient aucun point de la rose des vents ("Non renseigné").
+    """
+    if not sectors:
+        return None
+    mask = 0
+    for sector in sectors.replace(",", ";").split(";"):
+        mask |= COMPASS_BITS.get(sector.strip().upper(), 0)
+    return mask or None
+
+def wind_sector_masks(secteurs_vent):
+    """Masques (favorables, défavorables) du champ 'secteurs_vent', None s'ils ne sont pas renseignés."""
+    favorable, unfavorable = split_wind_sectors(secteurs_vent)
+    return sectors_mask(favorable), sectors_mask(unfavorable)
+
+def mask_sectors(mask):
+    """Liste des secteurs d'un masque (bits de SO, O et NO -> "SO;O;NO"), None s'il est vide."""
+    if not mask:
+        return None
+    return ";".join(point for point, bit in COMPASS_BITS.items() if mask & bit)
+
+def ideal_conditions(secteurs_vent):
+    """Conditions aérologiques idéales du champ 'secteurs_vent', None si elles ne sont pas renseignées."""
+    if not secteurs_vent:
+        return None
+    conditions = secteurs_vent.partition(IDEAL_MARKER)[2].lstrip(" :").strip()
+    return None if conditions in ("", NOT_PROVIDED) else conditions
+
+def direction_bit(degrees):
+    """Bit du secteur de 22,5° contenant une direction de vent (degrés)."""
+    return 1 << int(math.floor(degrees / SECTOR_DEGREES + 0.5)) % len(COMPASS_POINTS)
+
+def with_intermediate_sectors(mask):
+    """
+    Ajoute à un masque les points intermédiaires voisins de ses secteurs de
+    la rose à 8 points : un secteur "O" couvre 45°, soit aussi la moitié de
+    OSO et de ONO.
+    """
+    main = mask & MAIN_SECTORS
+    # Voisins de chaque point, NNO (bit 15) étant le voisin de N
+    return mask | ((main << 1) | (main >> 1) | (main << 15)) & INTERMEDIATE_SECTORS
+
+def allowed_directions(favorable, unfavorable=None):
+    """
+    Masque des directions de vent acceptées pour un site : ses secteurs
+    favorables moins ses secteurs défavorables, chacun étendu aux points
+    intermédiaires voisins (un point partagé est donc écarté). Calculé une
+    fois par site, le test d'une direction est `masque & direction_bit(degrés)`.
+    """
+    if not favorable:
+        return 0
+    return with_intermediate_sectors(favorable) & ~with_intermediate_sectors(unfavorable or 0)
+
+def site_orientation(orientation_all):
+    """
+    Orientation moyenne d'un site à partir de la liste de ses secteurs
+    favorables ("SO;O;NO"), None si elle n'est pas renseignée.
+    """
+    # recherche uniquement si ne contient pas "non" dans orientation
+    if not (orientation_all and "non" not in orientation_all.lower()):
+        return None
+    return get_average_orientation(orientation_all.split(";"))
+
+def is_takeoff_activity(activite):
+    """Activité d'un décollage parapente (hors atterrissage)"""
+    activite = activite or ''
+    return 'parapente' in activite and 'atterro' not in activite
+
+def is_open_status(statut):
+    """Statut d'un site praticable"""
+    statut = statut or ''
+    return 'interdit' not in statut and 'non praticable définitivement' not in statut
@@ -0,0 +1,334 @@
+import argparse
+import json
+import math
+import os
+import sqlite3
+import unicodedata
+
+from checkpoint import write_json_atomic
+from departments import department_of
+from spatial_index import DEFAULT_CATALOG, haversine
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_DATABASE = os.path.join(REPO_ROOT, "catalogue.sqlite")
+DEFAULT_BALISES = os.path.join(REPO_ROOT, "balise-tools", "balises_all.json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    num INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    nom TEXT,
+    nom_normalise TEXT,
+    departement TEXT,
+    latitude REAL,
+    longitude REAL,
+    position INTEGER NOT NULL,
+    donnees TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sites_nom ON sites (nom_normalise);
+CREATE INDEX IF NOT EXISTS sites_departement ON sites (departement);
+CREATE INDEX IF NOT EXISTS sites_position ON sites (position);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS sites_geo USING rtree (num, lat_min, lat_max, lon_min, lon_max);
+
+CREATE TABLE IF NOT EXISTS balises (
+    url TEXT PRIMARY KEY,
+    nom TEXT,
+    nom_normalise TEXT,
+    position INTEGER NOT NULL,
+    donnees TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS balises_nom ON balises (nom_normalise);
+
+CREATE TABLE IF NOT EXISTS site_balises (
+    site_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (site_id, url)
+);
+CREATE INDEX IF NOT EXISTS site_balises_url ON site_balises (url);
+
+CREATE TRIGGER IF NOT EXISTS sites_suppression AFTER DELETE ON sites BEGIN
+    DELETE FROM sites_geo WHERE num = old.num;
+    DELETE FROM site_balises WHERE site_id = old.id;
+END;
+"""
+
+
+def normalize_name(name):
+    """Nom comparable : minuscules, sans accents ni drapeau, tirets et espaces multiples réduits."""
+    text = unicodedata.normalize("NFKD", (name or "").replace("🚩", ""))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.lower().replace("-", " ").split())
+
+
+def site_balises(site):
+    balises = site.get("balise") or []
+    return [balises] if isinstance(balises, str) else list(balises)
+
+
+class SiteStore:
+    """
+    Catalogue des sites et des balises dans une base SQLite.
+
+    Chaque site est conservé tel quel (JSON, dans l'ordre du catalogue) ;
+    son identifiant, son nom normalisé, son département et ses coordonnées
+    sont indexés (B-tree, et R*Tree pour les coordonnées), de même que ses
+    liens vers les balises. Une mise à jour ne réécrit que les sites
+    modifiés, et l'export JSON redonne le catalogue à l'identique.
+
+    :param path: Fichier de la base (créé au besoin), ":memory:" pour une base en mémoire.
+    """
+
+    def __init__(self, path=DEFAULT_DATABASE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.db.commit()
+        else:
+            self.db.rollback()
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def commit(self):
+        self.db.commit()
+
+    # Écriture
+
+    def _next_position(self, table):
+        return self.db.execute(f"SELECT COALESCE(MAX(position), -1) + 1 FROM {table}").fetchone()[0]
+
+    def _write_site(self, site, position, keep_position):
+        """Insère ou met à jour un site ; renvoie False s'il était déjà identique."""
+        site_id = str(site["id"])
+        data = json.dumps(site, ensure_ascii=False)
+        row = self.db.execute("SELECT num, position, donnees FROM sites WHERE id = ?", (site_id,)).fetchone()
+        if row is not None and keep_position:
+            position = row["position"]
+        if row is not None and row["donnees"] == data and row["position"] == position:
+            return False
+
+        latitude, longitude = site.get("latitude"), site.get("longitude")
+        values = (site.get("nom"), normalize_name(site.get("nom")), department_of(site.get("code_postal")),
+                  latitude, longitude, position, data)
+        if row is None:
+            num = self.db.execute(
+                "INSERT INTO sites (id, nom, nom_normalise, departement, latitude, longitude, position, donnees) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (site_id,) + values).lastrowid
+        else:
+            num = row["num"]
+            self.db.execute(
+                "UPDATE sites SET nom = ?, nom_normalise = ?, departement = ?, latitude = ?, longitude = ?, "
+                "position = ?, donnees = ? WHERE num = ?", values + (num,))
+
+        if latitude is None or longitude is None:
+            self.db.execute("DELETE FROM sites_geo WHERE num = ?", (num,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO sites_geo VALUES (?, ?, ?, ?, ?)",
+                            (num, latitude, latitude, longitude, longitude))
+        self.db.execute("DELETE FROM site_balises WHERE site_id = ?", (site_id,))
+        self.db.executemany("INSERT OR IGNORE INTO site_balises (site_id, url, position) VALUES (?, ?, ?)",
+                            [(site_id, url, i) for i, url in enumerate(site_balises(site))])
+        return True
+
+    def upsert_sites(self, sites):
+        """
+        Ajoute ou met à jour des sites (identifiés par "id") : un site déjà
+        présent garde sa place dans le catalogue, un nouveau site est ajouté
+        à la fin.
+
+        :return: Nombre de sites ajoutés ou modifiés.
+        """
+        position = self._next_position("sites")
+        changed = 0
+        with self.db:
+            for site in sites:
+                if self._write_site(site, position, keep_position=True):
+                    changed += 1
+                position += 1
+        return changed
+
+    def replace_sites(self, sites):
+        """
+        Remplace le catalogue : les sites sont placés dans l'ordre de la
+        liste et ceux qui n'y figurent plus sont supprimés.
+
+        :return: (sites ajoutés ou modifiés, sites supprimés).
+        """
+        with self.db:
+            changed = sum(self._write_site(site, position, keep_position=False)
+                          for position, site in enumerate(sites))
+            ids = {str(site["id"]) for site in sites}
+            removed = [row["id"] for row in self.db.execute("SELECT id FROM sites") if row["id"] not in ids]
+            self.db.executemany("DELETE FROM sites WHERE id = ?", [(site_id,) for site_id in removed])
+        return changed, len(removed)
+
+    def update_site(self, site_id, **fields):
+        """Modifie quelques champs d'un site sans réécrire le reste du catalogue."""
+        site = self.site(site_id)
+        if site is None:
+            raise KeyError(f"Site inconnu : {site_id}")
+        site.update(fields)
+        with self.db:
+            self._write_site(site, None, keep_position=True)
+        return site
+
+    def delete_sites(self, site_ids):
+        with self.db:
+            self.db.executemany("DELETE FROM sites WHERE id = ?", [(str(site_id),) for site_id in site_ids])
+
+    def replace_balises(self, balises):
+        """
+        Remplace la liste des balises (identifiées par "url").
+
+        :return: (balises ajoutées ou modifiées, balises supprimées).
+        """
+        changed = 0
+        with self.db:
+            for position, balise in enumerate(balises):
+                data = json.dumps(balise, ensure_ascii=False)
+                row = self.db.execute("SELECT position, donnees FROM balises WHERE url = ?",
+                                      (balise["url"],)).fetchone()
+                if row is not None and row["donnees"] == data and row["position"] == position:
+                    continue
+                self.db.execute(
+                    "INSERT INTO balises (url, nom, nom_normalise, position, donnees) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (url) DO UPDATE SET nom = excluded.nom, nom_normalise = excluded.nom_normalise, "
+                    "position = excluded.position, donnees = excluded.donnees",
+                    (balise["url"], balise.get("nom"), normalize_name(balise.get("nom")), position, data))
+                changed += 1
+            urls = {balise["url"] for balise in balises}
+            removed = [row["url"] for row in self.db.execute("SELECT url FROM balises") if row["url"] not in urls]
+            self.db.executemany("DELETE FROM balises WHERE url = ?", [(url,) for url in removed])
+        return changed, len(removed)
+
+    # Lecture
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM sites").fetchone()[0]
+
+    def __bool__(self):
+        # Une base vide reste une base ouverte (len() ne compte que les sites)
+        return True
+
+    def _sites(self, query, params=()):
+        return [json.loads(row["donnees"]) for row in self.db.execute(query, params)]
+
+    def sites(self):
+        """Sites dans l'ordre du catalogue."""
+        return self._sites("SELECT donnees FROM sites ORDER BY position")
+
+    def site(self, site_id):
+        sites = self._sites("SELECT donnees FROM sites WHERE id = ?", (str(site_id),))
+        return sites[0] if sites else None
+
+    def find_by_name(self, name):
+        """Sites dont le nom normalisé est celui demandé (sans accents, casse ni drapeau)."""
+        return self._sites("SELECT donnees FROM sites WHERE nom_normalise = ? ORDER BY position",
+                           (normalize_name(name),))
+
+    def sites_in_department(self, department):
+        return self._sites("SELECT donnees FROM sites WHERE departement = ? ORDER BY position", (department,))
+
+    def sites_with_balise(self, url):
+        return self._sites("SELECT s.donnees FROM site_balises b JOIN sites s ON s.id = b.site_id "
+                           "WHERE b.url = ? ORDER BY s.position", (url,))
+
+    def nearby(self, latitude, longitude, max_distance=30):
+        """
+        Sites à moins de `max_distance` km, du plus proche au plus éloigné :
+        le R*Tree sélectionne les sites du rectangle englobant le cercle,
+        la distance exacte départage ensuite.
+
+        :return: Liste de (distance en km, site).
+        """
+        delta_lat = max_distance / 111.0
+        delta_lon = max_distance / (111.0 * max(math.cos(math.radians(latitude)), 0.01))
+        rows = self.db.execute(
+            "SELECT s.latitude, s.longitude, s.donnees FROM sites_geo g JOIN sites s ON s.num = g.num "
+            "WHERE g.lat_max >= ? AND g.lat_min <= ? AND g.lon_max >= ? AND g.lon_min <= ? ORDER BY s.position",
+            (latitude - delta_lat, latitude + delta_lat, longitude - delta_lon, longitude + delta_lon))
+        found = []
+        for row in rows:
+            distance = haversine(latitude, longitude, row["latitude"], row["longitude"])
+            if distance <= max_distance:
+                found.append((distance, json.loads(row["donnees"])))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def balises(self):
+        return [json.loads(row["donnees"]) for row in self.db.execute("SELECT donnees FROM balises ORDER BY position")]
+
+    def export(self, output_file):
+        """Écrit le catalogue au format de merged_sites_with_balises_corrected.json."""
+        sites = self.sites()
+        write_json_atomic(sites, output_file)
+        return len(sites)
+
+
+def add_store_argument(parser):
+    """Option --base commune aux étapes qui alimentent la base."""
+    parser.add_argument("--base", nargs="?", const=DEFAULT_DATABASE, metavar="FICHIER",
+                        help=f"met aussi à jour la base SQLite du catalogue (défaut : {DEFAULT_DATABASE})")
+
+
+def open_store(args):
+    """Base demandée par --base, ou None."""
+    return SiteStore(args.base) if getattr(args, "base", None) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Base SQLite du catalogue des sites et des balises")
+    parser.add_argument("--base", default=DEFAULT_DATABASE, help=f"fichier de la base (défaut : {DEFAULT_DATABASE})")
+    commands = parser.add_subparsers(dest="commande", required=True)
+    load = commands.add_parser("importer", help="charge le catalogue et les balises JSON dans la base")
+    load.add_argument("--catalogue", default=DEFAULT_CATALOG, help="catalogue JSON des sites")
+    load.add_argument("--balises", default=DEFAULT_BALISES, help="liste JSON des balises")
+    dump = commands.add_parser("exporter", help="écrit le catalogue JSON lu par index.html")
+    dump.add_argument("--sortie", default=DEFAULT_CATALOG, help="fichier JSON de sortie")
+    dump.add_argument("--bundle", action="store_true", help="régénère aussi le bundle sites/ de index.html")
+    near = commands.add_parser("proches", help="sites proches d'un point")
+    near.add_argument("latitude", type=float)
+    near.add_argument("longitude", type=float)
+    near.add_argument("--rayon", type=float, default=30, help="rayon en km (défaut : 30)")
+    find = commands.add_parser("nom", help="sites portant un nom (sans tenir compte des accents ni de la casse)")
+    find.add_argument("nom")
+    args = parser.parse_args()
+
+    with SiteStore(args.base) as store:
+        if args.commande == "importer":
+            with open(args.catalogue, "r", encoding="utf-8") as f:
+                changed, removed = store.replace_sites(json.load(f))
+            print(f"✅ Sites : {changed} ajoutés ou modifiés, {removed} supprimés, {len(store)} dans la base")
+            if os.path.exists(args.balises):
+                with open(args.balises, "r", encoding="utf-8") as f:
+                    changed, removed = store.replace_balises(json.load(f))
+                print(f"✅ Balises : {changed} ajoutées ou modifiées, {removed} supprimées")
+        elif args.commande == "exporter":
+            count = store.export(args.sortie)
+            print(f"✅ {count} sites exportés dans : {args.sortie}")
+            if args.bundle:
+                from site_bundle import DEFAULT_OUTPUT_DIR, write_bundle
+                write_bundle(store.sites(), DEFAULT_OUTPUT_DIR)
+                print(f"✅ Bundle régénéré dans : {DEFAULT_OUTPUT_DIR}")
+        elif args.commande == "proches":
+            for distance, site in store.nearby(args.latitude, args.longitude, args.rayon):
+                print(f"{distance:6.1f} km  {site.get('nom')} ({site.get('commune')})")
+        else:
+            for site in store.find_by_name(args.nom):
+                print(f"{site.get('id'):>6}  {site.get('nom')} ({site.get('commune')})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import json
+
+import numpy as np
+
+from site_rules import (ORIENTATION_TO_DEGREES, extract_orientation, is_open_status, is_takeoff_activity,
+                        site_orientation, with_intermediate_sectors)
+
+# Valeur d'une colonne objet pour un champ absent du site
+MISSING = object()
+
+
+class StringColumn:
+    """
+    Colonne de chaînes internées : chaque valeur distincte n'est stockée
+    qu'une fois, les lignes ne portent qu'un code int32 (-1 pour None).
+    Les transformations sont calculées une fois par valeur distincte puis
+    diffusées à toutes les lignes par les codes.
+    """
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+        self.index = {value: code for code, value in enumerate(values)}
+
+    @classmethod
+    def from_list(cls, items):
+        column = cls(np.empty(0, dtype=np.int32), [])
+        column.codes = column.encode(items)
+        return column
+
+    def intern(self, value):
+        """Code d'une valeur, ajoutée aux valeurs distinctes si besoin."""
+        if value is None:
+            return -1
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, items):
+        return np.fromiter((self.intern(item) for item in items), dtype=np.int32, count=len(items))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        code = self.codes[row]
+        return None if code < 0 else self.values[code]
+
+    def tolist(self):
+        values = self.values + [None]
+        return [values[code] for code in self.codes]
+
+    def take(self, rows):
+        return StringColumn(self.codes[rows], list(self.values))
+
+    def map(self, func, dtype=object, missing=None):
+        """Applique `func` à chaque valeur distincte, renvoie un tableau par ligne."""
+        results = np.empty(len(self.values) + 1, dtype=dtype)
+        for code, value in enumerate(self.values):
+            results[code] = func(value)
+        results[-1] = missing
+        return results[self.codes]
+
+    def map_strings(self, func):
+        """Comme map(), le résultat étant une nouvelle colonne de chaînes."""
+        column = StringColumn(np.empty(0, dtype=np.int32), [])
+        remap = np.append(column.encode([func(value) for value in self.values]), -1).astype(np.int32)
+        column.codes = remap[self.codes]
+        return column
+
+
+class SiteTable:
+    """
+    Table en colonnes d'un catalogue de sites.
+
+    Chaque champ JSON devient une colonne typée : tableau NumPy float64 pour
+    les nombres (NaN si absent, entiers restitués en int), colonne de chaînes
+    internées pour les textes, tableau d'objets pour le reste (listes de
+    balises...). L'ordre des champs de chaque site est conservé, si bien que
+    to_records() restitue exactement les enregistrements de départ.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.columns = {}
+        self.kinds = {}
+        self.layouts = StringColumn(np.zeros(size, dtype=np.int32), [()])
+
+    def __len__(self):
+        return self.size
+
+    # Conversions depuis / vers le schéma JSON
+
+    @classmethod
+    def from_records(cls, records):
+        table = cls(len(records))
+        keys = {}
+        for record in records:
+            for key in record:
+                keys.setdefault(key, None)
+        for key in keys:
+            table._set_column(key, [record.get(key, MISSING) for record in records])
+        table.layouts = StringColumn.from_list([tuple(record) for record in records])
+        return table
+
+    @staticmethod
+    def _kind_of(values):
+        present = [value for value in values if value is not MISSING and value is not None]
+        if all(isinstance(value, str) for value in present):
+            return "str"
+        if all(type(value) is int for value in present):
+            return "int"
+        if all(type(value) is float for value in present):
+            return "float"
+        return "object"
+
+    def _set_column(self, key, values):
+        kind = self._kind_of(values)
+        self.kinds[key] = kind
+        if kind == "str":
+            self.columns[key] = StringColumn.from_list([None if value is MISSING else value for value in values])
+        elif kind in ("int", "float"):
+            self.columns[key] = np.array([np.nan if value is MISSING or value is None else value for value in values],
+                                         dtype=np.float64)
+        else:
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            self.columns[key] = column
+
+    def _column_values(self, key):
+        """Valeurs Python d'une colonne, None pour les champs absents ou nuls."""
+        kind = self.kinds[key]
+        column = self.columns[key]
+        if kind == "str":
+            return column.tolist()
+        if kind == "object":
+            return [None if value is MISSING else value for value in column]
+        convert = int if kind == "int" else float
+        return [None if value != value else convert(value) for value in column.tolist()]
+
+    def to_records(self):
+        columns = {key: self._column_values(key) for key in self.kinds}
+        return [{key: columns[key][row] for key in layout}
+                for row, layout in enumerate(self.layouts.tolist())]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_records(json.load(f))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_records(), f, ensure_ascii=False, indent=4)
+
+    # Accès aux colonnes
+
+    def strings(self, key):
+        """Colonne de chaînes (vide si le champ n'existe pas)."""
+        if key not in self.kinds:
+            return StringColumn(np.full(self.size, -1, dtype=np.int32), [])
+        if self.kinds[key] != "str":
+            raise TypeError(f"Le champ {key} n'est pas une colonne de chaînes")
+        return self.columns[key]
+
+    def numbers(self, key):
+        """Colonne numérique float64 (NaN si absent)."""
+        if key not in self.kinds:
+            return np.full(self.size, np.nan)
+        if self.kinds[key] not in ("int", "float"):
+            raise TypeError(f"Le champ {key} n'est pas une colonne numérique")
+        return self.columns[key]
+
+    @property
+    def latitude(self):
+        return self.numbers("latitude")
+
+    @property
+    def longitude(self):
+        return self.numbers("longitude")
+
+    @property
+    def altitude(self):
+        return self.numbers("altitude")
+
+    @property
+    def orientation_degrees(self):
+        """Orientation de chaque site en degrés (NaN si inconnue)."""
+        return self.strings("orientation").map(lambda value: ORIENTATION_TO_DEGREES.get(value, np.nan),
+                                               dtype=np.float64, missing=np.nan)
+
+    def _mask_column(self, key):
+        """Masques de secteurs d'un champ (0 si absent) et lignes où il est renseigné."""
+        numeric = self.kinds.get(key) in ("int", "float")
+        values = self.numbers(key) if numeric else np.full(self.size, np.nan)
+        return np.nan_to_num(values).astype(np.int64), ~np.isnan(values)
+
+    @property
+    def direction_masks(self):
+        """
+        Masque des directions de vent acceptées de chaque site (voir
+        site_rules.allowed_directions), d'après 'secteurs_favorables' et
+        'secteurs_defavorables'. 0 pour un site sans masques, voir
+        fallback_orientation_degrees.
+        """
+        favorable, _ = self._mask_column("secteurs_favorables")
+        unfavorable, _ = self._mask_column("secteurs_defavorables")
+        # Opérations bit à bit de allowed_directions() sur toutes les lignes à la fois
+        return with_intermediate_sectors(favorable) & ~with_intermediate_sectors(unfavorable)
+
+    @property
+    def fallback_orientation_degrees(self):
+        """
+        Orientation en degrés des sites sans 'secteurs_favorables', qui
+        gardent la règle d'avant les masques (vent à ±45° de l'orientation,
+        voir flyability.favorable_hours). NaN pour les sites avec masques.
+        """
+        _, known = self._mask_column("secteurs_favorables")
+        return np.where(known, np.nan, self.orientation_degrees)
+
+    # Filtres
+
+    def has_field(self, key):
+        """Masque booléen des sites où le champ est présent (même nul)."""
+        return self.layouts.map(lambda layout: key in layout, dtype=bool, missing=False)
+
+    def mask(self, key, predicate):
+        """Masque booléen : `predicate` évalué une fois par valeur distincte."""
+        return self.strings(key).map(predicate, dtype=bool, missing=predicate(None))
+
+    def takeoff_mask(self):
+        """Sites de décollage parapente praticables (mêmes règles que _2-requestInfosSite.py)."""
+        return self.mask("activite", is_takeoff_activity) & self.mask("statut", is_open_status)
+
+    def filter(self, mask):
+        """Nouvelle table limitée aux lignes sélectionnées."""
+        rows = np.flatnonzero(mask)
+        table = SiteTable(len(rows))
+        table.kinds = dict(self.kinds)
+        for key, column in self.columns.items():
+            table.columns[key] = column.take(rows) if isinstance(column, StringColumn) else column[rows]
+        table.layouts = self.layouts.take(rows)
+        return table
+
+    # Mises à jour en bloc
+
+    def update(self, key, values, where=None):
+        """
+        Affecte `values` au champ `key` pour les lignes de `where` (toutes
+        par défaut). `values` est un scalaire, une StringColumn, ou une
+        séquence d'une valeur par ligne de la table. Le champ est ajouté en
+        fin de site là où il n'existait pas, comme une affectation de dict.
+        """
+        rows = np.arange(self.size) if where is None else np.flatnonzero(where)
+        if isinstance(values, StringColumn):
+            new_values = values.take(rows).tolist()
+        elif isinstance(values, (str, int, float, type(None))):
+            new_values = [values] * len(rows)
+        else:
+            new_values = [values[row] for row in rows]
+
+        current_kind = self.kinds.get(key)
+        only_none = all(value is None for value in new_values)
+        if current_kind is not None and (only_none or self._kind_of(new_values) == current_kind):
+            self._assign(key, rows, new_values)
+        else:
+            # Nouveau champ ou changement de type : reconstruction de la colonne
+            merged = self._column_values(key) if current_kind else [MISSING] * self.size
+            for row, value in zip(rows, new_values):
+                merged[row] = value
+            self._set_column(key, merged)
+
+        # Ajouter la clé à la structure des sites qui ne l'avaient pas
+        remap = np.array([self.layouts.intern(layout if key in layout else layout + (key,))
+                          for layout in list(self.layouts.values)], dtype=np.int32)
+        self.layouts.codes[rows] = remap[self.layouts.codes[rows]]
+
+    def remove(self, key, where=None):
+        """
+        Retire le champ `key` des lignes de `where` (toutes par défaut), comme
+        un del de dict. L'ordre des autres champs est conservé.
+        """
+        if key not in self.kinds:
+            return
+        if where is None:
+            del self.columns[key]
+            del self.kinds[key]
+            rows = np.arange(self.size)
+        else:
+            rows = np.flatnonzero(where)
+            self._assign(key, rows, [None] * len(rows))
+        remap = np.array([self.layouts.intern(tuple(field for field in layout if field != key))
+                          for layout in list(self.layouts.values)], dtype=np.int32)
+        self.layouts.codes[rows] = remap[self.layouts.codes[rows]]
+
+    def _assign(self, key, rows, values):
+        kind = self.kinds[key]
+        column = self.columns[key]
+        if kind == "str":
+            column.codes[rows] = column.encode(values)
+        elif kind == "object":
+            column[rows] = values
+        else:
+            column[rows] = [np.nan if value is None else value for value in values]
+
+    # Traitements vectorisés
+
+    def average_orientation(self, key="secteurs_vent"):
+        """
+        Orientation moyenne de chaque site à partir des secteurs favorables
+        du texte 'secteurs_vent' (moyenne circulaire de
+        site_rules.site_orientation). Calculée une fois par texte distinct :
+        le résultat est identique au calcul site par site.
+        """
+        return self.strings(key).map_strings(lambda text: site_orientation(extract_orientation(text)))
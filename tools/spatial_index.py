@@ -0,0 +1,194 @@
+import argparse
+import heapq
+import json
+import math
+import os
+
+EARTH_RADIUS_KM = 6371
+# Longueur d'un degré de latitude
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+DEFAULT_CELL_DEG = 0.25
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "balise-tools",
+                               "merged_sites_with_balises_corrected.json")
+
+# Champs d'un site lus par index.html
+FRONT_FIELDS = ("nom", "commune", "latitude", "longitude", "orientation", "description", "observations",
+                "secteurs_favorables", "secteurs_defavorables")
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distance en km entre deux points, comme calculateDistance() dans index.html"""
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = (math.sin(d_lat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def linear_nearby(sites, latitude, longitude, max_distance=30):
+    """
+    Recherche par parcours complet, équivalent de findNearbySites(). Les
+    sites sans coordonnées sont ignorés, comme dans GridIndex.
+    """
+    return [site for site in sites
+            if site.get("latitude") is not None and site.get("longitude") is not None
+            and haversine(latitude, longitude, site["latitude"], site["longitude"]) <= max_distance]
+
+
+def cell_of(latitude, longitude, cell_deg=DEFAULT_CELL_DEG):
+    """Cellule (ligne, colonne) de la grille contenant un point."""
+    return math.floor(latitude / cell_deg), math.floor(longitude / cell_deg)
+
+
+class GridIndex:
+    """
+    Index spatial des sites sur une grille régulière en degrés.
+
+    Une recherche par rayon ne parcourt que les cellules qui recouvrent le
+    cercle ; la recherche des k plus proches élargit l'anneau de cellules
+    jusqu'à ce qu'aucune cellule restante ne puisse contenir un site plus
+    proche. Les sites sans coordonnées sont ignorés.
+
+    :param sites: Liste des sites (avec "latitude" et "longitude").
+    :param cell_deg: Taille d'une cellule en degrés.
+    """
+
+    def __init__(self, sites, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.size = 0
+        for site in sites:
+            if site.get("latitude") is None or site.get("longitude") is None:
+                continue
+            self.cells.setdefault(cell_of(site["latitude"], site["longitude"], cell_deg), []).append(site)
+            self.size += 1
+
+    def _cell_span(self, latitude, radius_km):
+        """Nombre de cellules à parcourir autour du point, en latitude et longitude."""
+        lat_span = radius_km / KM_PER_DEGREE
+        # Écart de longitude maximal : distance au méridien = asin(cos(lat).sin(dlon))
+        ratio = math.sin(radius_km / EARTH_RADIUS_KM) / max(math.cos(math.radians(latitude)), 1e-9)
+        lon_span = math.degrees(math.asin(ratio)) if ratio < 1 else 180
+        return math.ceil(lat_span / self.cell_deg), math.ceil(lon_span / self.cell_deg)
+
+    def _min_distance_outside(self, latitude, ring):
+        """
+        Distance minimale (km) entre le point et un site situé au-delà de
+        l'anneau `ring` : au moins `ring` cellules d'écart en latitude ou en
+        longitude.
+        """
+        offset = math.radians(min(ring * self.cell_deg, 90))
+        lat_distance = EARTH_RADIUS_KM * offset
+        lon_distance = EARTH_RADIUS_KM * math.asin(math.cos(math.radians(latitude)) * math.sin(offset))
+        return min(lat_distance, lon_distance)
+
+    def nearby(self, latitude, longitude, max_distance=30):
+        """Sites à moins de `max_distance` km, dans l'ordre de l'index."""
+        row, col = cell_of(latitude, longitude, self.cell_deg)
+        row_span, col_span = self._cell_span(latitude, max_distance)
+        result = []
+        for r in range(row - row_span, row + row_span + 1):
+            for c in range(col - col_span, col + col_span + 1):
+                for site in self.cells.get((r, c), ()):
+                    if haversine(latitude, longitude, site["latitude"], site["longitude"]) <= max_distance:
+                        result.append(site)
+        return result
+
+    def nearest(self, latitude, longitude, k=5, max_distance=None, accept=None):
+        """
+        Les `k` sites les plus proches, sous forme de liste (distance_km, site)
+        triée par distance croissante.
+
+        :param accept: Filtre optionnel accept(site) : les sites refusés sont ignorés.
+        """
+        if not self.size:
+            return []
+        row, col = cell_of(latitude, longitude, self.cell_deg)
+        heap = []  # Tas max (distance négative) des k meilleurs candidats
+        seen = 0
+        ring = 0
+        while True:
+            for r, c in self._ring(row, col, ring):
+                for site in self.cells.get((r, c), ()):
+                    seen += 1
+                    distance = haversine(latitude, longitude, site["latitude"], site["longitude"])
+                    if max_distance is not None and distance > max_distance:
+                        continue
+                    if accept is not None and not accept(site):
+                        continue
+                    item = (-distance, id(site), site)
+                    if len(heap) < k:
+                        heapq.heappush(heap, item)
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, item)
+            bound = self._min_distance_outside(latitude, ring)
+            if seen == self.size:
+                break
+            if len(heap) == k and bound >= -heap[0][0]:
+                break
+            if max_distance is not None and bound > max_distance:
+                break
+            ring += 1
+        # Tri sur la distance seule : deux sites à égalité ne se comparent pas
+        return sorted(((-distance, site) for distance, _, site in heap), key=lambda item: item[0])
+
+    @staticmethod
+    def _ring(row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+
+def compact_site(site, fields=FRONT_FIELDS):
+    """Site réduit aux champs utilisés par le front."""
+    return {field: site[field] for field in fields if site.get(field) is not None}
+
+
+def export_tiles(sites, output_dir, cell_deg=DEFAULT_CELL_DEG, fields=FRONT_FIELDS):
+    """
+    Exporte l'index sous forme de petites tuiles JSON, une par cellule non
+    vide (`tiles/{ligne}_{colonne}.json`), et d'un `index.json` qui décrit
+    la grille et le nombre de sites par tuile. Le client calcule la cellule
+    d'un point avec floor(lat / cell_deg), floor(lon / cell_deg) et ne
+    charge que les tuiles voisines.
+
+    :return: Nombre de tuiles écrites.
+    """
+    index = GridIndex(sites, cell_deg)
+    tiles_dir = os.path.join(output_dir, "tiles")
+    os.makedirs(tiles_dir, exist_ok=True)
+    tiles = {}
+    for (row, col), cell_sites in sorted(index.cells.items()):
+        name = f"{row}_{col}"
+        with open(os.path.join(tiles_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump([compact_site(site, fields) for site in cell_sites], f,
+                      ensure_ascii=False, separators=(",", ":"))
+        tiles[name] = len(cell_sites)
+    with open(os.path.join(output_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"cell_deg": cell_deg, "tiles": tiles}, f, separators=(",", ":"))
+    return len(tiles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporte le catalogue des sites en tuiles JSON par cellule de grille")
+    parser.add_argument("--catalogue", default=DEFAULT_CATALOG, help="catalogue JSON des sites")
+    parser.add_argument("--sortie", default="tuiles", help="dossier de sortie (défaut : tuiles)")
+    parser.add_argument("--cellule", type=float, default=DEFAULT_CELL_DEG,
+                        help=f"taille d'une cellule en degrés (défaut : {DEFAULT_CELL_DEG})")
+    args = parser.parse_args()
+
+    with open(args.catalogue, "r", encoding="utf-8") as f:
+        sites = json.load(f)
+    count = export_tiles(sites, args.sortie, args.cellule)
+    print(f"✅ {len(sites)} sites exportés en {count} tuiles dans : {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
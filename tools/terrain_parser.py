@@ -0,0 +1,171 @@
+import re
+
+from html_stream import SoupTextParser, StopParsing
+from metrics import get_logger
+
+logger = get_logger("terrain")
+
+# Conteneurs examinés pour les secteurs de vent
+WIND_CONTAINERS = {'div', 'p', 'span'}
+
+WIND_LABEL = 'Secteurs de vent favorables'
+WIND_RE = re.compile(r'Secteurs de vent favorables\s*:\s*(.*?)(?:\n|$)')
+WIND_LINE_RE = re.compile(r'Secteurs de vent favorables\s*:\s*(.*?)\n')
+MAPS_HREF = 'google.com/maps/preview?q='
+
+
+class _Capture:
+    """Texte d'un élément en cours de lecture, jusqu'à sa fermeture."""
+
+    def __init__(self, depth, attrs=None):
+        self.depth = depth
+        self.attrs = attrs or {}
+        self.parts = []
+        self.links = []
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+class TerrainPageParser(SoupTextParser):
+    """
+    Lecture en flux d'une page terrain FFVL, sans construire d'arbre.
+
+    Seules les régions utiles sont conservées : le lien Google Maps des
+    coordonnées, les blocs `edit-terrain-altitude` et
+    `edit-terrain-description-publique`, et le conteneur (div/p/span) de
+    premier niveau qui porte les secteurs de vent. La lecture s'arrête dès
+    que toutes les régions ont été trouvées.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.container_depth = 0
+        self.active = []
+        # Régions extraites
+        self.coords = None
+        self.altitude = None
+        self.description = None
+        self.pre = None
+        self.wind_sectors = None
+        self.wind_done = False
+        # Conteneur de premier niveau en cours pour les secteurs de vent
+        self.wind_pending = None
+        self.wind_found_label = False
+
+    def _done(self):
+        regions = (self.coords, self.altitude, self.description)
+        return (self.wind_done and all(region is not None for region in regions)
+                and not any(region in self.active for region in regions))
+
+    def on_start(self, tag, attrs, depth):
+        if tag in WIND_CONTAINERS:
+            self.container_depth += 1
+            if self.container_depth == 1 and not self.wind_done:
+                self.wind_pending = _Capture(depth)
+                self.wind_found_label = False
+        if tag == 'a':
+            href = attrs.get('href')
+            if self.coords is None and href and MAPS_HREF in href:
+                self.coords = _Capture(depth, attrs)
+                self.active.append(self.coords)
+            if 'href' in attrs and self.pre in self.active:
+                self.pre.links.append(attrs['href'])
+        elif tag == 'div':
+            element_id = attrs.get('id')
+            if self.altitude is None and element_id == 'edit-terrain-altitude':
+                self.altitude = _Capture(depth)
+                self.active.append(self.altitude)
+            elif self.description is None and element_id == 'edit-terrain-description-publique':
+                self.description = _Capture(depth)
+                self.active.append(self.description)
+        elif tag == 'pre' and self.pre is None and self.description in self.active:
+            self.pre = _Capture(depth)
+            self.active.append(self.pre)
+
+    def handle_endtag(self, tag):
+        super().handle_endtag(tag)
+        if self._done():
+            raise StopParsing()
+
+    def on_end(self, tag, depth):
+        if tag in WIND_CONTAINERS:
+            self.container_depth -= 1
+            if self.wind_pending is not None and self.wind_pending.depth == depth:
+                self._close_wind_container()
+        self.active = [capture for capture in self.active if capture.depth < depth]
+
+    def on_text(self, data):
+        for capture in self.active:
+            capture.parts.append(data)
+        if self.wind_pending is not None:
+            self._feed_wind(data)
+
+    def _feed_wind(self, data):
+        pending = self.wind_pending
+        if not self.wind_found_label:
+            # Ne garder que la fin du texte, où le libellé peut commencer
+            text = pending.text + data
+            index = text.find(WIND_LABEL)
+            if index < 0:
+                pending.parts = [text[-(len(WIND_LABEL) - 1):]]
+                return
+            self.wind_found_label = True
+            pending.parts = [text[index:]]
+        else:
+            pending.parts.append(data)
+        # Résultat définitif dès qu'une ligne non vide complète suit le libellé
+        match = WIND_LINE_RE.search(pending.text)
+        if match and match.group(1) and not match.group(1)[0].isspace():
+            self.wind_sectors = match.group(1).strip()
+            self._finish_wind()
+
+    def _close_wind_container(self):
+        if self.wind_found_label:
+            match = WIND_RE.search(self.wind_pending.text)
+            if match:
+                self.wind_sectors = match.group(1).strip()
+                self._finish_wind()
+                return
+        self.wind_pending = None
+
+    def _finish_wind(self):
+        self.wind_done = True
+        self.wind_pending = None
+
+
+def parse_terrain_page(html, site_id):
+    """
+    Extrait les détails d'une page terrain (coordonnées, altitude, secteurs de
+    vent, balises) en ne lisant que les régions utiles.
+    Résultat identique à parse_terrain_page_soup de _2-requestInfosSite.py
+    """
+    page = TerrainPageParser().parse(html)
+    details = {}
+
+    # Coordonnées : texte du lien, sinon paramètre q= de l'URL
+    if page.coords is not None:
+        coords_match = re.search(r'(\d+\.\d+),\s*(\d+\.\d+)', page.coords.text.strip())
+        if not coords_match:
+            coords_match = re.search(r'q=(\d+\.\d+),(\d+\.\d+)', page.coords.attrs['href'])
+        if coords_match:
+            # Arrondir à 4 décimales
+            details['latitude'] = round(float(coords_match.group(1)), 4)
+            details['longitude'] = round(float(coords_match.group(2)), 4)
+
+    if page.altitude is not None:
+        alt_match = re.search(r'Altitude\s*:\s*(\d+)', page.altitude.text.strip())
+        if alt_match:
+            details['altitude'] = int(alt_match.group(1))
+
+    if page.wind_sectors:
+        details['secteurs_vent'] = page.wind_sectors
+
+    # Balises météo : liens du premier <pre> de la description
+    if page.pre is not None:
+        logger.debug(f"Balises météo trouvées dans le site {site_id}:")
+        if 'Balise météo' in page.pre.text and page.pre.links:
+            details['balise'] = list(page.pre.links)
+
+    return details
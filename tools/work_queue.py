@@ -0,0 +1,366 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from checkpoint import CheckpointLog, read_records, write_json_atomic
+from metrics import METRICS, get_logger
+
+logger = get_logger("work_queue")
+
+# États d'un élément de la file
+PENDING = "en_attente"
+DONE = "fait"
+FAILED = "echec"
+# Entrée du journal seulement : l'élément a été retiré de la file
+REMOVED = "retire"
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Délai de la première nouvelle tentative et délai maximal (secondes)
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 300.0
+
+# Codes HTTP temporaires : le serveur est surchargé ou indisponible
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    """
+    Échec temporaire (surcharge du serveur, réseau) : l'élément sera retenté.
+
+    :param retry_after: Délai minimal (s) demandé par le serveur (en-tête Retry-After).
+    :param throttled: Le serveur signale une surcharge (429 ou 5xx).
+    """
+
+    def __init__(self, message, retry_after=None, throttled=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+
+class PermanentError(Exception):
+    """Échec définitif (page absente, requête refusée) : l'élément n'est pas retenté."""
+
+
+def parse_retry_after(value):
+    """Délai en secondes d'un en-tête Retry-After (nombre de secondes ou date HTTP)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response(response, url):
+    """
+    Lève RetryableError pour un code temporaire (429, 5xx...) et
+    PermanentError pour les autres codes d'erreur.
+    """
+    status = response.status_code
+    if status < 400:
+        return response
+    if status in RETRYABLE_STATUS:
+        raise RetryableError(f"{status} pour l'URL : {url}",
+                             retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                             throttled=status == 429 or status >= 500)
+    raise PermanentError(f"{status} pour l'URL : {url}")
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP, rng=random):
+    """
+    Attente avant la tentative suivante : exponentielle plafonnée, tirée
+    uniformément entre 0 et base * 2^(essai - 1) (« full jitter ») pour que
+    les éléments en échec ne reviennent pas tous en même temps.
+    """
+    return rng.uniform(0, min(cap, base * 2 ** max(0, attempt - 1)))
+
+
+class WorkQueue:
+    """
+    File de travail persistante : état de chaque élément (en attente, fait,
+    en échec), nombre d'essais, date de la prochaine tentative et dernière
+    erreur. Chaque changement d'état est ajouté au journal JSON Lines
+    `path` (voir CheckpointLog), relu à l'ouverture : une collecte
+    interrompue reprend exactement où elle s'est arrêtée.
+
+    :param path: Journal de la file (.jsonl).
+    :param max_attempts: Essais avant qu'un élément ne passe en échec.
+    """
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.items = {}
+        for record in read_records(path):
+            if record["etat"] == REMOVED:
+                self.items.pop(record["cle"], None)
+            else:
+                self.items[record["cle"]] = record
+        self.log = CheckpointLog(path)
+        # Tas des éléments en attente par date de prochaine tentative
+        self.heap = []
+        self.sequence = itertools.count()
+        for item in self.items.values():
+            self._schedule(item)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        if self.log.file is not None:
+            return
+        # Réécrit le journal avec le dernier état de chaque élément
+        if os.path.exists(self.path):
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for item in self.items.values():
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+        self.log.open()
+
+    def close(self):
+        self.log.close()
+
+    def _schedule(self, item):
+        if item["etat"] == PENDING:
+            heapq.heappush(self.heap, (item["prochain"], next(self.sequence), item["cle"]))
+
+    def _save(self, item):
+        self.items[item["cle"]] = item
+        self.log.append(item)
+        self._schedule(item)
+
+    def add(self, keys):
+        """
+        Ajoute des éléments à traiter : un élément inconnu ou déjà fait est
+        (re)mis en attente, un élément en attente ou en échec garde son état.
+
+        :return: Nombre d'éléments mis en attente.
+        """
+        added = 0
+        for key in keys:
+            item = self.items.get(key)
+            if item is None or item["etat"] == DONE:
+                self._save({"cle": key, "etat": PENDING, "essais": 0, "prochain": 0, "erreur": None})
+                added += 1
+        return added
+
+    def discard(self, keys):
+        """
+        Retire des éléments de la file, quel que soit leur état.
+
+        :return: Nombre d'éléments retirés.
+        """
+        removed = 0
+        for key in keys:
+            if self.items.pop(key, None) is not None:
+                self.log.append({"cle": key, "etat": REMOVED})
+                removed += 1
+        return removed
+
+    def reset(self):
+        """Vide la file et supprime son journal."""
+        self.close()
+        self.items.clear()
+        self.heap.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def retry_failed(self):
+        """Remet en attente les éléments en échec. :return: Nombre d'éléments remis en attente."""
+        failed = [item for item in self.items.values() if item["etat"] == FAILED]
+        for item in failed:
+            self._save({**item, "etat": PENDING, "essais": 0, "prochain": 0})
+        return len(failed)
+
+    def counts(self):
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        for item in self.items.values():
+            counts[item["etat"]] += 1
+        return counts
+
+    def pop_ready(self, now):
+        """
+        Retire du tas le prochain élément en attente dont la tentative est
+        échue, ou renvoie None et le délai avant le prochain (None s'il n'en
+        reste aucun).
+        """
+        while self.heap:
+            when, _, key = self.heap[0]
+            item = self.items.get(key)
+            if item is None or item["etat"] != PENDING or item["prochain"] != when:
+                heapq.heappop(self.heap)  # entrée périmée ou retirée
+                continue
+            if when > now:
+                return None, when - now
+            heapq.heappop(self.heap)
+            return key, 0
+        return None, None
+
+    def mark_done(self, key):
+        item = self.items[key]
+        self._save({**item, "etat": DONE, "essais": item["essais"] + 1, "erreur": None})
+
+    def mark_failed(self, key, error, retryable=True, retry_after=None, now=None):
+        """
+        Enregistre un échec : l'élément est replanifié après un délai
+        exponentiel (au moins `retry_after`), ou passe en échec s'il n'est pas
+        retentable ou a épuisé ses essais.
+
+        :return: True si l'élément sera retenté.
+        """
+        now = time.time() if now is None else now
+        item = self.items[key]
+        attempts = item["essais"] + 1
+        if not retryable or attempts >= self.max_attempts:
+            self._save({**item, "etat": FAILED, "essais": attempts, "erreur": str(error)})
+            return False
+        delay = max(backoff_delay(attempts), retry_after or 0)
+        self._save({**item, "essais": attempts, "prochain": now + delay, "erreur": str(error)})
+        return True
+
+    def write_report(self, output_file):
+        """Écrit la liste des éléments en échec et leur dernière erreur."""
+        failed = [item for item in self.items.values() if item["etat"] == FAILED]
+        write_json_atomic(failed, output_file)
+        return len(failed)
+
+
+class AdaptiveConcurrency:
+    """
+    Nombre de requêtes simultanées ajusté en continu (AIMD) : +1 après une
+    série de réponses rapides, divisé par deux quand le serveur renvoie
+    429/5xx ou que la latence dépasse `latency_factor` fois la latence de
+    référence (la plus basse moyenne observée). Une seule réduction par
+    intervalle `cooldown`, le temps que les requêtes déjà lancées aboutissent.
+
+    :param initial: Concurrence de départ.
+    :param maximum: Concurrence maximale (taille du pool de threads).
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, latency_factor=3.0, cooldown=5.0):
+        self.maximum = max(1, maximum or initial)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.average = None
+        self.baseline = None
+        self.successes = 0
+        self.last_decrease = float("-inf")
+        self.lock = threading.Lock()
+
+    def record(self, latency, throttled=False, now=None):
+        """Prend en compte une réponse. :return: Nouvelle limite."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if latency is not None:
+                self.average = latency if self.average is None else 0.8 * self.average + 0.2 * latency
+                self.baseline = self.average if self.baseline is None else min(self.baseline, self.average)
+            slow = self.average is not None and self.average > self.baseline * self.latency_factor
+            if throttled or slow:
+                self.successes = 0
+                if now - self.last_decrease >= self.cooldown and self.limit > self.minimum:
+                    self.limit = max(self.minimum, self.limit // 2)
+                    self.last_decrease = now
+                    logger.info(f"🐢 Concurrence réduite à {self.limit} "
+                                f"({'serveur surchargé' if throttled else 'latence en hausse'})")
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self.successes = 0
+            METRICS.set("crawl_concurrency", self.limit)
+            return self.limit
+
+
+def run_queue(queue, worker, concurrency, stats=None, max_concurrency=None, session=None, label="élément"):
+    """
+    Traite les éléments en attente de la file avec `worker(clé)`, sur un
+    pool de threads dont la concurrence s'adapte aux réponses du serveur.
+    Le journal de la file n'est écrit que depuis le thread appelant.
+
+    Un worker signale un échec temporaire par RetryableError (ou une erreur
+    réseau de requests), un échec définitif par PermanentError ; un
+    résultat None compte comme un échec définitif.
+
+    :param session: RateLimitedSession du worker : l'attente du limiteur de
+                    débit n'est pas comptée dans la latence.
+    :return: Générateur de (clé, résultat) des éléments réussis.
+    """
+    control = AdaptiveConcurrency(concurrency, maximum=max_concurrency or concurrency)
+    with ThreadPoolExecutor(max_workers=control.maximum) as executor:
+        running = {}
+
+        def timed(key):
+            waited = session.waited() if session else 0.0
+            start = time.perf_counter()
+            try:
+                result, error = worker(key), None
+            except Exception as e:
+                result, error = None, e
+            latency = time.perf_counter() - start
+            if session:
+                latency -= session.waited() - waited
+            return result, error, max(0.0, latency)
+
+        while True:
+            wait_time = None
+            while len(running) < control.limit:
+                key, wait_time = queue.pop_ready(time.time())
+                if key is None:
+                    break
+                running[executor.submit(timed, key)] = key
+            if not running:
+                if wait_time is None:
+                    break
+                logger.info(f"⏳ Prochaine tentative dans {wait_time:.1f} s")
+                time.sleep(wait_time)
+                continue
+
+            done, _ = wait(running, timeout=wait_time if wait_time else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                result, error, latency = future.result()
+                if error is None and result is not None:
+                    control.record(latency)
+                    if stats:
+                        stats.ok += 1
+                    # Marqué fait une fois le résultat enregistré par l'appelant
+                    yield key, result
+                    queue.mark_done(key)
+                    continue
+
+                retryable = isinstance(error, (RetryableError, requests.RequestException))
+                throttled = getattr(error, "throttled", False)
+                control.record(None if throttled else latency, throttled)
+                error = error or PermanentError("aucun résultat")
+                if queue.mark_failed(key, error, retryable, getattr(error, "retry_after", None)):
+                    METRICS.inc("work_queue_retries_total")
+                    logger.warning(f"🔁 {label} {key} : {error} (essai {queue.items[key]['essais']}, "
+                                   f"nouvelle tentative dans {queue.items[key]['prochain'] - time.time():.1f} s)")
+                else:
+                    if stats:
+                        stats.failed += 1
+                    logger.error(f"❌ {label} {key} en échec après {queue.items[key]['essais']} essai(s) : {error}")
+    if stats:
+        stats.end = time.monotonic()
+    for state, count in queue.counts().items():
+        METRICS.set("work_queue_items", count, state=state)